@@ -12,9 +12,8 @@ S3 Convention:
   
 Column Names:
   - Preserves original API camelCase (studentId, meetingTimeId, etc.)
-  - For snake_case conversion, use sa-utils/data-utils/column_transformers.py
+  - For snake_case conversion, use rename_columns() in sa-utils/data-utils/column_transformers.py
 """
-import boto3
 import requests
 import polars as pl
 from datetime import datetime, timedelta
@@ -23,6 +22,11 @@ import json
 import sys
 import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sa-utils', 'data-utils'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sa-utils'))
+from column_transformers import DictFlattener
+from sa_utils.aws_utilities import get_client
+
 # Force unbuffered output
 os.environ['PYTHONUNBUFFERED'] = '1'
 sys.stdout.reconfigure(line_buffering=True) if hasattr(sys.stdout, 'reconfigure') else None
@@ -37,6 +41,14 @@ token_expiry = None
 # ESD API Config
 BASE_URL = "https://guru-ren.eschooldata.com:443/api"
 
+def aws_credentials():
+    """Current AWS credentials; clients are cached per credential set"""
+    return {
+        'aws_access_key_id': AWS_ACCESS_KEY,
+        'aws_secret_access_key': AWS_SECRET_KEY,
+        'aws_session_token': AWS_SESSION_TOKEN,
+    }
+
 def prompt_aws_credentials():
     """Prompt user for AWS credentials"""
     global AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_SESSION_TOKEN
@@ -55,13 +67,7 @@ def validate_aws_credentials():
         return False
     
     try:
-        client = boto3.client(
-            'sts',
-            aws_access_key_id=AWS_ACCESS_KEY,
-            aws_secret_access_key=AWS_SECRET_KEY,
-            aws_session_token=AWS_SESSION_TOKEN,
-            region_name='us-east-1'
-        )
+        client = get_client('sts', 'us-east-1', aws_credentials())
         client.get_caller_identity()
         return True
     except Exception:
@@ -73,13 +79,7 @@ def get_esd_credentials():
     for attempt in range(max_retries):
         try:
             print(f"  → Retrieving ESD credentials from Secrets Manager (attempt {attempt + 1}/{max_retries})...")
-            client = boto3.client(
-                'secretsmanager',
-                aws_access_key_id=AWS_ACCESS_KEY,
-                aws_secret_access_key=AWS_SECRET_KEY,
-                aws_session_token=AWS_SESSION_TOKEN,
-                region_name='us-east-1'
-            )
+            client = get_client('secretsmanager', 'us-east-1', aws_credentials())
             secret = client.get_secret_value(SecretId="prod/edna/esd_api_token")
             creds = json.loads(secret['SecretString'])
             print("  ✅ ESD credentials retrieved")
@@ -124,17 +124,9 @@ def refresh_token_if_needed():
         return get_esd_token()
     return None, None
 
-def flatten_dict(d, parent_key='', sep='_'):
-    """Flatten nested dict preserving original key names"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        else:
-            # Convert all values to strings to avoid schema issues
-            items.append((new_key, str(v) if v is not None else None))
-    return dict(items)
+# Flattens nested records preserving original key names; values become
+# strings to avoid schema issues. The key layout is learned once per shape.
+record_flattener = DictFlattener()
 
 def fetch_schools(headers: dict) -> list:
     """Fetch all schools with pagination"""
@@ -186,7 +178,7 @@ def fetch_period_attendance(school_id: int, headers: dict, school_year_id: int =
         
         # Flatten and add schoolId to each record
         for record in records:
-            flat_record = flatten_dict(record)
+            flat_record = record_flattener.flatten(record)
             flat_record['schoolId'] = school_id
             all_records.append(flat_record)
             
@@ -204,12 +196,7 @@ def fetch_period_attendance(school_id: int, headers: dict, school_year_id: int =
 
 def get_existing_s3_data(bucket: str, school_year_id: int = 55) -> set:
     """Get set of (school_id, date) tuples already in S3"""
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        aws_session_token=AWS_SESSION_TOKEN
-    )
+    s3 = get_client('s3', credentials=aws_credentials())
     
     existing = set()
     prefix = f"raw_esd/incoming/periodAttendance/operational/landing/unnested_period_attendance/"
@@ -243,12 +230,7 @@ def get_existing_s3_data(bucket: str, school_year_id: int = 55) -> set:
 
 def upload_to_s3_by_date(records: list, bucket: str, school_year_id: int = 55):
     """Upload data partitioned by school_id, then date in both JSON and Parquet"""
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY,
-        aws_session_token=AWS_SESSION_TOKEN
-    )
+    s3 = get_client('s3', credentials=aws_credentials())
     
     # Group by school_id and date
     from collections import defaultdict
@@ -3,7 +3,6 @@
 Incremental ESD Period Attendance Fetcher
 Runs continuously, fetching only missing data per school per day
 """
-import boto3
 import requests
 import polars as pl
 import json
@@ -14,7 +13,7 @@ from datetime import datetime
 from collections import defaultdict
 from io import BytesIO
 
-sys.path.insert(0, '/Users/chris.cestari/Documents/GitHub/sa-stuff/sa-utils/aws-utils')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sa-utils', 'aws-utils'))
 from credential_manager import CredentialManager
 
 # Force unbuffered output
@@ -39,8 +38,7 @@ def save_progress(progress):
 
 def get_esd_token(cred_mgr):
     """Get ESD OAuth token"""
-    session = cred_mgr.get_session()
-    client = session.client('secretsmanager')
+    client = cred_mgr.get_client('secretsmanager')
     secret = client.get_secret_value(SecretId="prod/edna/esd_api_token")
     creds = json.loads(secret['SecretString'])
     response = requests.post(creds['ESD_URL'], data={
@@ -102,8 +100,7 @@ def fetch_period_attendance(school_id, headers, cred_mgr):
 
 def upload_to_s3(records, cred_mgr):
     """Upload records to S3 partitioned by date"""
-    session = cred_mgr.get_session()
-    s3 = session.client('s3')
+    s3 = cred_mgr.get_client('s3')
     
     grouped = defaultdict(lambda: defaultdict(list))
     for record in records:
@@ -145,7 +142,9 @@ def main():
     # Validate credentials
     print("\n[STEP 1] Validating AWS Credentials")
     print("-"*70)
-    cred_mgr = CredentialManager('/Users/chris.cestari/Documents/GitHub/sa-stuff/credentials.yaml')
+    # Long runs refresh expiring credentials from credentials.yaml, the
+    # environment or AWS_PROFILE (SSO / credential_process) without prompting
+    cred_mgr = CredentialManager(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'credentials.yaml'))
     cred_mgr.ensure_valid_credentials()
     
     # Get ESD token
@@ -184,7 +183,15 @@ def main():
             records = fetch_period_attendance(school_id, headers, cred_mgr)
             
             if records:
-                uploaded = upload_to_s3(records, cred_mgr)
+                try:
+                    uploaded = upload_to_s3(records, cred_mgr)
+                except Exception as e:
+                    if not cred_mgr.is_expired_error(e):
+                        raise
+                    # Credentials expired mid-run: refresh and retry this school once
+                    print("🔄 AWS credentials expired, refreshing...", end=" ", flush=True)
+                    cred_mgr.invalidate()
+                    uploaded = upload_to_s3(records, cred_mgr)
                 total_fetched += len(records)
                 total_uploaded += uploaded
                 schools_processed += 1
@@ -1,103 +1,249 @@
 #!/usr/bin/env python3
-"""Backfill talent_acquisition.edna_stream_greenhouse from talent_acquisition.raw_greenhouse"""
-import psycopg2
-import yaml
+"""
+Backfill talent_acquisition.edna_stream_greenhouse from talent_acquisition.raw_greenhouse
+
+Copies missing rows in chunks of created_at (default, --chunk-days) or id
+(--by id, --chunk-size) ranges. Each chunk is its own transaction, so locks
+are held for one chunk at a time, and the last completed range is written
+to a checkpoint file; rerunning after a failure resumes from there.
+
+Usage:
+    python backfill_from_raw.py                       # 1-day created_at chunks
+    python backfill_from_raw.py --by id --chunk-size 50000
+    python backfill_from_raw.py --restart             # ignore the checkpoint
+"""
+import argparse
 import json
-from datetime import datetime
-
-print("=" * 60)
-print("Greenhouse Data Backfill")
-print("=" * 60)
-
-# Load credentials
-with open('credentials.yaml') as f:
-    creds = yaml.safe_load(f)
-
-with open('config.json') as f:
-    config = json.load(f)
-
-# Get Redshift password
-redshift_password = input("Enter Redshift password: ")
-
-# Connect to Redshift
-print("\nConnecting to Redshift...")
-conn = psycopg2.connect(
-    host=config['redshift']['cluster_endpoint'],
-    port=config['redshift']['cluster_port'],
-    database=config['redshift']['database'],
-    user=config['redshift']['admin_user'],
-    password=redshift_password
-)
-conn.autocommit = False
-cursor = conn.cursor()
-
-# Get date range to backfill
-print("\nChecking data gaps...")
-cursor.execute("""
-    SELECT 
-        MIN(created_at) as earliest,
-        MAX(created_at) as latest,
-        COUNT(*) as count
-    FROM talent_acquisition.raw_greenhouse
-""")
-raw_stats = cursor.fetchone()
-
-cursor.execute("""
-    SELECT 
-        MIN(created_at) as earliest,
-        MAX(created_at) as latest,
-        COUNT(*) as count
-    FROM talent_acquisition.edna_stream_greenhouse.applications
-""")
-stream_stats = cursor.fetchone()
-
-print(f"\nRaw table: {raw_stats[2]:,} records ({raw_stats[0]} to {raw_stats[1]})")
-print(f"Stream table: {stream_stats[2]:,} records ({stream_stats[0]} to {stream_stats[1]})")
-
-# Find missing records
-print("\nFinding missing records...")
-cursor.execute("""
-    SELECT COUNT(*)
-    FROM talent_acquisition.raw_greenhouse r
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM talent_acquisition.edna_stream_greenhouse.applications s
-        WHERE s.id = r.id
-    )
-""")
-missing_count = cursor.fetchone()[0]
+import os
+import time
+from datetime import datetime, timedelta
 
-print(f"Missing records: {missing_count:,}")
+import psycopg2
+import yaml
 
-if missing_count == 0:
-    print("\n✅ No missing records - backfill not needed")
-    cursor.close()
-    conn.close()
-    exit(0)
+SOURCE_TABLE = 'talent_acquisition.raw_greenhouse'
+TARGET_TABLE = 'talent_acquisition.edna_stream_greenhouse.applications'
+MAX_CHUNK_RETRIES = 3
+
+
+def load_checkpoint(path, run_key):
+    """Return the saved checkpoint for this run, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('run') != run_key:
+        print(f"⚠️ Checkpoint {path} is for a different run - ignoring it")
+        return None
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves it half-written"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def to_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', ''))
+
+
+def chunk_ranges(by, start, end, chunk_days, chunk_size):
+    """Yield [lo, hi) ranges covering start..end (inclusive)"""
+    if by == 'created_at':
+        step = timedelta(days=chunk_days)
+        lo = start
+        while lo <= end:
+            yield lo, lo + step
+            lo += step
+    else:
+        lo = int(start)
+        while lo <= int(end):
+            yield lo, lo + chunk_size
+            lo += chunk_size
+
+
+def insert_chunk(cursor, by, lo, hi):
+    """Insert the missing rows of one range; returns the row count"""
+    # Target rows are copies of source rows, so the anti-join side is
+    # restricted to the same range and each chunk scans only its slice
+    if lo is None:
+        # Rows without created_at never fall in a range - one final chunk for them
+        where = f"r.{by} IS NULL"
+        target_where = f"AND s.{by} IS NULL"
+        params = ()
+    else:
+        where = f"r.{by} >= %s AND r.{by} < %s"
+        target_where = f"AND s.{by} >= %s AND s.{by} < %s"
+        params = (lo, hi, lo, hi)
+
+    cursor.execute(f"""
+        INSERT INTO {TARGET_TABLE}
+        SELECT * FROM {SOURCE_TABLE} r
+        WHERE {where}
+        AND NOT EXISTS (
+            SELECT 1
+            FROM {TARGET_TABLE} s
+            WHERE s.id = r.id {target_where}
+        )
+    """, params)
+    return cursor.rowcount
+
+
+def run_chunk(conn, cursor, by, lo, hi):
+    """Run one chunk in its own transaction, retrying transient failures"""
+    for attempt in range(1, MAX_CHUNK_RETRIES + 1):
+        try:
+            rows = insert_chunk(cursor, by, lo, hi)
+            conn.commit()
+            return rows
+        except psycopg2.Error as e:
+            conn.rollback()
+            if attempt == MAX_CHUNK_RETRIES:
+                raise
+            wait = 5 * attempt
+            print(f"   ⚠️ Chunk failed (attempt {attempt}): {e.pgerror or e} - retrying in {wait}s")
+            time.sleep(wait)
+
+
+def format_bound(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chunked, resumable Greenhouse backfill')
+    parser.add_argument('--by', choices=['created_at', 'id'], default='created_at',
+                        help='Column to split the work on')
+    parser.add_argument('--chunk-days', type=float, default=1.0, help='created_at range per chunk')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='id range per chunk')
+    parser.add_argument('--checkpoint', default='.backfill_checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    parser.add_argument('--yes', action='store_true', help='Do not ask for confirmation')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Greenhouse Data Backfill")
+    print("=" * 60)
+
+    # Load credentials
+    with open('credentials.yaml') as f:
+        creds = yaml.safe_load(f)
+
+    with open('config.json') as f:
+        config = json.load(f)
+
+    # Get Redshift password
+    redshift_password = os.environ.get('REDSHIFT_PASSWORD') or input("Enter Redshift password: ")
+
+    # Connect to Redshift
+    print("\nConnecting to Redshift...")
+    conn = psycopg2.connect(
+        host=config['redshift']['cluster_endpoint'],
+        port=config['redshift']['cluster_port'],
+        database=config['redshift']['database'],
+        user=config['redshift']['admin_user'],
+        password=redshift_password
+    )
+    conn.autocommit = False
+    cursor = conn.cursor()
+
+    # Range of the source - cheap metadata-style aggregates, no anti-join
+    cursor.execute(f"""
+        SELECT MIN({args.by}), MAX({args.by}), COUNT(*),
+               SUM(CASE WHEN {args.by} IS NULL THEN 1 ELSE 0 END)
+        FROM {SOURCE_TABLE}
+    """)
+    start, end, total, null_rows = cursor.fetchone()
+    conn.commit()
+
+    print(f"\nRaw table: {total:,} records ({args.by} {start} to {end})")
+    if start is None:
+        print("\n✅ Raw table is empty - backfill not needed")
+        cursor.close()
+        conn.close()
+        return
+
+    if args.by == 'created_at':
+        start, end = to_datetime(start), to_datetime(end)
+
+    run_key = f"{SOURCE_TABLE}->{TARGET_TABLE} by {args.by}"
+    checkpoint = None if args.restart else load_checkpoint(args.checkpoint, run_key)
+    if checkpoint is None:
+        checkpoint = {'run': run_key, 'completed_until': None, 'nulls_done': False,
+                      'chunks_done': 0, 'rows_inserted': 0, 'started_at': datetime.utcnow().isoformat()}
+    elif checkpoint['completed_until'] is not None:
+        # Continue from the end of the last committed chunk (chunk size may differ)
+        start = checkpoint['completed_until']
+        if args.by == 'created_at':
+            start = to_datetime(start)
+        print(f"Resuming from {checkpoint['completed_until']} "
+              f"({checkpoint['chunks_done']} chunks, {checkpoint['rows_inserted']:,} rows done)")
+
+    todo = list(chunk_ranges(args.by, start, end, args.chunk_days, args.chunk_size))
+    if null_rows and not checkpoint['nulls_done']:
+        if args.by == 'id':
+            print(f"⚠️ Skipping {null_rows:,} rows with NULL id (cannot be de-duplicated)")
+        else:
+            todo.append((None, None))
+
+    print(f"Chunks to process: {len(todo)}")
+    if not todo:
+        print("\n✅ Nothing left to backfill")
+        cursor.close()
+        conn.close()
+        return
+
+    if not args.yes:
+        confirm = input(f"\nBackfill {len(todo)} chunks? (yes/no): ")
+        if confirm.lower() != 'yes':
+            print("Cancelled")
+            cursor.close()
+            conn.close()
+            return
+
+    # Backfill
+    print("\nBackfilling...")
+    run_started = time.time()
+    run_rows = 0
+    try:
+        for n, (lo, hi) in enumerate(todo, 1):
+            chunk_started = time.time()
+            rows = run_chunk(conn, cursor, args.by, lo, hi)
+            elapsed = time.time() - chunk_started
+
+            run_rows += rows
+            checkpoint['chunks_done'] += 1
+            checkpoint['rows_inserted'] += rows
+            if lo is None:
+                checkpoint['nulls_done'] = True
+            else:
+                checkpoint['completed_until'] = format_bound(hi)
+            checkpoint['updated_at'] = datetime.utcnow().isoformat()
+            save_checkpoint(args.checkpoint, checkpoint)
+
+            run_elapsed = time.time() - run_started
+            eta = run_elapsed / n * (len(todo) - n)
+            label = f"{args.by} IS NULL" if lo is None else f"[{format_bound(lo)}, {format_bound(hi)})"
+            print(f"   [{n}/{len(todo)}] {label}: {rows:,} rows in {elapsed:.1f}s "
+                  f"({rows / max(elapsed, 1e-6):,.0f} rows/s), "
+                  f"total {run_rows:,} ({run_rows / max(run_elapsed, 1e-6):,.0f} rows/s), ETA {eta / 60:.1f} min")
+    except (psycopg2.Error, KeyboardInterrupt) as e:
+        print(f"\n❌ Stopped: {e}")
+        print(f"Progress saved to {args.checkpoint} - rerun to resume")
+        cursor.close()
+        conn.close()
+        raise SystemExit(1)
+
+    print(f"\n✅ Backfill complete: {run_rows:,} records inserted in "
+          f"{time.time() - run_started:.1f}s ({checkpoint['rows_inserted']:,} across all runs)")
 
-confirm = input(f"\nBackfill {missing_count:,} records? (yes/no): ")
-if confirm.lower() != 'yes':
-    print("Cancelled")
     cursor.close()
     conn.close()
-    exit(0)
-
-# Backfill
-print("\nBackfilling...")
-cursor.execute("""
-    INSERT INTO talent_acquisition.edna_stream_greenhouse.applications
-    SELECT * FROM talent_acquisition.raw_greenhouse r
-    WHERE NOT EXISTS (
-        SELECT 1 
-        FROM talent_acquisition.edna_stream_greenhouse.applications s
-        WHERE s.id = r.id
-    )
-""")
-
-rows_inserted = cursor.rowcount
-conn.commit()
 
-print(f"\n✅ Backfill complete: {rows_inserted:,} records inserted")
 
-cursor.close()
-conn.close()
+if __name__ == "__main__":
+    main()
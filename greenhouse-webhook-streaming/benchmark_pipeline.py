@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the Greenhouse pipeline with no AWS account or cluster
+
+Runs the real handlers against the in-process FakeAws and loads the files
+they write into Postgres standing in for Redshift
+(see sa-utils/webhook-utils/pipeline_harness.py). The webhook handler is
+the one update_lambda_with_retry.py deploys (its lambda_code), which sends
+every webhook to SQS; lambda_function.py here only parses and logs, so it
+is not benchmarked. Stages:
+
+  lambda_ingest        deployed lambda_handler on API Gateway events, one
+                       call per webhook -> one SQS message each
+  sqs_worker           sqs_worker.lambda_handler on SQS events of
+                       --batch-size of those messages -> gzip copy-job/
+                       files (plus per-entity Parquet with --parquet)
+  redshift_load[flat]  each copy-job/ file flattened with greenhouse_flatten
+                       and loaded into the applications/candidates/jobs _flat
+                       tables, one COPY per entity per file
+  sqs_send_batch       sqs_worker.send_webhooks (SendMessageBatch, the
+                       backfill path) for --batch-size webhook envelopes per
+                       call; the messages are discarded
+  firehose_transform   deployed lambda_handler on Firehose transformation
+                       events of --firehose-batch records
+
+Webhooks are generated from --seed (or replayed from --payloads), so every
+run and every results file sees the same input.
+
+Usage:
+    python benchmark_pipeline.py --output pipeline_baseline.json
+    python benchmark_pipeline.py --baseline pipeline_baseline.json   # exit 1 on regression
+"""
+import argparse
+import ast
+import gzip
+import json
+import os
+import random
+import sys
+import types
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'sa-utils', 'webhook-utils'))
+from load_generator import MockContext, api_gateway_event, load_payloads
+from pipeline_harness import add_benchmark_arguments, benchmark, firehose_event, sqs_event, time_stage
+
+import greenhouse_flatten
+import sqs_worker
+
+SCHEMA = 'edna_stream_greenhouse'
+ACTIONS = ['application_updated', 'candidate_stage_change', 'new_candidate_application', 'prospect_created']
+STAGES = ['Application Review', 'Phone Screen', 'Demo Lesson', 'Interview', 'Offer']
+OFFICES = ['Bronx', 'Brooklyn', 'Manhattan', 'Queens']
+
+
+def synthetic_webhook(rng, i):
+    """A Greenhouse application webhook with the fields greenhouse_flatten reads"""
+    job_id = 4000 + rng.randrange(40)
+    stamp = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00.000Z"
+    candidate = {
+        'id': 900000 + i,
+        'first_name': f"Candidate{i}",
+        'last_name': 'Benchmark',
+        'company': rng.choice(['Success Academy', 'NYC DOE', None]),
+        'title': rng.choice(['Teacher', 'Associate Teacher', 'Operations Associate']),
+        'created_at': stamp,
+        'updated_at': stamp,
+        'last_activity': stamp,
+        'is_private': False,
+        'recruiter': {'id': 100 + rng.randrange(10)},
+        'coordinator': {'id': 200 + rng.randrange(10)},
+        'email_addresses': [{'value': f"candidate{i}@example.com", 'type': 'personal'}],
+        'phone_numbers': [{'value': f"555-{i % 10000:04d}", 'type': 'mobile'}],
+        'tags': rng.sample(['teacher', 'bilingual', 'referral', 'returning'], 2),
+    }
+    job = {
+        'id': job_id,
+        'name': f"Teacher {job_id}",
+        'requisition_id': f"REQ-{job_id}",
+        'status': 'open',
+        'confidential': False,
+        'opened_at': stamp,
+        'closed_at': None,
+        'created_at': stamp,
+        'updated_at': stamp,
+        'departments': [{'name': 'Teaching'}],
+        'offices': [{'name': rng.choice(OFFICES)}],
+    }
+    stage = rng.randrange(len(STAGES))
+    application = {
+        'id': 7000000 + i,
+        'candidate': candidate,
+        'prospect': False,
+        'status': 'active',
+        'applied_at': stamp,
+        'rejected_at': None,
+        'last_activity_at': stamp,
+        'source': {'id': 11, 'public_name': rng.choice(['LinkedIn', 'Indeed', 'Referral'])},
+        'current_stage': {'id': 500 + stage, 'name': STAGES[stage]},
+        'credited_to': {'id': 100 + rng.randrange(10)},
+        'rejection_reason': None,
+        'jobs': [job],
+    }
+    return {'action': rng.choice(ACTIONS), 'payload': {'application': application}}
+
+
+def webhook_bodies(count, seed, paths=None):
+    rng = random.Random(seed)
+    if paths:
+        payloads = load_payloads(paths)
+        if not payloads:
+            raise SystemExit("❌ No payloads to replay")
+        return [json.dumps(rng.choice(payloads)) for _ in range(count)]
+    return [json.dumps(synthetic_webhook(rng, i)) for i in range(count)]
+
+
+def deployed_lambda():
+    """The webhook handler update_lambda_with_retry.py deploys, loaded as a module"""
+    path = os.path.join(HERE, 'update_lambda_with_retry.py')
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    code = next(node.value.value for node in tree.body if isinstance(node, ast.Assign)
+                and any(getattr(target, 'id', None) == 'lambda_code' for target in node.targets))
+    module = types.ModuleType('deployed_lambda_function')
+    exec(compile(code, f"{path}:lambda_code", 'exec'), module.__dict__)
+    return module
+
+
+def ingest_stage(handler, fake, bodies):
+    calls = [(api_gateway_event(body, f"bench-{i:06d}"), MockContext(f"bench-{i:06d}"))
+             for i, body in enumerate(bodies)]
+
+    def invoke(call):
+        result = handler.lambda_handler(*call)
+        if result['statusCode'] != 200:
+            raise RuntimeError(result['body'])
+
+    result = time_stage('lambda_ingest', calls, invoke)
+    queued = len(fake.queues[handler.QUEUE_URL])
+    if queued != len(bodies):
+        raise RuntimeError(f"{queued} messages queued for {len(bodies)} webhooks")
+    return result
+
+
+def send_stage(fake, queue_url, bodies, batch_size):
+    # The envelope the webhook Lambda builds around each body
+    envelopes = [{
+        'timestamp': '2025-12-08T12:00:00.000000Z',
+        'source': 'greenhouse_webhook',
+        'lambda_request_id': f"bench-{i:06d}",
+        'environment': 'benchmark',
+        'payload': json.loads(body),
+    } for i, body in enumerate(bodies)]
+    batches = [envelopes[start:start + batch_size] for start in range(0, len(envelopes), batch_size)]
+
+    def send(batch):
+        failed = sqs_worker.send_webhooks(batch, queue_url=queue_url)
+        if failed:
+            raise RuntimeError(f"{len(failed)} webhooks not sent")
+
+    result = time_stage('sqs_send_batch', batches, send, items=lambda batch, _: len(batch))
+    fake.queues.pop(queue_url, None)
+    return result
+
+
+def worker_stage(fake, queue_url, batch_size):
+    events = []
+    while fake.queues[queue_url]:
+        events.append(sqs_event(fake.take_messages(queue_url, batch_size)))
+
+    def invoke(event):
+        failures = sqs_worker.lambda_handler(event, MockContext('bench-worker'))['batchItemFailures']
+        if failures:
+            raise RuntimeError(f"{len(failures)} messages failed")
+
+    return time_stage('sqs_worker', events, invoke, items=lambda event, _: len(event['Records']))
+
+
+def load_stage(fake, target):
+    def load(key):
+        # A COPY JOB loads each file once
+        body = gzip.decompress(fake.objects.pop((sqs_worker.COPY_BUCKET, key)))
+        rows = greenhouse_flatten.flatten_webhooks(json.loads(line) for line in body.splitlines() if line.strip())
+        return sum(target.copy_rows(f"{SCHEMA}.{greenhouse_flatten.table_name(entity)}", entity_rows)
+                   for entity, entity_rows in rows.items())
+
+    keys = fake.keys(sqs_worker.COPY_BUCKET, sqs_worker.COPY_PREFIX)
+    return time_stage('redshift_load[flat]', keys, load, items=lambda _, rows: rows)
+
+
+def firehose_stage(handler, bodies, batch_size):
+    events = [firehose_event([body.encode('utf-8') for body in bodies[start:start + batch_size]])
+              for start in range(0, len(bodies), batch_size)]
+
+    def invoke(event):
+        failed = sum(1 for r in handler.lambda_handler(event, None)['records'] if r['result'] != 'Ok')
+        if failed:
+            raise RuntimeError(f"{failed} records failed")
+
+    return time_stage('firehose_transform', events, invoke, items=lambda event, _: len(event['records']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Greenhouse pipeline locally, stage by stage')
+    parser.add_argument('--payloads', nargs='+', help='Replay webhook files instead of generated webhooks')
+    parser.add_argument('--parquet', action='store_true', help='Also write per-entity Parquet (needs polars)')
+    add_benchmark_arguments(parser)
+    args = parser.parse_args()
+
+    bodies = webhook_bodies(args.webhooks, args.seed, args.payloads)
+    sqs_worker.PARQUET_PREFIX = 'parquet/' if args.parquet else ''
+
+    def run_once(fake, target):
+        # Loaded per run: the deployed code creates its SQS client at import
+        handler = deployed_lambda()
+        results = [ingest_stage(handler, fake, bodies), worker_stage(fake, handler.QUEUE_URL, args.batch_size)]
+        if target is not None:
+            for entity in greenhouse_flatten.ENTITY_FIELDS:
+                target.create_table(greenhouse_flatten.redshift_table_ddl(entity, SCHEMA))
+            results.append(load_stage(fake, target))
+            counts = ', '.join(f"{entity}={target.count(f'{SCHEMA}.{greenhouse_flatten.table_name(entity)}'):,}"
+                               for entity in greenhouse_flatten.ENTITY_FIELDS)
+            print(f"   ✅ Postgres _flat rows: {counts}")
+        results.append(send_stage(fake, handler.QUEUE_URL, bodies, args.batch_size))
+        results.append(firehose_stage(handler, bodies, args.firehose_batch))
+        return results
+
+    settings = {
+        'webhooks': args.webhooks,
+        'seed': args.seed,
+        'payloads': ' '.join(args.payloads) if args.payloads else 'generated',
+        'batch_size': args.batch_size,
+        'parquet': args.parquet,
+        'firehose_batch': args.firehose_batch,
+        'firehose_mode': os.environ.get('FIREHOSE_TRANSFORM_MODE', 'passthrough').lower(),
+    }
+    sys.exit(benchmark('greenhouse', run_once, settings, repeat=args.repeat, warmup=args.warmup,
+                       stub_latency_ms=args.stub_latency_ms, pg_dsn=args.pg_dsn,
+                       output=args.output, baseline=args.baseline, tolerance=args.tolerance))
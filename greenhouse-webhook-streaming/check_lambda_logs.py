@@ -1,63 +1,57 @@
 """
 Fetch and display Lambda CloudWatch logs
 Utility for monitoring Lambda execution
+
+Logs Insights queries for every function run in parallel; a finished
+query over a past window is served from the local cache on reruns.
 """
-import boto3
+import os
+import sys
 from datetime import datetime, timedelta
 
-def get_lambda_logs(function_name, hours=1, limit=50):
-    """Fetch recent Lambda logs from CloudWatch"""
-    
-    logs = boto3.client('logs', region_name='us-east-1')
-    log_group = f'/aws/lambda/{function_name}'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'aws-utils'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils'))
+from log_insights import LogInsights, ERRORS_QUERY, LAMBDA_SUMMARY_QUERY, RECENT_QUERY, print_result
+from sa_utils.aws_utilities import get_client
+
+def get_lambda_logs(function_names, hours=1, limit=50):
+    """Fetch recent Lambda logs, invocation stats and errors from CloudWatch"""
+    if isinstance(function_names, str):
+        function_names = [function_names]
     
     # Calculate time range
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(hours=hours)
     
-    print(f"Fetching logs for: {function_name}")
+    print(f"Fetching logs for: {', '.join(function_names)}")
     print(f"Time range: {start_time} to {end_time} UTC")
-    print(f"Log group: {log_group}")
     print("=" * 80)
     
+    queries = {}
+    for function_name in function_names:
+        log_group = f'/aws/lambda/{function_name}'
+        queries[(function_name, 'summary')] = (log_group, LAMBDA_SUMMARY_QUERY)
+        queries[(function_name, 'errors')] = (log_group, ERRORS_QUERY)
+        queries[(function_name, 'recent')] = (log_group, RECENT_QUERY)
+    
     try:
-        # Get log streams
-        streams_response = logs.describe_log_streams(
-            logGroupName=log_group,
-            orderBy='LastEventTime',
-            descending=True,
-            limit=5
-        )
-        
-        if not streams_response.get('logStreams'):
-            print("[WARNING] No log streams found")
-            return
-        
-        # Get events from recent streams
-        for stream in streams_response['logStreams']:
-            stream_name = stream['logStreamName']
-            print(f"\nStream: {stream_name}")
-            print("-" * 80)
-            
-            events_response = logs.get_log_events(
-                logGroupName=log_group,
-                logStreamName=stream_name,
-                startTime=int(start_time.timestamp() * 1000),
-                endTime=int(end_time.timestamp() * 1000),
-                limit=limit
-            )
-            
-            for event in events_response.get('events', []):
-                timestamp = datetime.fromtimestamp(event['timestamp'] / 1000)
-                message = event['message'].strip()
-                print(f"[{timestamp}] {message}")
-        
-        print("\n" + "=" * 80)
-        
+        insights = LogInsights(get_client('logs', 'us-east-1'))
+        results = insights.run(queries, start_time, end_time, limit=limit)
     except Exception as e:
         print(f"[ERROR] {e}")
-        print("\nMake sure you have AWS credentials configured and permissions to read CloudWatch logs")
+        print("\nMake sure you have AWS credentials configured and permissions to run CloudWatch Logs Insights queries")
+        return None
+    
+    for function_name in function_names:
+        print(f"\n{function_name}")
+        print("-" * 80)
+        print_result('Invocations', results[(function_name, 'summary')])
+        print_result('Errors', results[(function_name, 'errors')], max_rows=25)
+        print_result('Recent events', results[(function_name, 'recent')])
+    
+    print("\n" + "=" * 80)
+    return results
 
 if __name__ == '__main__':
-    function_name = 'greenhouse-webhook-processor'
-    get_lambda_logs(function_name, hours=24, limit=100)
+    function_names = ['greenhouse-webhook-processor', 'greenhouse-sqs-worker']
+    get_lambda_logs(function_names, hours=24, limit=100)
@@ -5,8 +5,12 @@ Utility for updating Lambda code
 import boto3
 import zipfile
 import os
+import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'webhook-utils'))
+from lambda_package import add_shared_modules
+
 def create_deployment_package(source_file='lambda_function.py'):
     """Create Lambda deployment zip"""
     
@@ -16,6 +20,7 @@ def create_deployment_package(source_file='lambda_function.py'):
     
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         zipf.write(source_file, 'lambda_function.py')
+        add_shared_modules(zipf)
     
     size = os.path.getsize(zip_path)
     print(f"[OK] Created {zip_path} ({size} bytes)")
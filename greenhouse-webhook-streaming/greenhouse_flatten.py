@@ -0,0 +1,282 @@
+"""
+Flatten Greenhouse webhooks into typed per-entity tables
+
+Greenhouse webhooks ({"action": ..., "payload": {...}}) embed the objects
+they are about: application (with its candidate and jobs), candidate,
+job. Each object found in a webhook becomes one row in its entity table
+(applications, candidates, jobs), tagged with the webhook action and
+timestamp, so analytics queries read typed columns instead of parsing JSON.
+
+One field spec per entity drives the row extraction, the Parquet schema
+and the Redshift DDL. Parquet files are partitioned by event date:
+    <prefix><entity>/event_date=YYYY-MM-DD/part-<id>.parquet
+
+Local conversion of queued/COPY NDJSON files (plain or .gz):
+    python greenhouse_flatten.py copy-job/*.json.gz --out parquet/
+    python greenhouse_flatten.py --ddl talent_acquisition.edna_stream_greenhouse
+"""
+import argparse
+import glob
+import gzip
+import io
+import os
+import sys
+import uuid
+from collections import namedtuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+import json_codec
+
+# dtype: int | bool | str | timestamp | json (nested value kept as JSON text)
+Field = namedtuple('Field', ['column', 'path', 'dtype'])
+
+REDSHIFT_TYPES = {
+    'int': 'BIGINT',
+    'bool': 'BOOLEAN',
+    'str': 'VARCHAR(1024)',
+    'timestamp': 'TIMESTAMP',
+    'json': 'VARCHAR(65535)',
+}
+
+# Metadata on every row (from the Lambda envelope and the webhook body)
+META_FIELDS = (
+    Field('action', None, 'str'),
+    Field('webhook_timestamp', None, 'timestamp'),
+    Field('lambda_request_id', None, 'str'),
+)
+
+APPLICATION_FIELDS = (
+    Field('id', ('id',), 'int'),
+    Field('candidate_id', ('candidate', 'id'), 'int'),
+    Field('prospect', ('prospect',), 'bool'),
+    Field('status', ('status',), 'str'),
+    Field('applied_at', ('applied_at',), 'timestamp'),
+    Field('rejected_at', ('rejected_at',), 'timestamp'),
+    Field('last_activity_at', ('last_activity_at',), 'timestamp'),
+    Field('source_id', ('source', 'id'), 'int'),
+    Field('source_name', ('source', 'public_name'), 'str'),
+    Field('current_stage_id', ('current_stage', 'id'), 'int'),
+    Field('current_stage_name', ('current_stage', 'name'), 'str'),
+    Field('credited_to_id', ('credited_to', 'id'), 'int'),
+    Field('rejection_reason', ('rejection_reason', 'name'), 'str'),
+    Field('job_id', ('jobs', 0, 'id'), 'int'),
+    Field('job_name', ('jobs', 0, 'name'), 'str'),
+)
+
+CANDIDATE_FIELDS = (
+    Field('id', ('id',), 'int'),
+    Field('first_name', ('first_name',), 'str'),
+    Field('last_name', ('last_name',), 'str'),
+    Field('company', ('company',), 'str'),
+    Field('title', ('title',), 'str'),
+    Field('created_at', ('created_at',), 'timestamp'),
+    Field('updated_at', ('updated_at',), 'timestamp'),
+    Field('last_activity', ('last_activity',), 'timestamp'),
+    Field('is_private', ('is_private',), 'bool'),
+    Field('recruiter_id', ('recruiter', 'id'), 'int'),
+    Field('coordinator_id', ('coordinator', 'id'), 'int'),
+    Field('email', ('email_addresses', 0, 'value'), 'str'),
+    Field('phone', ('phone_numbers', 0, 'value'), 'str'),
+    Field('tags', ('tags',), 'json'),
+)
+
+JOB_FIELDS = (
+    Field('id', ('id',), 'int'),
+    Field('name', ('name',), 'str'),
+    Field('requisition_id', ('requisition_id',), 'str'),
+    Field('status', ('status',), 'str'),
+    Field('confidential', ('confidential',), 'bool'),
+    Field('opened_at', ('opened_at',), 'timestamp'),
+    Field('closed_at', ('closed_at',), 'timestamp'),
+    Field('created_at', ('created_at',), 'timestamp'),
+    Field('updated_at', ('updated_at',), 'timestamp'),
+    Field('department', ('departments', 0, 'name'), 'str'),
+    Field('office', ('offices', 0, 'name'), 'str'),
+)
+
+ENTITY_FIELDS = {
+    'applications': APPLICATION_FIELDS,
+    'candidates': CANDIDATE_FIELDS,
+    'jobs': JOB_FIELDS,
+}
+
+TABLE_SUFFIX = '_flat'
+
+# Where each entity can appear inside webhook.payload; '[]' expands a list
+ENTITY_ROOTS = {
+    'applications': (('application',),),
+    'candidates': (('application', 'candidate'), ('candidate',)),
+    'jobs': (('application', 'jobs', '[]'), ('job',)),
+}
+
+
+def _get(node, path):
+    """Follow a path of dict keys / list indexes; None when anything is missing"""
+    for key in path:
+        if isinstance(key, int):
+            if not isinstance(node, list) or len(node) <= key:
+                return None
+        elif not isinstance(node, dict):
+            return None
+        node = node[key] if isinstance(key, int) else node.get(key)
+    return node
+
+
+def _find(node, path):
+    """Objects at path; '[]' expands every element of a list"""
+    nodes = [node]
+    for key in path:
+        if key == '[]':
+            nodes = [item for n in nodes if isinstance(n, list) for item in n]
+        else:
+            nodes = [n.get(key) for n in nodes if isinstance(n, dict)]
+    return [n for n in nodes if isinstance(n, dict)]
+
+
+def unwrap(webhook):
+    """(metadata, body) for a Lambda-enveloped webhook or a raw Greenhouse body"""
+    if isinstance(webhook.get('payload'), dict) and 'action' in webhook['payload']:
+        body = webhook['payload']
+        return {
+            'webhook_timestamp': webhook.get('timestamp'),
+            'lambda_request_id': webhook.get('lambda_request_id'),
+            'action': body.get('action'),
+        }, body
+    return {'webhook_timestamp': None, 'lambda_request_id': None, 'action': webhook.get('action')}, webhook
+
+
+def flatten_webhook(webhook):
+    """Rows for one webhook as {entity: [row dict, ...]}"""
+    meta, body = unwrap(webhook)
+    payload = body.get('payload')
+    rows = {}
+    if not isinstance(payload, dict):
+        return rows
+    for entity, roots in ENTITY_ROOTS.items():
+        fields = ENTITY_FIELDS[entity]
+        seen = set()
+        for root in roots:
+            for obj in _find(payload, root):
+                if obj.get('id') in seen:
+                    continue
+                seen.add(obj.get('id'))
+                row = dict(meta)
+                for field in fields:
+                    value = _get(obj, field.path)
+                    if field.dtype == 'json':
+                        value = json_codec.dumps(value) if value is not None else None
+                    row[field.column] = value
+                rows.setdefault(entity, []).append(row)
+    return rows
+
+
+def flatten_webhooks(webhooks):
+    """Rows for many webhooks as {entity: [row dict, ...]}"""
+    rows = {}
+    for webhook in webhooks:
+        for entity, entity_rows in flatten_webhook(webhook).items():
+            rows.setdefault(entity, []).extend(entity_rows)
+    return rows
+
+
+def _polars_type(pl, dtype):
+    return {
+        'int': pl.Int64,
+        'bool': pl.Boolean,
+        'str': pl.Utf8,
+        'timestamp': pl.Utf8,  # parsed after loading
+        'json': pl.Utf8,
+    }[dtype]
+
+
+def to_frame(entity, rows):
+    """Typed Polars DataFrame for one entity, plus its event_date partition column"""
+    import polars as pl
+
+    fields = META_FIELDS + ENTITY_FIELDS[entity]
+    schema = {f.column: _polars_type(pl, f.dtype) for f in fields}
+    df = pl.DataFrame(
+        {f.column: [row.get(f.column) for row in rows] for f in fields},
+        schema=schema, strict=False
+    )
+    df = df.with_columns([
+        pl.col(f.column).str.strip_chars_end('Z')
+        .str.to_datetime('%Y-%m-%dT%H:%M:%S%.f', strict=False)
+        for f in fields if f.dtype == 'timestamp'
+    ])
+    return df.with_columns(pl.col('webhook_timestamp').dt.date().alias('event_date'))
+
+
+def write_parquet(rows_by_entity, put, prefix='', batch_id=None):
+    """
+    Write each entity as Parquet, one file per event_date partition
+
+    `put(key, body)` performs the write (S3 put_object in Lambda, a local
+    file write in the CLI). Files are named part-<batch_id>.parquet, so
+    writing the same batch again overwrites them; without a batch_id each
+    call writes new files. Returns {entity: row count}.
+    """
+    part_name = batch_id or uuid.uuid4().hex[:12]
+    written = {}
+    for entity, rows in rows_by_entity.items():
+        if not rows:
+            continue
+        df = to_frame(entity, rows)
+        for (event_date,), part in df.group_by(['event_date'], maintain_order=True):
+            buffer = io.BytesIO()
+            part.drop('event_date').write_parquet(buffer, compression='snappy')
+            partition = event_date.isoformat() if event_date else 'unknown'
+            put(f"{prefix}{entity}/event_date={partition}/part-{part_name}.parquet", buffer.getvalue())
+        written[entity] = len(rows)
+    return written
+
+
+def table_name(entity):
+    """Redshift table for an entity (applications already holds the raw rows)"""
+    return f"{entity}{TABLE_SUFFIX}"
+
+
+def redshift_table_ddl(entity, schema):
+    """CREATE TABLE for an entity; column order matches the Parquet files"""
+    fields = META_FIELDS + ENTITY_FIELDS[entity]
+    body = ',\n    '.join(f"{f.column} {REDSHIFT_TYPES[f.dtype]}" for f in fields)
+    return f"CREATE TABLE IF NOT EXISTS {schema}.{table_name(entity)} (\n    {body}\n)\nDISTSTYLE AUTO\nSORTKEY (webhook_timestamp);"
+
+
+def read_ndjson_files(paths):
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield json_codec.loads(line)
+
+
+# Local conversion
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Flatten Greenhouse NDJSON into per-entity Parquet')
+    parser.add_argument('files', nargs='*', help='NDJSON files (.json / .json.gz, globs allowed)')
+    parser.add_argument('--out', default='parquet', help='Output directory')
+    parser.add_argument('--ddl', metavar='SCHEMA', help='Print CREATE TABLE statements for SCHEMA and exit')
+    args = parser.parse_args()
+
+    if args.ddl:
+        for entity in ENTITY_FIELDS:
+            print(redshift_table_ddl(entity, args.ddl) + '\n')
+        sys.exit(0)
+
+    def put_local(key, body):
+        path = os.path.join(args.out, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+
+    paths = [p for pattern in args.files for p in sorted(glob.glob(pattern))]
+    rows = flatten_webhooks(read_ndjson_files(paths))
+    written = write_parquet(rows, put_local)
+
+    print("=" * 60)
+    print(f"Flattened {len(paths)} files into {args.out}/")
+    print("=" * 60)
+    for entity, count in written.items():
+        print(f"  {entity:<14} {count:,} rows")
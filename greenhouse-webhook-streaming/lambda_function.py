@@ -2,10 +2,18 @@
 AWS Lambda function to process Greenhouse webhooks
 DEPLOYED VERSION - Dec 8, 2025
 """
-import json
-import base64
+import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+import json_codec
+
+# FIREHOSE_TRANSFORM_MODE=passthrough (default) parses every record but returns
+# those already framed as one JSON object per line as-is; parse re-serializes
+# every record
+FIREHOSE_TRANSFORM_MODE = os.environ.get('FIREHOSE_TRANSFORM_MODE', 'passthrough').lower()
+
 def lambda_handler(event, context):
     """Lambda handler for Greenhouse webhook processing"""
     
@@ -22,7 +30,7 @@ def process_api_gateway_webhook(event, context):
         body_str = event.get('body')
         if body_str is None or body_str == '':
             body_str = '{}'
-        body = json.loads(body_str)
+        body = json_codec.loads(body_str)
         
         # Add metadata
         webhook_data = {
@@ -39,7 +47,7 @@ def process_api_gateway_webhook(event, context):
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
+            'body': json_codec.dumps({
                 'status': 'success',
                 'message': 'Webhook received',
                 'request_id': context.aws_request_id
@@ -51,7 +59,7 @@ def process_api_gateway_webhook(event, context):
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
+            'body': json_codec.dumps({
                 'status': 'error',
                 'message': str(e)
             })
@@ -60,13 +68,11 @@ def process_api_gateway_webhook(event, context):
 def process_firehose_records(event, context):
     """Transform Firehose records for Redshift"""
     output_records = []
+    passthrough = FIREHOSE_TRANSFORM_MODE == 'passthrough'
     
     for record in event['records']:
         try:
-            payload = base64.b64decode(record['data']).decode('utf-8')
-            data = json.loads(payload)
-            transformed_data = json.dumps(data) + '\n'
-            encoded_data = base64.b64encode(transformed_data.encode('utf-8')).decode('utf-8')
+            encoded_data = json_codec.transform_record(record['data'], passthrough)
             
             output_records.append({
                 'recordId': record['recordId'],
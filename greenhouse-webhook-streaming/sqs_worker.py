@@ -0,0 +1,302 @@
+"""
+Batched SQS worker for Greenhouse webhooks
+
+The webhook Lambda only enqueues each webhook on greenhouse-flattened-records.
+This worker drains the queue in batches and writes each batch as one
+compacted (one compact JSON object per line), gzip NDJSON file under
+COPY_PREFIX for a Redshift COPY JOB, instead of one object per webhook.
+
+Two ways to run it:
+  lambda_handler   SQS-triggered Lambda; reports partial batch failures
+                   (enable ReportBatchItemFailures on the event source)
+  drain_queue      ReceiveMessage (10 per call) / DeleteMessageBatch loop
+                   for draining the queue from a workstation or EC2
+
+send_webhooks() enqueues many webhooks with SendMessageBatch (10 per call),
+e.g. for backfills.
+
+With PARQUET_PREFIX set, each batch is also flattened into typed per-entity
+Parquet files (applications, candidates, jobs) under
+s3://COPY_BUCKET/PARQUET_PREFIX, see greenhouse_flatten.py.
+
+Local drain:
+    python sqs_worker.py --max-messages 1000
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+import json_codec
+
+QUEUE_URL = os.environ.get(
+    'QUEUE_URL', 'https://sqs.us-east-1.amazonaws.com/309820967897/greenhouse-flattened-records'
+)
+COPY_BUCKET = os.environ.get('COPY_BUCKET', 'greenhouse-webhooks-backup-309820967897')
+COPY_PREFIX = os.environ.get('COPY_PREFIX', 'copy-job/')
+# Empty disables the per-entity Parquet output (needs polars in the package)
+PARQUET_PREFIX = os.environ.get('PARQUET_PREFIX', '')
+
+# SQS limits for the batch APIs
+MAX_BATCH_MESSAGES = 10
+MAX_BATCH_BYTES = 256 * 1024
+MAX_RETRIES = 3
+# drain_queue receives with this visibility timeout and stops filling a file
+# after half of it, so messages are deleted before they can be redelivered
+DRAIN_VISIBILITY_SECONDS = 300
+
+_clients = {}
+
+def get_client(service_name):
+    """Return a module-cached boto3 client for service_name"""
+    client = _clients.get(service_name)
+    if client is None:
+        import boto3
+        client = boto3.client(service_name)
+        _clients[service_name] = client
+    return client
+
+
+def compact_lines(messages):
+    """
+    Turn (message_id, body) pairs into compact NDJSON lines
+
+    Returns (lines, failed_ids): bodies that are not valid JSON are reported
+    in failed_ids so SQS redelivers them (and eventually dead-letters them).
+    """
+    lines, failed_ids = [], []
+    for message_id, body in messages:
+        try:
+            lines.append(json_codec.dumps_line(json_codec.loads(body)))
+        except (json_codec.JSONDecodeError, ValueError) as e:
+            print(f"❌ Invalid JSON in message {message_id}: {e}")
+            failed_ids.append(message_id)
+    return lines, failed_ids
+
+
+def batch_id(message_ids):
+    """
+    Name of a batch derived from its SQS message IDs
+
+    A redelivered batch gets the same name, so its files overwrite the ones
+    an earlier, failed attempt wrote instead of adding rows a second time.
+    """
+    return hashlib.sha1('\n'.join(sorted(message_ids)).encode('utf-8')).hexdigest()[:20]
+
+
+def oldest_sent(sent_timestamps):
+    """UTC datetime of the oldest SentTimestamp (epoch ms strings); now when none are known"""
+    sent = [int(t) for t in sent_timestamps if t]
+    return datetime.utcfromtimestamp(min(sent) / 1000) if sent else datetime.utcnow()
+
+
+def copy_key(batch, sent_at, prefix=COPY_PREFIX):
+    """COPY file key of a batch, dated by its oldest message so a retry gets the same key"""
+    return (f"{prefix}{sent_at.strftime('%Y/%m/%d')}/{sent_at.strftime('%H')}/"
+            f"{sent_at.strftime('%Y%m%dT%H%M%S')}-{batch}.json.gz")
+
+
+def write_copy_file(lines, batch, sent_at, bucket=COPY_BUCKET, prefix=COPY_PREFIX):
+    """Write NDJSON lines as one gzip object at the batch's key; returns the S3 key"""
+    key = copy_key(batch, sent_at, prefix)
+    get_client('s3').put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=gzip.compress(b''.join(lines), compresslevel=6),
+        ContentType='application/gzip'
+    )
+    print(f"✅ S3 COPY FILE: s3://{bucket}/{key} ({len(lines)} records)")
+    return key
+
+
+def write_entity_files(lines, batch, bucket=COPY_BUCKET, prefix=PARQUET_PREFIX):
+    """Flatten NDJSON lines into per-entity Parquet files named by batch; returns {entity: rows}"""
+    import greenhouse_flatten
+
+    s3 = get_client('s3')
+
+    def put(key, body):
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/octet-stream')
+
+    rows = greenhouse_flatten.flatten_webhooks(json_codec.loads(line) for line in lines)
+    written = greenhouse_flatten.write_parquet(rows, put, prefix, batch_id=batch)
+    if written:
+        counts = ', '.join(f"{entity}={count}" for entity, count in written.items())
+        print(f"✅ S3 PARQUET: s3://{bucket}/{prefix} ({counts})")
+    return written
+
+
+def write_batch(lines, batch, sent_at):
+    """
+    Write one batch: Parquet when PARQUET_PREFIX is set, then the NDJSON COPY file
+
+    The COPY file goes last so that a failed Parquet write leaves nothing for
+    the COPY JOB to load. Every file is named by `batch` (batch_id()) and the
+    COPY file is dated by `sent_at` (oldest_sent()), so a redelivered batch
+    overwrites its files rather than duplicating the rows.
+    """
+    if PARQUET_PREFIX:
+        write_entity_files(lines, batch, prefix=PARQUET_PREFIX)
+    write_copy_file(lines, batch, sent_at)
+
+
+def lambda_handler(event, context):
+    """SQS-triggered worker: one compacted gzip NDJSON file per batch"""
+    records = event.get('Records', [])
+    lines, failed_ids = compact_lines((r['messageId'], r['body']) for r in records)
+
+    if lines:
+        failed = set(failed_ids)
+        batch = [r for r in records if r['messageId'] not in failed]
+        try:
+            write_batch(lines, batch_id(r['messageId'] for r in batch),
+                        oldest_sent(r.get('attributes', {}).get('SentTimestamp') for r in batch))
+        except Exception as e:
+            # The batch did not fully reach S3 - redeliver all of it
+            print(f"❌ Failed to write COPY file: {e}")
+            failed_ids = [r['messageId'] for r in records]
+
+    print(f"Batched {len(records) - len(failed_ids)}/{len(records)} messages")
+    return {'batchItemFailures': [{'itemIdentifier': mid} for mid in failed_ids]}
+
+
+def batch_entries(bodies):
+    """Split message bodies into SendMessageBatch-sized lists of (index, body)"""
+    batch, batch_bytes = [], 0
+    for i, body in enumerate(bodies):
+        size = len(body.encode('utf-8'))
+        if batch and (len(batch) >= MAX_BATCH_MESSAGES or batch_bytes + size > MAX_BATCH_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append((i, body))
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def send_webhooks(webhooks, queue_url=QUEUE_URL):
+    """
+    Enqueue webhook dicts with SendMessageBatch, retrying only failed entries
+
+    Returns the indexes of webhooks that could not be sent.
+    """
+    sqs = get_client('sqs')
+    bodies = [json_codec.dumps(w) for w in webhooks]
+    failed = []
+    for batch in batch_entries(bodies):
+        pending = batch
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(min(0.1 * (2 ** attempt), 2.0))
+            try:
+                response = sqs.send_message_batch(
+                    QueueUrl=queue_url,
+                    Entries=[{'Id': str(i), 'MessageBody': body} for i, body in pending]
+                )
+            except Exception as e:
+                print(f"⚠️ SendMessageBatch failed (attempt {attempt + 1}): {e}")
+                continue
+            failed_ids = {entry['Id'] for entry in response.get('Failed', [])}
+            pending = [(i, body) for i, body in pending if str(i) in failed_ids]
+            if not pending:
+                break
+        failed.extend(i for i, _ in pending)
+    return failed
+
+
+def delete_messages(queue_url, receipts):
+    """DeleteMessageBatch in groups of 10; returns the number deleted"""
+    sqs = get_client('sqs')
+    deleted = 0
+    for start in range(0, len(receipts), MAX_BATCH_MESSAGES):
+        chunk = receipts[start:start + MAX_BATCH_MESSAGES]
+        response = sqs.delete_message_batch(
+            QueueUrl=queue_url,
+            Entries=[{'Id': str(i), 'ReceiptHandle': handle} for i, handle in enumerate(chunk)]
+        )
+        deleted += len(response.get('Successful', []))
+        for entry in response.get('Failed', []):
+            print(f"⚠️ Delete failed: {entry.get('Message')}")
+    return deleted
+
+
+def drain_queue(queue_url=QUEUE_URL, file_records=5000, max_messages=None, wait_seconds=5,
+                visibility_timeout=DRAIN_VISIBILITY_SECONDS):
+    """
+    Drain the queue outside Lambda with ReceiveMessage batches of 10
+
+    Messages are deleted only after the file holding them is written;
+    invalid ones are left on the queue for the dead-letter redrive.
+    Messages are received with `visibility_timeout` and a file stops
+    collecting once half of it has passed since its first message, leaving
+    the other half to write the file and delete the messages before any of
+    them becomes visible again (and would be written twice).
+    Returns (messages_written, files_written).
+    """
+    sqs = get_client('sqs')
+    written = files = 0
+    done = False
+    while not done:
+        messages = []
+        deadline = None
+        while len(messages) < file_records:
+            if max_messages is not None and written + len(messages) >= max_messages:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            response = sqs.receive_message(
+                QueueUrl=queue_url,
+                MaxNumberOfMessages=MAX_BATCH_MESSAGES,
+                WaitTimeSeconds=wait_seconds,
+                VisibilityTimeout=visibility_timeout,
+                AttributeNames=['SentTimestamp']
+            )
+            batch = response.get('Messages', [])
+            if not batch:
+                done = True
+                break
+            if deadline is None:
+                deadline = time.monotonic() + visibility_timeout / 2
+            messages.extend(batch)
+        if max_messages is not None and written + len(messages) >= max_messages:
+            done = True
+        if not messages:
+            break
+
+        lines, failed_ids = compact_lines((m['MessageId'], m['Body']) for m in messages)
+        failed = set(failed_ids)
+        if lines:
+            batch = [m for m in messages if m['MessageId'] not in failed]
+            write_batch(lines, batch_id(m['MessageId'] for m in batch),
+                        oldest_sent(m.get('Attributes', {}).get('SentTimestamp') for m in batch))
+            files += 1
+        receipts = [m['ReceiptHandle'] for m in messages if m['MessageId'] not in failed]
+        if not receipts:
+            # Only invalid messages in this file; they stay hidden until the
+            # redrive policy dead-letters them, valid ones may still follow
+            continue
+        written += delete_messages(queue_url, receipts)
+        print(f"   {written} messages written in {files} files")
+    return written, files
+
+
+# For local draining
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drain the Greenhouse SQS queue into COPY files')
+    parser.add_argument('--queue-url', default=QUEUE_URL)
+    parser.add_argument('--file-records', type=int, default=5000, help='Messages per COPY file')
+    parser.add_argument('--max-messages', type=int, default=None, help='Stop after this many messages')
+    parser.add_argument('--visibility-timeout', type=int, default=DRAIN_VISIBILITY_SECONDS,
+                        help='Seconds received messages stay hidden; a file is cut after half of it')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Greenhouse SQS → COPY files")
+    print("=" * 60)
+    written, files = drain_queue(args.queue_url, args.file_records, args.max_messages,
+                                 visibility_timeout=args.visibility_timeout)
+    print(f"\n✅ {written} messages written in {files} files")
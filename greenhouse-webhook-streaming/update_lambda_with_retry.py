@@ -3,9 +3,14 @@
 import boto3
 import yaml
 import json
+import os
+import sys
 import zipfile
 import io
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'webhook-utils'))
+from lambda_package import add_shared_modules
+
 with open('credentials.yaml') as f:
     creds = yaml.safe_load(f)
 
@@ -23,13 +28,17 @@ lambda_client = session.client('lambda')
 
 # Create improved Lambda code with retry
 lambda_code = '''
-import json
 import boto3
+import json_codec
+import os
 from datetime import datetime
 
 sqs = boto3.client('sqs')
 QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/309820967897/greenhouse-flattened-records'
 
+# passthrough (default): skip re-serializing records already framed as one JSON object per line
+FIREHOSE_TRANSFORM_MODE = os.environ.get('FIREHOSE_TRANSFORM_MODE', 'passthrough').lower()
+
 def lambda_handler(event, context):
     """Lambda handler with error recovery"""
     
@@ -44,7 +53,7 @@ def process_api_gateway_webhook(event, context):
         body_str = event.get('body')
         if body_str is None or body_str == '':
             body_str = '{}'
-        body = json.loads(body_str)
+        body = json_codec.loads(body_str)
         
         webhook_data = {
             'timestamp': datetime.utcnow().isoformat() + 'Z',
@@ -58,7 +67,7 @@ def process_api_gateway_webhook(event, context):
         try:
             sqs.send_message(
                 QueueUrl=QUEUE_URL,
-                MessageBody=json.dumps(webhook_data)
+                MessageBody=json_codec.dumps(webhook_data)
             )
         except Exception as sqs_error:
             print(f"SQS error (will retry): {sqs_error}")
@@ -66,7 +75,7 @@ def process_api_gateway_webhook(event, context):
             return {
                 'statusCode': 500,
                 'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'status': 'error', 'message': 'Temporary failure, will retry'})
+                'body': json_codec.dumps({'status': 'error', 'message': 'Temporary failure, will retry'})
             }
         
         print(f"Processed webhook: action={body.get('action')}")
@@ -74,7 +83,7 @@ def process_api_gateway_webhook(event, context):
         return {
             'statusCode': 200,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
+            'body': json_codec.dumps({
                 'status': 'success',
                 'message': 'Webhook received',
                 'request_id': context.aws_request_id
@@ -87,20 +96,17 @@ def process_api_gateway_webhook(event, context):
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'status': 'error', 'message': str(e)})
+            'body': json_codec.dumps({'status': 'error', 'message': str(e)})
         }
 
 def process_firehose_records(event, context):
     """Transform Firehose records for Redshift"""
-    import base64
     output_records = []
+    passthrough = FIREHOSE_TRANSFORM_MODE == 'passthrough'
     
     for record in event['records']:
         try:
-            payload = base64.b64decode(record['data']).decode('utf-8')
-            data = json.loads(payload)
-            transformed_data = json.dumps(data) + '\\n'
-            encoded_data = base64.b64encode(transformed_data.encode('utf-8')).decode('utf-8')
+            encoded_data = json_codec.transform_record(record['data'], passthrough)
             
             output_records.append({
                 'recordId': record['recordId'],
@@ -123,6 +129,7 @@ print("Creating deployment package...")
 zip_buffer = io.BytesIO()
 with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
     zip_file.writestr('lambda_function.py', lambda_code)
+    add_shared_modules(zip_file)
 
 zip_buffer.seek(0)
 
@@ -136,3 +143,21 @@ response = lambda_client.update_function_code(
 print(f"✅ Lambda updated")
 print(f"   Version: {response['Version']}")
 print(f"   Last Modified: {response['LastModified']}")
+
+# Update the batched SQS worker (handler: sqs_worker.lambda_handler), if configured
+worker_function = config['lambda'].get('worker_function_name')
+if worker_function:
+    worker_zip = io.BytesIO()
+    with zipfile.ZipFile(worker_zip, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write('sqs_worker.py', 'sqs_worker.py')
+        zip_file.write('greenhouse_flatten.py', 'greenhouse_flatten.py')
+        add_shared_modules(zip_file)
+    worker_zip.seek(0)
+
+    print(f"\nUpdating worker Lambda: {worker_function}...")
+    response = lambda_client.update_function_code(
+        FunctionName=worker_function,
+        ZipFile=worker_zip.read()
+    )
+    print(f"✅ Worker Lambda updated")
+    print(f"   Version: {response['Version']}")
@@ -2,12 +2,25 @@
 """
 Analyze historical Meraki webhook data to identify schema variations
 """
+import argparse
 import json
+import os
+import sys
 import boto3
 import yaml
-from collections import defaultdict, Counter
+from collections import Counter
 
-def analyze_data():
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+from schema_profiler import SchemaProfile
+from profile_cache import ProfileCache, list_s3_objects
+
+# Value distributions tracked exactly (every trigger, not just triggerData[0])
+CATEGORY_PATHS = {
+    'alert_types': 'alertType',
+    'trigger_types': 'alertData.triggerData[].trigger.type',
+}
+
+def analyze_data(workers=16, batch_size=25, cache_path='.schema_profile_cache.json', rebuild=False):
     """Analyze historical webhook data for schema variations"""
     
     print("=" * 60)
@@ -39,77 +52,44 @@ def analyze_data():
     
     # List files
     print("\n1. Listing files...")
-    paginator = s3.get_paginator('list_objects_v2')
-    pages = paginator.paginate(Bucket=source_bucket, Prefix=source_prefix)
-    
-    files = []
-    for page in pages:
-        if 'Contents' in page:
-            files.extend([obj['Key'] for obj in page['Contents'] if obj['Size'] > 0])
+    objects = list_s3_objects(s3, source_bucket, source_prefix)
+    files = list(objects)
     
     print(f"✅ Found {len(files)} files")
     
-    # Analyze schema variations
-    print("\n2. Analyzing schema variations...")
-    
-    field_counts = defaultdict(int)
-    alert_types = Counter()
-    trigger_types = Counter()
-    sample_payloads = {}
-    total_records = 0
-    
-    # Sample files (analyze first 50 for speed)
-    sample_size = min(50, len(files))
-    
-    for i, file_key in enumerate(files[:sample_size]):
-        try:
-            response = s3.get_object(Bucket=source_bucket, Key=file_key)
-            content = response['Body'].read().decode('utf-8')
-            
-            for line in content.strip().split('\n'):
-                if not line.strip():
-                    continue
-                
-                try:
-                    data = json.loads(line)
-                    
-                    # Extract payload
-                    if 'payload' in data and isinstance(data['payload'], dict):
-                        payload = data['payload']
-                    else:
-                        payload = data
-                    
-                    # Count fields
-                    for key in payload.keys():
-                        field_counts[key] += 1
-                    
-                    # Track alert types
-                    alert_type = payload.get('alertType', 'unknown')
-                    alert_types[alert_type] += 1
-                    
-                    # Track trigger types
-                    alert_data = payload.get('alertData', {})
-                    if alert_data:
-                        trigger_data = alert_data.get('triggerData', [])
-                        if trigger_data and len(trigger_data) > 0:
-                            trigger = trigger_data[0].get('trigger', {})
-                            trigger_type = trigger.get('type', 'unknown')
-                            trigger_types[trigger_type] += 1
-                    
-                    # Save sample payloads
-                    if alert_type not in sample_payloads:
-                        sample_payloads[alert_type] = payload
-                    
-                    total_records += 1
-                    
-                except json.JSONDecodeError:
-                    continue
-            
-            if (i + 1) % 10 == 0:
-                print(f"   Processed {i + 1}/{sample_size} files, {total_records} records")
-        
-        except Exception as e:
-            print(f"   Error processing {file_key}: {e}")
+    # Profile new/changed files in parallel batches, reusing cached per-file stats
+    template = SchemaProfile(category_paths=CATEGORY_PATHS, sample_path='alertType')
+    cache = ProfileCache(cache_path, template)
+    if not rebuild:
+        cache.load()
+    to_profile, removed = cache.plan(objects)
+    print(f"\n2. Profiling {len(to_profile)} new/changed files "
+          f"({len(files) - len(to_profile)} cached, {len(removed)} removed, {workers} workers)...")
+    
+    def progress(done, total, records):
+        if done % 100 == 0 or done == total:
+            print(f"   Processed {done}/{total} files, {records} new records")
+    
+    profile, stats = cache.refresh(
+        s3, source_bucket, objects,
+        workers=workers, batch_size=batch_size, progress=progress
+    )
+    errors = stats['errors']
+    for file_key, error in errors[:20]:
+        print(f"   Error processing {file_key}: {error}")
+    if len(errors) > 20:
+        print(f"   ... and {len(errors) - 20} more errors")
+    print(f"✅ Profile cache updated: {cache_path}")
+    
+    total_records = profile.total_records
+    field_counts = profile.top_level_fields()
+    alert_types = Counter(profile.categories['alert_types'])
+    trigger_types = Counter(profile.categories['trigger_types'])
+    sample_payloads = profile.samples
+    
+    if total_records == 0:
+        print("❌ No records found")
+        return None
     
     # Print analysis
     print("\n" + "=" * 60)
@@ -117,13 +97,22 @@ def analyze_data():
     print("=" * 60)
     
     print(f"\nTotal records analyzed: {total_records}")
-    print(f"Files analyzed: {sample_size}/{len(files)}")
+    print(f"Files analyzed: {len(files) - len(errors)}/{len(files)}")
+    if profile.invalid_lines:
+        print(f"Invalid JSON lines skipped: {profile.invalid_lines}")
     
     print("\n--- Top-Level Fields ---")
     for field, count in sorted(field_counts.items()):
         percentage = (count / total_records) * 100
         print(f"  {field}: {count} ({percentage:.1f}%)")
     
+    print("\n--- Nested Field Paths ---")
+    for path, field_stats in profile.summary()['fields'].items():
+        if '.' not in path and '[' not in path:
+            continue
+        types = ', '.join(f"{t}({c})" for t, c in field_stats['types'].items())
+        print(f"  {path}: {field_stats['presence_pct']:.1f}% - {types} - ~{field_stats['approx_distinct']} distinct")
+    
     print("\n--- Alert Types ---")
     for alert_type, count in alert_types.most_common():
         percentage = (count / total_records) * 100
@@ -139,6 +128,9 @@ def analyze_data():
     with open('schema_samples.json', 'w') as f:
         json.dump(sample_payloads, f, indent=2)
     print("✅ Saved to schema_samples.json")
+    with open('schema_profile.json', 'w') as f:
+        json.dump(profile.summary(), f, indent=2)
+    print("✅ Saved full field profile to schema_profile.json")
     
     # Check for schema variations
     print("\n--- Schema Variations Detected ---")
@@ -147,8 +139,8 @@ def analyze_data():
     missing_required = []
     
     for field in required_fields:
-        if field_counts[field] < total_records:
-            missing_count = total_records - field_counts[field]
+        if field_counts.get(field, 0) < total_records:
+            missing_count = total_records - field_counts.get(field, 0)
             missing_required.append((field, missing_count))
     
     if missing_required:
@@ -178,8 +170,17 @@ def analyze_data():
         'field_counts': dict(field_counts),
         'alert_types': dict(alert_types),
         'trigger_types': dict(trigger_types),
-        'sample_payloads': sample_payloads
+        'sample_payloads': sample_payloads,
+        'field_profile': profile.summary()['fields']
     }
 
 if __name__ == "__main__":
-    results = analyze_data()
+    parser = argparse.ArgumentParser(description='Profile historical Meraki webhook schema')
+    parser.add_argument('--workers', type=int, default=16, help='Parallel S3 readers')
+    parser.add_argument('--batch-size', type=int, default=25, help='Files per worker batch')
+    parser.add_argument('--cache', default='.schema_profile_cache.json', help='Per-file profile cache')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cache and re-profile every file')
+    args = parser.parse_args()
+    
+    results = analyze_data(workers=args.workers, batch_size=args.batch_size,
+                           cache_path=args.cache, rebuild=args.rebuild)
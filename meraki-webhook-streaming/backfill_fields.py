@@ -6,6 +6,7 @@ import psycopg2
 import json
 import yaml
 from sshtunnel import SSHTunnelForwarder
+from meraki_flatten import COLUMNS, flatten_payload
 
 with open('config.json') as f:
     config = json.load(f)
@@ -45,81 +46,23 @@ with SSHTunnelForwarder(
     records = cursor.fetchall()
     print(f"Found {len(records)} records to update")
     
+    # SET list generated from the shared field spec
+    set_clause = ',\n                    '.join(f"{column} = %s" for column in COLUMNS)
+    
     updated = 0
     for record_id, payload_json in records:
         try:
             payload = json.loads(payload_json)
             
-            # Extract fields
-            alert_data = payload.get('alertData', {})
-            trigger_data = alert_data.get('triggerData', [])
-            trigger = trigger_data[0].get('trigger', {}) if trigger_data else {}
+            # Existing rows hold a single trigger, so use the first flattened row
+            flattened = flatten_payload(payload)[0]
             
-            cursor.execute("""
+            cursor.execute(f"""
                 UPDATE edna_stream_meraki.meraki_webhooks
                 SET 
-                    version = %s,
-                    shared_secret = %s,
-                    sent_at = %s,
-                    organization_id = %s,
-                    organization_name = %s,
-                    organization_url = %s,
-                    network_id = %s,
-                    network_name = %s,
-                    network_url = %s,
-                    network_tags = %s,
-                    device_serial = %s,
-                    device_mac = %s,
-                    device_name = %s,
-                    device_url = %s,
-                    device_tags = %s,
-                    device_model = %s,
-                    alert_id = %s,
-                    alert_type = %s,
-                    alert_type_id = %s,
-                    alert_level = %s,
-                    occurred_at = %s,
-                    alert_config_id = %s,
-                    alert_config_name = %s,
-                    started_alerting = %s,
-                    condition_id = %s,
-                    trigger_ts = %s,
-                    trigger_type = %s,
-                    trigger_node_id = %s,
-                    trigger_sensor_value = %s
+                    {set_clause}
                 WHERE id = %s
-            """, (
-                payload.get('version'),
-                payload.get('sharedSecret'),
-                payload.get('sentAt'),
-                payload.get('organizationId'),
-                payload.get('organizationName'),
-                payload.get('organizationUrl'),
-                payload.get('networkId'),
-                payload.get('networkName'),
-                payload.get('networkUrl'),
-                json.dumps(payload.get('networkTags', [])),
-                payload.get('deviceSerial'),
-                payload.get('deviceMac'),
-                payload.get('deviceName'),
-                payload.get('deviceUrl'),
-                json.dumps(payload.get('deviceTags', [])),
-                payload.get('deviceModel'),
-                payload.get('alertId'),
-                payload.get('alertType'),
-                payload.get('alertTypeId'),
-                payload.get('alertLevel'),
-                payload.get('occurredAt'),
-                alert_data.get('alertConfigId'),
-                alert_data.get('alertConfigName'),
-                alert_data.get('startedAlerting'),
-                trigger_data[0].get('conditionId') if trigger_data else None,
-                trigger.get('ts'),
-                trigger.get('type'),
-                trigger.get('nodeId'),
-                trigger.get('sensorValue'),
-                record_id
-            ))
+            """, [flattened[column] for column in COLUMNS] + [record_id])
             
             updated += 1
             if updated % 100 == 0:
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Per-request CPU benchmark for the JSON codec backends
+
+Runs the Meraki webhook Lambda locally (in-process S3 stub, INGEST_MODE
+from the environment) and its Firehose transform, once with the stdlib json
+backend and once with orjson, and reports CPU time per request from
+time.process_time. The Firehose transform is also timed in passthrough mode
+(parsed, but framed records are not re-serialized). The webhooks come from sample_payloads/.
+
+Usage:
+    python benchmark_json_codec.py --requests 2000 --firehose-records 500
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from benchmark_lambda import HERE, InProcessS3, MockContext
+
+sys.path.insert(0, os.path.join(HERE, '..', 'sa-utils', 'data-utils'))
+import json_codec
+
+
+def load_webhooks():
+    sample_dir = os.path.join(HERE, 'sample_payloads')
+    webhooks = []
+    for name in sorted(os.listdir(sample_dir)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(sample_dir, name)) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    webhooks.append(record.get('payload', record))
+    return webhooks
+
+
+def cpu_per_call(fn, calls):
+    """Average CPU time per call, in microseconds"""
+    t0 = time.process_time()
+    for i in range(calls):
+        fn(i)
+    return (time.process_time() - t0) / calls * 1e6
+
+
+def silenced(fn, *args):
+    devnull = open(os.devnull, 'w')
+    real_stdout, sys.stdout = sys.stdout, devnull
+    try:
+        return fn(*args)
+    finally:
+        sys.stdout = real_stdout
+        devnull.close()
+
+
+def run_backend(name, lambda_function, api_events, firehose_event, args):
+    json_codec.set_backend(name)
+    lambda_function.FIREHOSE_TRANSFORM_MODE = 'parse'
+    lambda_function._clients['s3'] = InProcessS3()
+
+    def api_request(i):
+        lambda_function.lambda_handler(api_events[i % len(api_events)], MockContext(f"bench-{i}"))
+
+    def firehose_batch(_):
+        lambda_function.process_firehose_records(firehose_event, None)
+
+    api_request(0)
+    api_us = silenced(cpu_per_call, api_request, args.requests)
+    firehose_us = silenced(cpu_per_call, firehose_batch, args.firehose_rounds)
+    return api_us, firehose_us
+
+
+def run_passthrough(name, lambda_function, firehose_event, args):
+    json_codec.set_backend(name)
+    lambda_function.FIREHOSE_TRANSFORM_MODE = 'passthrough'
+    result = lambda_function.process_firehose_records(firehose_event, None)
+    unchanged = sum(1 for out, rec in zip(result['records'], firehose_event['records'])
+                    if out['data'] is rec['data'])
+
+    def firehose_batch(_):
+        lambda_function.process_firehose_records(firehose_event, None)
+
+    return silenced(cpu_per_call, firehose_batch, args.firehose_rounds), unchanged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON codec backends in the Meraki Lambda')
+    parser.add_argument('--requests', type=int, default=2000, help='API Gateway requests per backend')
+    parser.add_argument('--firehose-records', type=int, default=500, help='Records per Firehose batch')
+    parser.add_argument('--firehose-rounds', type=int, default=20, help='Firehose batches per backend')
+    args = parser.parse_args()
+
+    os.environ.pop('ALERT_SNS_TOPIC', None)
+    sys.path.insert(0, HERE)
+    import lambda_function
+
+    webhooks = load_webhooks()
+    api_events = [{'body': json.dumps(w)} for w in webhooks]
+    firehose_event = {'records': [
+        {'recordId': f"{i:08d}",
+         'data': base64.b64encode(
+             (json.dumps(webhooks[i % len(webhooks)], separators=(',', ':')) + '\n').encode('utf-8')
+         ).decode('utf-8')}
+        for i in range(args.firehose_records)
+    ]}
+
+    print("=" * 60)
+    print(f"JSON codec benchmark ({len(webhooks)} sample webhooks, "
+          f"ingest mode: {lambda_function.INGEST_MODE})")
+    print("=" * 60)
+
+    results = {}
+    for name in json_codec.BACKENDS:
+        try:
+            results[name] = silenced(run_backend, name, lambda_function, api_events, firehose_event, args)
+        except ImportError:
+            print(f"⚠️ {name} not installed - skipping")
+
+    print(f"\n  {'backend':<8} {'API request (CPU)':>20} {f'Firehose batch of {args.firehose_records}':>26}")
+    for name, (api_us, firehose_us) in results.items():
+        print(f"  {name:<8} {api_us:17.1f} µs {firehose_us / 1000:23.2f} ms")
+
+    # Passthrough still parses every record, with the fastest backend available
+    fastest = 'orjson' if 'orjson' in results else 'json'
+    passthrough_us, unchanged = run_passthrough(fastest, lambda_function, firehose_event, args)
+    print(f"  {f'passthrough ({fastest})':<21} {'-':>10} {passthrough_us / 1000:23.2f} ms "
+          f"({unchanged}/{args.firehose_records} records returned without re-encoding)")
+
+    if len(results) == 2:
+        (json_api, json_fh), (orjson_api, orjson_fh) = results['json'], results['orjson']
+        print(f"\n  CPU saved per API request:   {json_api - orjson_api:8.1f} µs "
+              f"({json_api / orjson_api:.2f}x)")
+        print(f"  CPU saved per Firehose batch: {(json_fh - orjson_fh) / 1000:7.2f} ms "
+              f"({json_fh / orjson_fh:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
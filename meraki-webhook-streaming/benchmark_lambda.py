@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Cold/warm latency benchmark for the Meraki webhook Lambda
+
+Runs lambda_function.lambda_handler locally against a stub S3 API: a
+local HTTP server that accepts S3 PutObject calls, with the handler's real
+boto3 client pointed at it through AWS_ENDPOINT_URL_S3 (requires
+boto3 >= 1.28). The real client matters: the client setup and connection
+reuse that caching saves are what this benchmark measures.
+
+Cold starts are measured in fresh interpreters (import + first request).
+Warm requests are measured with the module-cached clients ("cached") and with
+the cache cleared before every request ("per-request"), which reproduces the
+old behaviour of building clients inside the handler.
+
+Usage:
+    python benchmark_lambda.py --requests 500 --cold-runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    """Accepts any PutObject and answers like S3 does"""
+
+    # HTTP/1.1 so botocore's "Expect: 100-continue" is answered immediately
+    protocol_version = 'HTTP/1.1'
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header('ETag', '"stub"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class InProcessS3:
+    """Minimal stand-in for the boto3 S3 client (CPU benchmarks, see benchmark_json_codec.py)"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+        return {'ETag': '"stub"'}
+
+
+class MockContext:
+    def __init__(self, request_id):
+        self.aws_request_id = request_id
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubS3Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def stub_environment(port):
+    env = dict(os.environ)
+    env.update({
+        'AWS_ENDPOINT_URL_S3': f"http://127.0.0.1:{port}",
+        'AWS_ACCESS_KEY_ID': 'stub',
+        'AWS_SECRET_ACCESS_KEY': 'stub',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'RAW_BUCKET': 'benchmark-bucket',
+    })
+    env.pop('ALERT_SNS_TOPIC', None)
+    return env
+
+
+def load_event():
+    """First webhook from sample_payloads/ wrapped as an API Gateway event"""
+    sample_dir = os.path.join(HERE, 'sample_payloads')
+    sample_file = sorted(f for f in os.listdir(sample_dir) if f.endswith('.json'))[0]
+    with open(os.path.join(sample_dir, sample_file)) as f:
+        record = json.loads(f.readline())
+    return {'body': json.dumps(record.get('payload', record))}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, timings_ms):
+    print(f"  {label:<14} n={len(timings_ms):<5} "
+          f"p50={percentile(timings_ms, 50):8.3f} ms  "
+          f"p99={percentile(timings_ms, 99):8.3f} ms  "
+          f"mean={statistics.mean(timings_ms):8.3f} ms")
+
+
+def cold_child():
+    """Runs inside a fresh interpreter: time import + first request"""
+    sys.path.insert(0, HERE)
+    event = load_event()
+    t0 = time.perf_counter()
+    import lambda_function
+    t1 = time.perf_counter()
+    result = lambda_function.lambda_handler(event, MockContext('cold-0'))
+    t2 = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (t1 - t0) * 1000,
+        'first_request_ms': (t2 - t1) * 1000,
+        'status': result['statusCode'],
+    }))
+
+
+def run_cold(runs, env):
+    imports, firsts = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--cold-child'],
+            capture_output=True, text=True, env=env, cwd=HERE
+        )
+        line = [l for l in out.stdout.splitlines() if l.startswith('{"import_ms"')]
+        if not line:
+            print(f"❌ Cold run failed:\n{out.stderr[-2000:]}")
+            return
+        data = json.loads(line[-1])
+        imports.append(data['import_ms'])
+        firsts.append(data['first_request_ms'])
+    print("\nCold start (fresh interpreter):")
+    summarize('import', imports)
+    summarize('first request', firsts)
+
+
+def run_warm(requests, env):
+    os.environ.update(env)
+    sys.path.insert(0, HERE)
+    import lambda_function
+
+    event = load_event()
+    results = {}
+    devnull = open(os.devnull, 'w')
+    for mode in ('per-request', 'cached'):
+        timings = []
+        for i in range(requests):
+            if mode == 'per-request':
+                lambda_function._clients.clear()
+            real_stdout, sys.stdout = sys.stdout, devnull
+            try:
+                t0 = time.perf_counter()
+                result = lambda_function.lambda_handler(event, MockContext(f"{mode}-{i}"))
+                timings.append((time.perf_counter() - t0) * 1000)
+            finally:
+                sys.stdout = real_stdout
+            if result['statusCode'] != 200:
+                print(f"❌ {mode} request {i} failed: {result['body']}")
+                return
+        results[mode] = timings
+
+    print("\nWarm requests:")
+    for mode, timings in results.items():
+        summarize(mode, timings)
+    speedup = percentile(results['per-request'], 50) / percentile(results['cached'], 50)
+    print(f"\n  p50 speedup from cached clients: {speedup:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Meraki Lambda cold/warm latency')
+    parser.add_argument('--requests', type=int, default=300, help='Warm requests per mode')
+    parser.add_argument('--cold-runs', type=int, default=5, help='Fresh-interpreter runs')
+    parser.add_argument('--ingest-mode', choices=['dual', 'parallel', 'single'], default=None,
+                        help='INGEST_MODE for the handler (default: environment/dual)')
+    parser.add_argument('--cold-child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ingest_mode:
+        os.environ['INGEST_MODE'] = args.ingest_mode
+
+    if args.cold_child:
+        cold_child()
+        return
+
+    server = start_stub_server()
+    env = stub_environment(server.server_address[1])
+
+    print("=" * 60)
+    print(f"Meraki Lambda latency benchmark (stub S3 server, "
+          f"ingest mode: {env.get('INGEST_MODE', 'dual')})")
+    print("=" * 60)
+
+    try:
+        if args.cold_runs:
+            run_cold(args.cold_runs, env)
+        run_warm(args.requests, env)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
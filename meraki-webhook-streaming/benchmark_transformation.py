@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for meraki_transformation.lambda_handler
+
+Builds Firehose transformation events from the webhooks in sample_payloads/
+(one webhook per Firehose record, cycled up to --records) and compares the
+single-DataFrame batch transform with building one DataFrame per record.
+
+Usage:
+    python benchmark_transformation.py --records 500 --rounds 5
+"""
+import argparse
+import base64
+import glob
+import os
+import statistics
+import time
+
+import meraki_transformation
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_sample_lines():
+    lines = []
+    for path in sorted(glob.glob(os.path.join(HERE, 'sample_payloads', '*.json'))):
+        with open(path, 'rb') as f:
+            lines.extend(line.rstrip(b'\n') for line in f if line.strip())
+    return lines
+
+
+def build_event(lines, count):
+    return {'records': [
+        {'recordId': f"{i:08d}", 'data': base64.b64encode(lines[i % len(lines)] + b'\n').decode('utf-8')}
+        for i in range(count)
+    ]}
+
+
+def time_it(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Meraki Firehose transform')
+    parser.add_argument('--records', type=int, default=500, help='Firehose records per event')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    lines = load_sample_lines()
+    event = build_event(lines, args.records)
+    decoded, record_ids, _, _ = meraki_transformation.decode_records(event['records'])
+
+    print("=" * 60)
+    print(f"Meraki transform throughput ({args.records} records, {len(lines)} distinct samples)")
+    print("=" * 60)
+
+    # Silence the handler's per-batch prints while timing
+    meraki_transformation.print = lambda *a, **k: None
+    result = meraki_transformation.lambda_handler(event, None)
+    ok = sum(1 for r in result['records'] if r['result'] == 'Ok')
+    print(f"\nBatch handler results: {ok}/{len(result['records'])} Ok")
+
+    runs = {
+        'batch (handler)': lambda: meraki_transformation.lambda_handler(event, None),
+        'per-record': lambda: meraki_transformation.transform_per_record(decoded, record_ids),
+    }
+    for label, fn in runs.items():
+        timings = time_it(fn, args.rounds)
+        median = statistics.median(timings)
+        print(f"  {label:<16} median {median * 1000:9.2f} ms  "
+              f"{args.records / median:10.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
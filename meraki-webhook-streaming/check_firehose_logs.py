@@ -1,10 +1,19 @@
 #!/usr/bin/env python3
-"""Check Firehose CloudWatch logs"""
+"""Check Firehose CloudWatch logs
+
+Errors and recent events of the delivery stream and its transformation
+Lambda, queried in parallel with Logs Insights.
+"""
 import boto3
 import json
+import os
+import sys
 import yaml
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'aws-utils'))
+from log_insights import LogInsights, ERRORS_QUERY, RECENT_QUERY, print_result
+
 with open('config.json') as f:
     config = json.load(f)
 
@@ -18,28 +27,29 @@ session = boto3.Session(
     aws_session_token=prod_creds['aws_session_token']
 )
 
-logs = session.client('logs')
-log_group = f"/aws/kinesisfirehose/{config['firehose']['stream_name']}"
+firehose_group = f"/aws/kinesisfirehose/{config['firehose']['stream_name']}"
+lambda_group = f"/aws/lambda/{config['lambda']['function_name']}"
 
-print(f"Checking Firehose logs: {log_group}")
+print(f"Checking Firehose logs: {firehose_group}")
 print("=" * 60)
 
 try:
-    start_time = int((datetime.now() - timedelta(hours=1)).timestamp() * 1000)
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(hours=1)
     
-    response = logs.filter_log_events(
-        logGroupName=log_group,
-        startTime=start_time,
-        limit=100
-    )
+    results = LogInsights(session.client('logs')).run({
+        'firehose_errors': (firehose_group, ERRORS_QUERY),
+        'firehose_recent': (firehose_group, RECENT_QUERY),
+        'transform_errors': (lambda_group, ERRORS_QUERY),
+    }, start_time, end_time, limit=100)
     
-    if response['events']:
-        print(f"\nFound {len(response['events'])} log events:\n")
-        for event in response['events']:
-            timestamp = datetime.fromtimestamp(event['timestamp'] / 1000)
-            print(f"[{timestamp}] {event['message']}")
-    else:
+    recent = results['firehose_recent']
+    if recent.status == 'Complete' and not recent.rows:
         print("\n❌ No Firehose log events found")
+    else:
+        print_result(f"{firehose_group} - errors", results['firehose_errors'])
+        print_result(f"{firehose_group} - recent", recent, max_rows=25)
+    print_result(f"{lambda_group} - errors", results['transform_errors'], max_rows=25)
         
 except Exception as e:
     print(f"❌ Error: {e}")
@@ -2,8 +2,20 @@
 
 import boto3
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'aws-utils'))
+from log_insights import LogInsights, print_result
+
+# Delivery errors (schema, type or permission problems) from the Firehose log group
+DELIVERY_ERRORS_QUERY = (
+    "fields @timestamp, @logStream, @message"
+    " | filter @logStream = 'DestinationDelivery' or @message like /(?i)error|fail|schema|mismatch/"
+    " | sort @timestamp desc"
+)
+
 def check_schema_mismatch():
     """Check for schema mismatch between transformed data and S3 Tables"""
     
@@ -12,31 +24,18 @@ def check_schema_mismatch():
     
     print("=== Schema Mismatch Check ===\n")
     
-    # 1. Check Firehose logs for delivery errors
-    log_group = "/aws/kinesisfirehose/meraki-firehose"
-    log_stream = "DestinationDelivery"
+    # 1. Check Firehose and transformation Lambda logs for delivery errors
+    log_groups = ["/aws/kinesisfirehose/meraki-firehose", "/aws/lambda/meraki-webhook-processor"]
     
     try:
-        print("1. Checking Firehose delivery logs...")
-        end_time = int(datetime.now().timestamp() * 1000)
-        start_time = int((datetime.now() - timedelta(hours=2)).timestamp() * 1000)
+        print("1. Checking Firehose delivery and transformation logs...")
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=2)
         
-        response = logs_client.get_log_events(
-            logGroupName=log_group,
-            logStreamName=log_stream,
-            startTime=start_time,
-            endTime=end_time
-        )
-        
-        events = response.get('events', [])
-        if events:
-            print(f"   Found {len(events)} log events:")
-            for event in events[-5:]:  # Show last 5 events
-                timestamp = datetime.fromtimestamp(event['timestamp'] / 1000)
-                message = event['message']
-                print(f"   [{timestamp}] {message}")
-        else:
-            print("   No recent log events found")
+        results = LogInsights(logs_client).search(log_groups, DELIVERY_ERRORS_QUERY,
+                                                  start_time, end_time, limit=50)
+        for log_group in log_groups:
+            print_result(log_group, results[log_group], max_rows=5)
             
     except Exception as e:
         print(f"   Error reading logs: {e}")
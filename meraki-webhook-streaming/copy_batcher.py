@@ -0,0 +1,152 @@
+"""
+Micro-batching tier for Meraki COPY files
+
+The webhook Lambda (INGEST_MODE=queue) sends each flattened record to SQS.
+This SQS-triggered Lambda packs the records into gzip NDJSON files of a
+target size under copy-job-gz/, so the Redshift COPY JOB reads a few large
+files per hour instead of thousands of one-line objects.
+
+Flushing happens on size (TARGET_FILE_BYTES of uncompressed NDJSON) and on
+age (MAX_FILE_AGE_SECONDS); in Lambda the time bound comes from the SQS
+event source's MaximumBatchingWindowInSeconds and every invocation flushes
+whatever it holds before returning. Lambda caps an SQS batch at 10,000
+messages / 6 MB, so set BatchSize=10000 and a 300s window to get the
+largest files.
+
+Local test:
+    python copy_batcher.py sample_payloads/*.json
+"""
+import gzip
+import io
+import os
+import time
+import uuid
+from datetime import datetime
+
+TARGET_FILE_BYTES = int(os.environ.get('TARGET_FILE_BYTES', str(64 * 1024 * 1024)))
+MAX_FILE_AGE_SECONDS = int(os.environ.get('MAX_FILE_AGE_SECONDS', '300'))
+COPY_PREFIX = os.environ.get('COPY_PREFIX', 'copy-job-gz/')
+
+_s3 = None
+
+def get_s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3
+        _s3 = boto3.client('s3')
+    return _s3
+
+
+class CopyFileBatcher:
+    """
+    Buffers NDJSON lines and writes them out as gzip files
+
+    `put(key, body)` performs the write (an S3 put_object in Lambda, a local
+    file write in tests). Lines carry an opaque tag (the SQS messageId) so a
+    failed flush can report exactly which inputs were lost.
+    """
+
+    def __init__(self, put, prefix=COPY_PREFIX, target_bytes=TARGET_FILE_BYTES,
+                 max_age_seconds=MAX_FILE_AGE_SECONDS, clock=time.monotonic):
+        self.put = put
+        self.prefix = prefix
+        self.target_bytes = target_bytes
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self.files_written = 0
+        self.records_written = 0
+        self.failed_tags = set()
+        self._reset()
+
+    def _reset(self):
+        self._lines = []
+        self._tags = set()
+        self._size = 0
+        self._opened_at = None
+
+    def add(self, line, tag=None):
+        """Buffer one NDJSON line; flushes when the file is full or old"""
+        if isinstance(line, str):
+            line = line.encode('utf-8')
+        if not line.endswith(b'\n'):
+            line += b'\n'
+        if self._opened_at is None:
+            self._opened_at = self.clock()
+        self._lines.append(line)
+        self._size += len(line)
+        if tag is not None:
+            self._tags.add(tag)
+        if self._size >= self.target_bytes or self.is_expired():
+            self.flush()
+
+    def is_expired(self):
+        return self._opened_at is not None and self.clock() - self._opened_at >= self.max_age_seconds
+
+    def next_key(self):
+        now = datetime.utcnow()
+        return (f"{self.prefix}{now.strftime('%Y/%m/%d')}/{now.strftime('%H')}/"
+                f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:12]}.json.gz")
+
+    def flush(self):
+        """Write the buffered lines as one gzip file; returns the key or None"""
+        if not self._lines:
+            return None
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6) as gz:
+            gz.write(b''.join(self._lines))
+        key = self.next_key()
+        count = len(self._lines)
+        try:
+            self.put(key, buffer.getvalue())
+            self.files_written += 1
+            self.records_written += count
+        except Exception as e:
+            print(f"❌ Failed to write {key} ({count} records): {e}")
+            self.failed_tags.update(self._tags)
+            key = None
+        self._reset()
+        return key
+
+
+def lambda_handler(event, context):
+    """SQS-triggered batcher: pack queued webhook records into gzip COPY files"""
+    bucket = os.environ.get('RAW_BUCKET', 'edna-stream-meraki')
+    s3 = get_s3_client()
+
+    def put(key, body):
+        s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/gzip')
+        print(f"✅ S3 COPY FILE: s3://{bucket}/{key}")
+
+    batcher = CopyFileBatcher(put)
+    for record in event.get('Records', []):
+        batcher.add(record['body'], tag=record['messageId'])
+    batcher.flush()
+
+    print(f"Batched {batcher.records_written} records into {batcher.files_written} files, "
+          f"{len(batcher.failed_tags)} messages failed")
+
+    # Only messages in files that failed to write are redelivered
+    return {'batchItemFailures': [{'itemIdentifier': tag} for tag in sorted(batcher.failed_tags)]}
+
+
+# For local testing
+if __name__ == '__main__':
+    import sys
+
+    out_dir = 'copy_batches'
+
+    def put_local(key, body):
+        path = os.path.join(out_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+        print(f"Wrote {path} ({len(body)} bytes gzip)")
+
+    batcher = CopyFileBatcher(put_local, target_bytes=int(os.environ.get('TARGET_FILE_BYTES', 16 * 1024)))
+    for path in sys.argv[1:]:
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    batcher.add(line)
+    batcher.flush()
+    print(f"{batcher.records_written} records -> {batcher.files_written} files")
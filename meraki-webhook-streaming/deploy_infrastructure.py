@@ -4,6 +4,8 @@ Deploy AWS infrastructure for Meraki webhook streaming
 Creates: IAM roles, Lambda, API Gateway, Kinesis Firehose, S3 buckets
 """
 import json
+import os
+import sys
 import boto3
 import zipfile
 import io
@@ -11,6 +13,9 @@ import time
 import yaml
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'webhook-utils'))
+from lambda_package import add_shared_modules
+
 class InfrastructureDeployer:
     def __init__(self, config_file='config.json'):
         with open(config_file) as f:
@@ -201,6 +206,11 @@ class InfrastructureDeployer:
         zip_buffer = io.BytesIO()
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             zip_file.write('lambda_function.py', 'lambda_function.py')
+            # Same package serves the SQS batcher function (handler: copy_batcher.lambda_handler)
+            zip_file.write('copy_batcher.py', 'copy_batcher.py')
+            zip_file.write('meraki_flatten.py', 'meraki_flatten.py')
+            zip_file.write('schema_alerts.py', 'schema_alerts.py')
+            add_shared_modules(zip_file)
         
         zip_buffer.seek(0)
         
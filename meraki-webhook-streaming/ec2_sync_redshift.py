@@ -3,10 +3,14 @@
 Run on EC2 bastion - syncs S3 to Redshift every 5 minutes
 No SSH tunnel needed since EC2 is in VPN
 """
+import json
+import os
 import psycopg2
 import boto3
 import time
+from botocore.exceptions import ClientError
 from datetime import datetime
+from meraki_flatten import column_list
 
 # Redshift connection (direct - no SSH tunnel)
 REDSHIFT_HOST = 'edna-prod-dw.cejfjblsis8x.us-east-1.redshift.amazonaws.com'
@@ -18,6 +22,21 @@ REDSHIFT_PASSWORD = 'Cc@succ123!'
 # AWS credentials (use IAM role on EC2 instead)
 S3_BUCKET = 'edna-stream-meraki'
 S3_PREFIX = 'copy-job/'
+# redshift-upgrade/redshift_upgrade.py creates this object while the cluster is
+# upgraded, reading it from the same config.json
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')) as f:
+    PAUSE_MARKER = json.load(f)['sync']['pause_marker']
+
+def sync_paused(s3):
+    """True while the upgrade pause marker exists"""
+    bucket, _, key = PAUSE_MARKER[len('s3://'):].partition('/')
+    try:
+        s3.head_object(Bucket=bucket, Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
 
 def sync_to_redshift():
     print(f"[{datetime.now()}] Starting sync...")
@@ -27,6 +46,10 @@ def sync_to_redshift():
         session = boto3.Session()
         credentials = session.get_credentials()
         
+        if sync_paused(session.client('s3')):
+            print(f"[{datetime.now()}] ⏸️ Paused ({PAUSE_MARKER}) - skipping")
+            return
+        
         # Connect to Redshift
         conn = psycopg2.connect(
             host=REDSHIFT_HOST,
@@ -40,17 +63,7 @@ def sync_to_redshift():
         
         # Run COPY command
         copy_sql = f"""
-        COPY edna_stream_meraki.meraki_webhooks (
-            timestamp, source, lambda_request_id, environment, s3_raw_location,
-            version, shared_secret, sent_at,
-            organization_id, organization_name, organization_url,
-            network_id, network_name, network_url, network_tags,
-            device_serial, device_mac, device_name, device_url, device_tags, device_model,
-            alert_id, alert_type, alert_type_id, alert_level, occurred_at,
-            alert_config_id, alert_config_name, started_alerting,
-            condition_id, trigger_ts, trigger_type, trigger_node_id, trigger_sensor_value,
-            payload_json
-        )
+        COPY edna_stream_meraki.meraki_webhooks ({column_list()})
         FROM 's3://{S3_BUCKET}/{S3_PREFIX}'
         ACCESS_KEY_ID '{credentials.access_key}'
         SECRET_ACCESS_KEY '{credentials.secret_key}'
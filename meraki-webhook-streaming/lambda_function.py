@@ -2,12 +2,56 @@
 AWS Lambda function to process Meraki webhooks
 Handles varying payload structures and delivers to S3 and Firehose
 """
-import json
-import base64
-import boto3
 import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+import json_codec
+from meraki_flatten import flatten_payload
+from schema_alerts import gate_from_environment
+
+# AWS clients are created on first use and cached for the life of the
+# container, so warm invocations skip client setup (and Firehose-only
+# invocations never pay for importing boto3)
+_clients = {}
+
+def get_client(service_name):
+    """Return a module-cached boto3 client for service_name"""
+    client = _clients.get(service_name)
+    if client is None:
+        import boto3
+        client = boto3.client(service_name)
+        _clients[service_name] = client
+    return client
+
+# How each webhook is written to S3 (INGEST_MODE env var):
+#   dual     - pretty-printed raw/ object, then the copy-job/ record (default)
+#   parallel - both objects, compact; the copy-job/ record is serialized while
+#              the raw/ PUT is in flight and written once it has finished
+#   single   - only the copy-job/ record; it already carries the raw body
+#              under 'payload', so raw/ is skipped (one PUT per webhook)
+#   queue    - no S3 write; the record goes to COPY_QUEUE_URL and
+#              copy_batcher.py packs queued records into gzip COPY files
+INGEST_MODE = os.environ.get('INGEST_MODE', 'dual').lower()
+
+# How the Firehose transform handles records (FIREHOSE_TRANSFORM_MODE env var):
+#   passthrough - every record is parsed, but records already framed as one
+#                 JSON object per line are returned as-is instead of
+#                 re-serialized (default)
+#   parse       - every record is parsed and re-serialized
+FIREHOSE_TRANSFORM_MODE = os.environ.get('FIREHOSE_TRANSFORM_MODE', 'passthrough').lower()
+
+_executor = None
+
+def get_executor():
+    """Module-cached thread pool for concurrent S3 writes"""
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(max_workers=2)
+    return _executor
+
 def detect_schema_version(payload):
     """Detect schema version based on field presence"""
     if 'version' in payload and payload.get('version') == '0.1':
@@ -17,17 +61,40 @@ def detect_schema_version(payload):
         return 'v0.1'
     return 'unknown'
 
+_schema_gate = None
+
+def get_schema_gate():
+    """Module-cached unknown-schema alert gate (see schema_alerts.py)"""
+    global _schema_gate
+    if _schema_gate is None:
+        _schema_gate = gate_from_environment(get_client)
+    return _schema_gate
+
 def alert_unknown_schema(payload):
-    """Alert on unknown schema via CloudWatch Logs and SNS"""
-    print(f"⚠️ UNKNOWN SCHEMA DETECTED: {json.dumps(payload, indent=2)}")
+    """Alert on unknown schema via CloudWatch Logs and SNS, once per key fingerprint"""
+    action, fingerprint, paths, count = get_schema_gate().check(payload)
+    if action == 'sample':
+        print(f"⚠️ UNKNOWN SCHEMA {fingerprint} seen {count} times (sample): "
+              f"alert_type={payload.get('alertType')}, keys={len(paths)}")
+        return
+    if action == 'suppressed':
+        print(f"⚠️ UNKNOWN SCHEMA {fingerprint}: new fingerprint, alert rate limit reached")
+        return
+    if action != 'alert':
+        return
+    
+    print(f"⚠️ UNKNOWN SCHEMA DETECTED ({fingerprint}): {json_codec.dumps(payload, pretty=True)}")
     sns_topic = os.environ.get('ALERT_SNS_TOPIC')
     if sns_topic:
         try:
-            sns = boto3.client('sns')
+            sns = get_client('sns')
             sns.publish(
                 TopicArn=sns_topic,
                 Subject='Meraki Webhook: Unknown Schema Detected',
-                Message=f"Unknown schema detected:\n\n{json.dumps(payload, indent=2)}"
+                Message=(f"Unknown schema detected (fingerprint {fingerprint}). "
+                         f"Further webhooks with the same keys are sampled in the logs only.\n\n"
+                         f"Key paths:\n" + '\n'.join(paths) + "\n\n"
+                         f"Payload:\n{json_codec.dumps(payload, pretty=True)}")
             )
         except Exception as e:
             print(f"Failed to send SNS alert: {e}")
@@ -35,15 +102,15 @@ def alert_unknown_schema(payload):
 def alert_processing_error(payload, error_msg):
     """Alert on processing errors"""
     print(f"❌ PROCESSING ERROR: {error_msg}")
-    print(f"Payload: {json.dumps(payload, indent=2)}")
+    print(f"Payload: {json_codec.dumps(payload, pretty=True)}")
     sns_topic = os.environ.get('ALERT_SNS_TOPIC')
     if sns_topic:
         try:
-            sns = boto3.client('sns')
+            sns = get_client('sns')
             sns.publish(
                 TopicArn=sns_topic,
                 Subject='Meraki Webhook: Processing Error',
-                Message=f"Error: {error_msg}\n\nPayload: {json.dumps(payload, indent=2)}"
+                Message=f"Error: {error_msg}\n\nPayload: {json_codec.dumps(payload, pretty=True)}"
             )
         except Exception as e:
             print(f"Failed to send SNS alert: {e}")
@@ -51,63 +118,19 @@ def alert_processing_error(payload, error_msg):
 def flatten_meraki_payload(payload):
     """
     Flatten Meraki webhook payload to consistent schema
-    Handles varying alert types and structures
+    Returns one row per alertData.triggerData entry (see meraki_flatten.py)
     """
     try:
         schema_version = detect_schema_version(payload)
         if schema_version == 'unknown':
             alert_unknown_schema(payload)
         
-        # Base fields present in all webhooks
-        flattened = {
-            'version': payload.get('version'),
-            'shared_secret': payload.get('sharedSecret'),
-            'sent_at': payload.get('sentAt'),
-            'organization_id': payload.get('organizationId'),
-            'organization_name': payload.get('organizationName'),
-            'organization_url': payload.get('organizationUrl'),
-            'network_id': payload.get('networkId'),
-            'network_name': payload.get('networkName'),
-            'network_url': payload.get('networkUrl'),
-            'network_tags': json.dumps(payload.get('networkTags', [])),
-            'device_serial': payload.get('deviceSerial'),
-            'device_mac': payload.get('deviceMac'),
-            'device_name': payload.get('deviceName'),
-            'device_url': payload.get('deviceUrl'),
-            'device_tags': json.dumps(payload.get('deviceTags', [])),
-            'device_model': payload.get('deviceModel'),
-            'alert_id': payload.get('alertId'),
-            'alert_type': payload.get('alertType'),
-            'alert_type_id': payload.get('alertTypeId'),
-            'alert_level': payload.get('alertLevel'),
-            'occurred_at': payload.get('occurredAt')
-        }
-        
-        # Alert data - varies by alert type
-        alert_data = payload.get('alertData', {})
-        if alert_data:
-            flattened['alert_config_id'] = alert_data.get('alertConfigId')
-            flattened['alert_config_name'] = alert_data.get('alertConfigName')
-            flattened['started_alerting'] = alert_data.get('startedAlerting')
-            
-            # Trigger data - can be array
-            trigger_data = alert_data.get('triggerData', [])
-            if trigger_data and len(trigger_data) > 0:
-                first_trigger = trigger_data[0]
-                flattened['condition_id'] = first_trigger.get('conditionId')
-                
-                trigger = first_trigger.get('trigger', {})
-                flattened['trigger_ts'] = trigger.get('ts')
-                flattened['trigger_type'] = trigger.get('type')
-                flattened['trigger_node_id'] = trigger.get('nodeId')
-                flattened['trigger_sensor_value'] = trigger.get('sensorValue')
-        
-        return flattened
+        return flatten_payload(payload)
         
     except Exception as e:
         print(f"Error flattening payload: {e}")
         alert_processing_error(payload, str(e))
-        return {}
+        return [{}]
 
 def lambda_handler(event, context):
     """
@@ -125,14 +148,51 @@ def lambda_handler(event, context):
         # API Gateway webhook
         return process_api_gateway_webhook(event, context)
 
+def write_raw_payload(s3_client, bucket, s3_key, raw_body):
+    """Store the raw webhook body under raw/; returns True on success"""
+    try:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=s3_key,
+            Body=raw_body,
+            ContentType='application/json'
+        )
+        return True
+    except Exception as s3_error:
+        print(f"S3 raw storage error: {s3_error}")
+        return False
+
+def build_copy_lines(webhook_data, rows):
+    """
+    NDJSON body with one line per flattened row (one per trigger)
+    The raw body under 'payload' is only carried on the first line
+    """
+    lines = [json_codec.dumps_line({**webhook_data, **rows[0]})]
+    metadata = {k: v for k, v in webhook_data.items() if k != 'payload'}
+    lines.extend(json_codec.dumps_line({**metadata, **row}) for row in rows[1:])
+    return b''.join(lines)
+
+def write_copy_record(s3_client, bucket, s3_key, webhook_data, rows, body=None):
+    """Write to S3 for Redshift COPY JOB (date-partitioned, newline-delimited JSON)"""
+    try:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=s3_key,
+            Body=body if body is not None else build_copy_lines(webhook_data, rows),
+            ContentType='application/json'
+        )
+        print(f"✅ S3 COPY JOB: s3://{bucket}/{s3_key}")
+    except Exception as copy_error:
+        print(f"❌ S3 COPY JOB ERROR: {copy_error}")
+        raise
+
 def process_api_gateway_webhook(event, context):
     """Process webhook from API Gateway"""
     try:
-        s3_client = boto3.client('s3')
-        redshift_data = boto3.client('redshift-data')
+        s3_client = get_client('s3') if INGEST_MODE != 'queue' else None
         
         # Parse webhook body
-        body = json.loads(event.get('body', '{}'))
+        body = json_codec.loads(event.get('body', '{}'))
         
         # Add metadata
         webhook_data = {
@@ -143,55 +203,54 @@ def process_api_gateway_webhook(event, context):
             'payload': body
         }
         
-        # Flatten the payload for Redshift
-        flattened_data = flatten_meraki_payload(body)
-        webhook_data.update(flattened_data)
+        # Flatten the payload for Redshift (one row per trigger)
+        rows = flatten_meraki_payload(body)
         
-        # Store raw payload to S3
-        try:
-            raw_bucket = os.environ.get('RAW_BUCKET', 'edna-stream-meraki')
-            timestamp = datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S')
-            s3_key = f"raw/{timestamp}-{context.aws_request_id}.json"
-            
-            s3_client.put_object(
-                Bucket=raw_bucket,
-                Key=s3_key,
-                Body=json.dumps(body, indent=2),
-                ContentType='application/json'
-            )
-            webhook_data['s3_raw_location'] = f"s3://{raw_bucket}/{s3_key}"
-        except Exception as s3_error:
-            print(f"S3 raw storage error: {s3_error}")
+        bucket = os.environ.get('RAW_BUCKET', 'edna-stream-meraki')
+        now = datetime.utcnow()
+        raw_key = f"raw/{now.strftime('%Y-%m-%d-%H-%M-%S')}-{context.aws_request_id}.json"
+        copy_key = f"copy-job/{now.strftime('%Y/%m/%d')}/{now.strftime('%H')}/{context.aws_request_id}.json"
         
-        # Write to S3 for Redshift COPY JOB (date-partitioned, newline-delimited JSON)
-        try:
-            copy_bucket = os.environ.get('RAW_BUCKET', 'edna-stream-meraki')
-            now = datetime.utcnow()
-            date_partition = now.strftime('%Y/%m/%d')
-            hour_partition = now.strftime('%H')
-            s3_key = f"copy-job/{date_partition}/{hour_partition}/{context.aws_request_id}.json"
-            
-            s3_client.put_object(
-                Bucket=copy_bucket,
-                Key=s3_key,
-                Body=json.dumps(webhook_data) + '\n',
-                ContentType='application/json'
+        if INGEST_MODE == 'queue':
+            webhook_data['s3_raw_location'] = None
+            get_client('sqs').send_message(
+                QueueUrl=os.environ['COPY_QUEUE_URL'],
+                MessageBody=build_copy_lines(webhook_data, rows).decode('utf-8')
             )
-            print(f"✅ S3 COPY JOB: s3://{copy_bucket}/{s3_key}")
-        except Exception as copy_error:
-            print(f"❌ S3 COPY JOB ERROR: {copy_error}")
-            raise
+            print(f"✅ Queued for COPY batch: {context.aws_request_id}")
+        elif INGEST_MODE == 'single':
+            # One compact record: flattened columns plus the raw body under 'payload'
+            webhook_data['s3_raw_location'] = f"s3://{bucket}/{copy_key}"
+            write_copy_record(s3_client, bucket, copy_key, webhook_data, rows)
+        elif INGEST_MODE == 'parallel':
+            # The copy record is serialized while the raw PUT is in flight, but
+            # only written after it: a COPY JOB may load the file as soon as it
+            # lands, so it is written once, with the final location
+            webhook_data['s3_raw_location'] = f"s3://{bucket}/{raw_key}"
+            raw_future = get_executor().submit(
+                write_raw_payload, s3_client, bucket, raw_key, json_codec.dumps_bytes(body)
+            )
+            copy_body = build_copy_lines(webhook_data, rows)
+            if not raw_future.result():
+                webhook_data['s3_raw_location'] = None
+                copy_body = build_copy_lines(webhook_data, rows)
+            write_copy_record(s3_client, bucket, copy_key, webhook_data, rows, body=copy_body)
+        else:
+            # Store raw payload to S3
+            if write_raw_payload(s3_client, bucket, raw_key, json_codec.dumps_bytes(body, pretty=True)):
+                webhook_data['s3_raw_location'] = f"s3://{bucket}/{raw_key}"
+            write_copy_record(s3_client, bucket, copy_key, webhook_data, rows)
         
         # Log for debugging
         print(f"Processed webhook: alert_type={body.get('alertType')}, "
-              f"device={flattened_data.get('device_name')}")
+              f"device={rows[0].get('device_name')}, triggers={len(rows)}")
         
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json'
             },
-            'body': json.dumps({
+            'body': json_codec.dumps({
                 'status': 'success',
                 'message': 'Webhook received and processed',
                 'request_id': context.aws_request_id
@@ -205,7 +264,7 @@ def process_api_gateway_webhook(event, context):
             'headers': {
                 'Content-Type': 'application/json'
             },
-            'body': json.dumps({
+            'body': json_codec.dumps({
                 'status': 'error',
                 'message': str(e)
             })
@@ -214,18 +273,13 @@ def process_api_gateway_webhook(event, context):
 def process_firehose_records(event, context):
     """Transform Firehose records for Redshift"""
     output_records = []
+    passthrough = FIREHOSE_TRANSFORM_MODE == 'passthrough'
     
     for record in event['records']:
         try:
-            # Decode the data
-            payload = base64.b64decode(record['data']).decode('utf-8')
-            data = json.loads(payload)
-            
-            # Transform for Redshift - create a flattened JSON string
-            transformed_data = json.dumps(data) + '\n'
-            
-            # Encode back to base64
-            encoded_data = base64.b64encode(transformed_data.encode('utf-8')).decode('utf-8')
+            # Framed JSON lines pass through after a byte-level check;
+            # anything else is decoded, parsed and re-serialized
+            encoded_data = json_codec.transform_record(record['data'], passthrough)
             
             output_records.append({
                 'recordId': record['recordId'],
@@ -250,7 +304,7 @@ def process_firehose_records(event, context):
 if __name__ == '__main__':
     # Test with sample Meraki webhook
     test_event = {
-        'body': json.dumps({
+        'body': json_codec.dumps({
             "version": "0.1",
             "sharedSecret": "test123",
             "sentAt": "2025-01-15T12:00:00Z",
@@ -285,7 +339,7 @@ if __name__ == '__main__':
     }
     
     class MockContext:
-        request_id = 'test-request-id'
+        aws_request_id = 'test-request-id'
     
     result = lambda_handler(test_event, MockContext())
-    print(json.dumps(result, indent=2))
+    print(json_codec.dumps(result, pretty=True))
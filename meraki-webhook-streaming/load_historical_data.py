@@ -10,6 +10,7 @@ import os
 from datetime import datetime
 from sshtunnel import SSHTunnelForwarder
 from setup_credentials import CredentialManager
+from meraki_flatten import COLUMNS, RAW_PAYLOAD_COLUMN, column_list, flatten_payload
 
 def load_historical_data():
     """Load historical webhook data from S3 to Redshift"""
@@ -135,12 +136,11 @@ def load_historical_data():
                             else:
                                 payload = webhook_data
                             
-                            # Flatten payload
-                            flattened = flatten_payload(payload)
-                            
-                            # Insert into Redshift
-                            insert_record(cursor, schema_name, flattened, payload)
-                            records_inserted += 1
+                            # Flatten payload (one row per trigger)
+                            for flattened in flatten_payload(payload):
+                                # Insert into Redshift
+                                insert_record(cursor, schema_name, flattened, payload)
+                                records_inserted += 1
                             
                         except json.JSONDecodeError:
                             errors += 1
@@ -171,115 +171,21 @@ def load_historical_data():
         print(f"❌ Error: {e}")
         return False
 
-def flatten_payload(payload):
-    """Flatten Meraki payload to match Redshift schema"""
-    flattened = {
-        'version': payload.get('version'),
-        'shared_secret': payload.get('sharedSecret'),
-        'sent_at': payload.get('sentAt'),
-        'organization_id': payload.get('organizationId'),
-        'organization_name': payload.get('organizationName'),
-        'organization_url': payload.get('organizationUrl'),
-        'network_id': payload.get('networkId'),
-        'network_name': payload.get('networkName'),
-        'network_url': payload.get('networkUrl'),
-        'network_tags': json.dumps(payload.get('networkTags', [])),
-        'device_serial': payload.get('deviceSerial'),
-        'device_mac': payload.get('deviceMac'),
-        'device_name': payload.get('deviceName'),
-        'device_url': payload.get('deviceUrl'),
-        'device_tags': json.dumps(payload.get('deviceTags', [])),
-        'device_model': payload.get('deviceModel'),
-        'alert_id': payload.get('alertId'),
-        'alert_type': payload.get('alertType'),
-        'alert_type_id': payload.get('alertTypeId'),
-        'alert_level': payload.get('alertLevel'),
-        'occurred_at': payload.get('occurredAt')
-    }
-    
-    # Alert data
-    alert_data = payload.get('alertData', {})
-    if alert_data:
-        flattened['alert_config_id'] = alert_data.get('alertConfigId')
-        flattened['alert_config_name'] = alert_data.get('alertConfigName')
-        flattened['started_alerting'] = alert_data.get('startedAlerting')
-        
-        # Trigger data
-        trigger_data = alert_data.get('triggerData', [])
-        if trigger_data and len(trigger_data) > 0:
-            first_trigger = trigger_data[0]
-            flattened['condition_id'] = first_trigger.get('conditionId')
-            
-            trigger = first_trigger.get('trigger', {})
-            flattened['trigger_ts'] = trigger.get('ts')
-            flattened['trigger_type'] = trigger.get('type')
-            flattened['trigger_node_id'] = trigger.get('nodeId')
-            flattened['trigger_sensor_value'] = trigger.get('sensorValue')
-    
-    return flattened
+# Envelope columns set by this loader, then the flattened fields and the raw payload
+INSERT_COLUMNS = ('timestamp', 'source', 'environment') + COLUMNS + (RAW_PAYLOAD_COLUMN,)
 
 def insert_record(cursor, schema_name, flattened, raw_payload):
     """Insert record into Redshift"""
     
     insert_sql = f"""
-    INSERT INTO {schema_name}.meraki_webhooks (
-        timestamp, source, environment,
-        version, shared_secret, sent_at,
-        organization_id, organization_name, organization_url,
-        network_id, network_name, network_url, network_tags,
-        device_serial, device_mac, device_name, device_url, device_tags, device_model,
-        alert_id, alert_type, alert_type_id, alert_level, occurred_at,
-        alert_config_id, alert_config_name, started_alerting,
-        condition_id, trigger_ts, trigger_type, trigger_node_id, trigger_sensor_value,
-        payload_json
-    ) VALUES (
-        %s, %s, %s,
-        %s, %s, %s,
-        %s, %s, %s,
-        %s, %s, %s, %s,
-        %s, %s, %s, %s, %s, %s,
-        %s, %s, %s, %s, %s,
-        %s, %s, %s,
-        %s, %s, %s, %s, %s,
-        %s
-    )
+    INSERT INTO {schema_name}.meraki_webhooks ({column_list(INSERT_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})
     """
     
-    cursor.execute(insert_sql, (
-        datetime.utcnow().isoformat() + 'Z',
-        'meraki_webhook_historical',
-        'production',
-        flattened.get('version'),
-        flattened.get('shared_secret'),
-        flattened.get('sent_at'),
-        flattened.get('organization_id'),
-        flattened.get('organization_name'),
-        flattened.get('organization_url'),
-        flattened.get('network_id'),
-        flattened.get('network_name'),
-        flattened.get('network_url'),
-        flattened.get('network_tags'),
-        flattened.get('device_serial'),
-        flattened.get('device_mac'),
-        flattened.get('device_name'),
-        flattened.get('device_url'),
-        flattened.get('device_tags'),
-        flattened.get('device_model'),
-        flattened.get('alert_id'),
-        flattened.get('alert_type'),
-        flattened.get('alert_type_id'),
-        flattened.get('alert_level'),
-        flattened.get('occurred_at'),
-        flattened.get('alert_config_id'),
-        flattened.get('alert_config_name'),
-        flattened.get('started_alerting'),
-        flattened.get('condition_id'),
-        flattened.get('trigger_ts'),
-        flattened.get('trigger_type'),
-        flattened.get('trigger_node_id'),
-        flattened.get('trigger_sensor_value'),
-        json.dumps(raw_payload)
-    ))
+    values = [datetime.utcnow().isoformat() + 'Z', 'meraki_webhook_historical', 'production']
+    values.extend(flattened.get(column) for column in COLUMNS)
+    values.append(json.dumps(raw_payload))
+    cursor.execute(insert_sql, values)
 
 if __name__ == "__main__":
     load_historical_data()
@@ -0,0 +1,271 @@
+"""
+Shared flattening spec for Meraki webhook payloads
+
+One declarative field list drives every consumer: the webhook Lambda, the
+historical loader, the backfill script, the Firehose transform, the Redshift
+DDL and the COPY column lists. Every entry in alertData.triggerData becomes
+its own row; payloads without triggers still produce one row with empty
+trigger columns.
+
+The spec is compiled once at import into extractors that fetch all keys
+under the same parent with a single operator.itemgetter call.
+
+Two backends:
+  flatten_payloads(payloads) - pure Python, columnar output, no dependencies
+                               (used inside the webhook Lambda)
+  flatten_frame(df)          - Polars expressions over a DataFrame with a
+                               'payload' struct column (Firehose transform)
+"""
+import json
+from collections import namedtuple
+from operator import itemgetter
+
+# column:        Redshift column / flattened key
+# path:          key path inside the payload (or inside one triggerData entry)
+# redshift_type: column type in meraki_webhooks
+# firehose_name: output name in the Firehose/Iceberg table, if different
+Field = namedtuple('Field', ['column', 'path', 'redshift_type', 'firehose_name'])
+
+# Metadata the ingest Lambda adds around the payload
+ENVELOPE_FIELDS = (
+    Field('timestamp', ('timestamp',), 'VARCHAR(50)', 'alert_timestamp'),
+    Field('source', ('source',), 'VARCHAR(50)', 'alert_source'),
+    Field('lambda_request_id', ('lambda_request_id',), 'VARCHAR(100)', None),
+    Field('environment', ('environment',), 'VARCHAR(50)', None),
+    Field('s3_raw_location', ('s3_raw_location',), 'VARCHAR(500)', None),
+)
+
+PAYLOAD_FIELDS = (
+    # Base webhook fields
+    Field('version', ('version',), 'VARCHAR(10)', 'webhook_version'),
+    Field('shared_secret', ('sharedSecret',), 'VARCHAR(100)', None),
+    Field('sent_at', ('sentAt',), 'TIMESTAMP', 'alert_sent_at'),
+    Field('organization_id', ('organizationId',), 'VARCHAR(50)', None),
+    Field('organization_name', ('organizationName',), 'VARCHAR(200)', None),
+    Field('organization_url', ('organizationUrl',), 'VARCHAR(500)', None),
+    Field('network_id', ('networkId',), 'VARCHAR(100)', None),
+    Field('network_name', ('networkName',), 'VARCHAR(200)', None),
+    Field('network_url', ('networkUrl',), 'VARCHAR(500)', None),
+    Field('network_tags', ('networkTags',), 'VARCHAR(1000)', None),
+    # Device information
+    Field('device_serial', ('deviceSerial',), 'VARCHAR(50)', None),
+    Field('device_mac', ('deviceMac',), 'VARCHAR(50)', None),
+    Field('device_name', ('deviceName',), 'VARCHAR(200)', None),
+    Field('device_url', ('deviceUrl',), 'VARCHAR(500)', None),
+    Field('device_tags', ('deviceTags',), 'VARCHAR(1000)', None),
+    Field('device_model', ('deviceModel',), 'VARCHAR(50)', None),
+    # Alert information
+    Field('alert_id', ('alertId',), 'VARCHAR(100)', None),
+    Field('alert_type', ('alertType',), 'VARCHAR(200)', None),
+    Field('alert_type_id', ('alertTypeId',), 'VARCHAR(100)', None),
+    Field('alert_level', ('alertLevel',), 'VARCHAR(50)', None),
+    Field('occurred_at', ('occurredAt',), 'TIMESTAMP', 'alert_occurrred_at'),
+    # Alert data
+    Field('alert_config_id', ('alertData', 'alertConfigId'), 'BIGINT', None),
+    Field('alert_config_name', ('alertData', 'alertConfigName'), 'VARCHAR(200)', None),
+    Field('started_alerting', ('alertData', 'startedAlerting'), 'BOOLEAN', None),
+)
+
+# Paths inside one alertData.triggerData entry
+TRIGGER_FIELDS = (
+    Field('condition_id', ('conditionId',), 'BIGINT', None),
+    Field('trigger_ts', ('trigger', 'ts'), 'DOUBLE PRECISION', 'event_timestamp'),
+    Field('trigger_type', ('trigger', 'type'), 'VARCHAR(50)', 'sensor_type'),
+    Field('trigger_node_id', ('trigger', 'nodeId'), 'BIGINT', 'node_id'),
+    Field('trigger_sensor_value', ('trigger', 'sensorValue'), 'DOUBLE PRECISION', 'sensor_value'),
+)
+
+TRIGGERS_PATH = ('alertData', 'triggerData')
+
+# List-valued columns stored as JSON text (missing -> '[]')
+JSON_COLUMNS = ('network_tags', 'device_tags')
+
+# Raw payload column kept next to the flattened fields
+RAW_PAYLOAD_COLUMN = 'payload_json'
+
+COLUMNS = tuple(f.column for f in PAYLOAD_FIELDS + TRIGGER_FIELDS)
+ENVELOPE_COLUMNS = tuple(f.column for f in ENVELOPE_FIELDS)
+
+# Columns loaded by COPY, in table order
+TABLE_COLUMNS = ENVELOPE_COLUMNS + COLUMNS + (RAW_PAYLOAD_COLUMN,)
+
+# Column -> Firehose/Iceberg output name, for the columns that are renamed
+FIREHOSE_NAMES = {
+    f.column: f.firehose_name
+    for f in ENVELOPE_FIELDS + PAYLOAD_FIELDS + TRIGGER_FIELDS if f.firehose_name
+}
+
+
+def _getter(path):
+    """Compile a key path into a function that returns None when any key is missing"""
+    if len(path) == 1:
+        key = path[0]
+
+        def get(d):
+            return d.get(key) if isinstance(d, dict) else None
+        return get
+
+    def get(d):
+        for key in path:
+            if not isinstance(d, dict):
+                return None
+            d = d.get(key)
+        return d
+    return get
+
+
+def compile_fields(fields):
+    """
+    Compile a field list into extract(d) -> list of values in field order
+
+    Fields sharing a parent path are fetched with one itemgetter call; a
+    missing key falls back to dict.get for that group only.
+    """
+    groups = {}
+    for i, field in enumerate(fields):
+        groups.setdefault(field.path[:-1], []).append((i, field.path[-1]))
+
+    plan = []
+    for parent, members in groups.items():
+        indexes = tuple(i for i, _ in members)
+        keys = tuple(key for _, key in members)
+        if len(keys) > 1:
+            get_keys = itemgetter(*keys)
+        else:
+            get_keys = lambda d, key=keys[0]: (d[key],)
+        plan.append((_getter(parent) if parent else None, indexes, keys, get_keys))
+
+    size = len(fields)
+
+    def extract(d):
+        values = [None] * size
+        for get_parent, indexes, keys, get_keys in plan:
+            node = get_parent(d) if get_parent else d
+            if not isinstance(node, dict):
+                continue
+            try:
+                found = get_keys(node)
+            except KeyError:
+                found = [node.get(key) for key in keys]
+            for i, value in zip(indexes, found):
+                values[i] = value
+        return values
+    return extract
+
+
+_extract_payload = compile_fields(PAYLOAD_FIELDS)
+_extract_trigger = compile_fields(TRIGGER_FIELDS)
+_get_triggers = _getter(TRIGGERS_PATH)
+
+
+def flatten_payloads(payloads):
+    """
+    Flatten payloads into columns, one row per trigger
+
+    Returns (columns, source_index) where columns maps column name -> list
+    of values and source_index[i] is the index of the payload row i came from.
+    """
+    columns = {name: [] for name in COLUMNS}
+    source_index = []
+    payload_columns = [columns[f.column] for f in PAYLOAD_FIELDS]
+    trigger_columns = [columns[f.column] for f in TRIGGER_FIELDS]
+
+    for i, payload in enumerate(payloads):
+        triggers = _get_triggers(payload)
+        if not isinstance(triggers, list) or not triggers:
+            triggers = [None]
+        n = len(triggers)
+        for values, value in zip(payload_columns, _extract_payload(payload)):
+            values.extend([value] * n)
+        trigger_values = [_extract_trigger(t) for t in triggers]
+        for j, values in enumerate(trigger_columns):
+            values.extend([t[j] for t in trigger_values])
+        source_index.extend([i] * n)
+
+    for name in JSON_COLUMNS:
+        columns[name] = [json.dumps(v if v is not None else []) for v in columns[name]]
+    return columns, source_index
+
+
+def column_list(columns=TABLE_COLUMNS):
+    """Comma-separated column list for COPY / INSERT statements"""
+    return ', '.join(columns)
+
+
+def redshift_table_ddl(table):
+    """CREATE TABLE statement for meraki_webhooks generated from the spec"""
+    definitions = [
+        'id BIGINT IDENTITY(1,1) PRIMARY KEY',
+        'ingestion_timestamp TIMESTAMP DEFAULT GETDATE()',
+    ]
+    definitions += [f"{f.column} {f.redshift_type}"
+                    for f in ENVELOPE_FIELDS + PAYLOAD_FIELDS + TRIGGER_FIELDS]
+    definitions.append(f"{RAW_PAYLOAD_COLUMN} VARCHAR(MAX)")
+    body = ',\n    '.join(definitions)
+    return (f"CREATE TABLE IF NOT EXISTS {table} (\n    {body}\n)\n"
+            f"DISTSTYLE AUTO\nSORTKEY (ingestion_timestamp, occurred_at);")
+
+
+def to_rows(columns):
+    """Columnar output -> list of row dicts"""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def flatten_payload(payload):
+    """Flatten a single payload into a list of row dicts (one per trigger)"""
+    columns, _ = flatten_payloads([payload])
+    return to_rows(columns)
+
+
+def _struct_expr(pl, dtype, base, path):
+    """Polars expression for a key path, or a null literal if the schema lacks it"""
+    expr = base
+    for key in path:
+        if not isinstance(dtype, pl.Struct):
+            return pl.lit(None)
+        fields = {f.name: f.dtype for f in dtype.fields}
+        if key not in fields:
+            return pl.lit(None)
+        expr = expr.struct.field(key)
+        dtype = fields[key]
+    return expr
+
+
+def flatten_frame(df, payload_col='payload', names=None, keep=()):
+    """
+    Flatten a Polars DataFrame with a struct `payload_col`, one row per trigger
+
+    `names` optionally maps column -> output name; `keep` lists existing
+    columns (e.g. envelope metadata) carried through unchanged. List-valued
+    JSON_COLUMNS stay Polars lists here (written as JSON arrays by NDJSON).
+    """
+    import polars as pl
+
+    names = names or {}
+    payload_type = df.schema[payload_col]
+    triggers_type = payload_type
+    for key in TRIGGERS_PATH:
+        fields = {f.name: f.dtype for f in triggers_type.fields} if isinstance(triggers_type, pl.Struct) else {}
+        triggers_type = fields.get(key)
+
+    exprs = [pl.col(c) for c in keep]
+    for name, path, _, _ in PAYLOAD_FIELDS:
+        exprs.append(_struct_expr(pl, payload_type, pl.col(payload_col), path).alias(names.get(name, name)))
+
+    if isinstance(triggers_type, pl.List):
+        trigger_col = '__trigger'
+        exprs.append(_struct_expr(pl, payload_type, pl.col(payload_col), TRIGGERS_PATH).alias(trigger_col))
+        # Empty/missing trigger lists explode to a single null row, so the payload is
+        # kept (polars drops empty lists unless empty_as_null)
+        out = df.select(exprs).explode(trigger_col, empty_as_null=True, keep_nulls=True)
+        trigger_type = triggers_type.inner
+        out = out.with_columns(
+            [_struct_expr(pl, trigger_type, pl.col(trigger_col), path).alias(names.get(name, name))
+             for name, path, _, _ in TRIGGER_FIELDS]
+        ).drop(trigger_col)
+    else:
+        out = df.select(exprs).with_columns(
+            [pl.lit(None).alias(names.get(f.column, f.column)) for f in TRIGGER_FIELDS]
+        )
+    return out
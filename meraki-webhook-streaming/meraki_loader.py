@@ -2,86 +2,212 @@ import json
 import boto3
 import logging
 import os
+import time
 from datetime import datetime
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Firehose limits for PutRecordBatch
+MAX_BATCH_RECORDS = 500
+MAX_BATCH_BYTES = 4 * 1024 * 1024
+MAX_RETRIES = int(os.environ.get('FIREHOSE_MAX_RETRIES', '3'))
+
+# Commenting out and hard coding for testing - error thrown on DeliveryStreamName not conforming to naming convention
+#DELIVERY_STREAM_NAME = os.environ.get('FIREHOSE_STREAM_NAME')
+DELIVERY_STREAM_NAME = 'meraki-webhooks-to-s3-iceberg'
+
+# Created once per container and reused across warm invocations
+_firehose = None
+
+
+def get_firehose_client():
+    global _firehose
+    if _firehose is None:
+        _firehose = boto3.client('firehose')
+    return _firehose
+
+
+def extract_webhooks(event):
+    """
+    Return a list of (message_id, webhook_data) pairs from the event
+
+    Handles a single API Gateway webhook, an API Gateway body holding a JSON
+    array of webhooks, an SQS batch, and a direct invocation with the raw payload.
+    message_id is the SQS messageId (for partial batch failures) or None.
+    """
+    if event.get('Records') and event['Records'][0].get('eventSource') == 'aws:sqs':
+        webhooks = []
+        for record in event['Records']:
+            try:
+                body = json.loads(record['body'])
+            except json.JSONDecodeError as e:
+                # Redelivering a malformed message can never succeed
+                logger.error(f"Dropping invalid SQS message {record['messageId']}: {e}")
+                continue
+            for item in (body if isinstance(body, list) else [body]):
+                webhooks.append((record['messageId'], item))
+        return webhooks
+
+    if 'body' in event:
+        # If coming from API Gateway, the body might be a string
+        if isinstance(event['body'], str):
+            webhook_data = json.loads(event['body'])
+        else:
+            webhook_data = event['body']
+    else:
+        webhook_data = event
+
+    if isinstance(webhook_data, list):
+        return [(None, item) for item in webhook_data]
+    return [(None, webhook_data)]
+
+
+def enrich(webhook_data, context):
+    """Add metadata to the payload"""
+    return {
+        'timestamp': datetime.utcnow().isoformat(),
+        'source': 'meraki-webhook',
+        'lambda_request_id': context.aws_request_id,
+        'environment': 'non-prod',
+        'payload': webhook_data
+    }
+
+
+def chunk_records(records):
+    """Split encoded records into PutRecordBatch-sized chunks of indexes"""
+    chunk, chunk_bytes = [], 0
+    for i, data in enumerate(records):
+        if chunk and (len(chunk) >= MAX_BATCH_RECORDS or chunk_bytes + len(data) > MAX_BATCH_BYTES):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(i)
+        chunk_bytes += len(data)
+    if chunk:
+        yield chunk
+
+
+def put_record_batch(stream_name, records):
+    """
+    Send encoded records with PutRecordBatch, retrying only failed records
+
+    Returns (record_ids, failed) where record_ids[i] is the Firehose RecordId
+    for records[i] (None if it never succeeded) and failed is the set of
+    indexes still failing after MAX_RETRIES.
+    """
+    firehose = get_firehose_client()
+    record_ids = [None] * len(records)
+    failed = set()
+
+    for chunk in chunk_records(records):
+        pending = chunk
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(min(0.1 * (2 ** attempt), 2.0))
+            try:
+                response = firehose.put_record_batch(
+                    DeliveryStreamName=stream_name,
+                    Records=[{'Data': records[i]} for i in pending]
+                )
+            except Exception as e:
+                logger.error(f"PutRecordBatch failed (attempt {attempt + 1}): {e}")
+                continue
+
+            retry = []
+            for i, result in zip(pending, response['RequestResponses']):
+                if 'ErrorCode' in result:
+                    retry.append(i)
+                else:
+                    record_ids[i] = result['RecordId']
+            if retry:
+                logger.warning(f"{len(retry)}/{len(pending)} records failed "
+                               f"(attempt {attempt + 1}), retrying")
+            pending = retry
+            if not pending:
+                break
+        failed.update(pending)
+
+    return record_ids, failed
+
+
 def lambda_handler(event, context):
     """
     Lambda function to receive Meraki webhooks and forward to Firehose
+
+    API Gateway batches and SQS batches are aggregated into PutRecordBatch calls.
     """
-    
-    # Initialize Firehose client
-    firehose = boto3.client('firehose')
-    
+    is_sqs = bool(event.get('Records')) and event['Records'][0].get('eventSource') == 'aws:sqs'
+
     try:
-        # Log the incoming event for debugging
-        logger.info(f"Received event: {json.dumps(event)}")
-        
-        # Extract the webhook payload
-        if 'body' in event:
-            # If coming from API Gateway, the body might be a string
-            if isinstance(event['body'], str):
-                webhook_data = json.loads(event['body'])
-            else:
-                webhook_data = event['body']
-        else:
-            webhook_data = event
-        
-        # Add metadata to the payload
-        enriched_data = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'source': 'meraki-webhook',
-            'lambda_request_id': context.aws_request_id,
-            'environment': 'non-prod',
-            'payload': webhook_data
-        }
-        
+        webhooks = extract_webhooks(event)
+        logger.info(f"Received {len(webhooks)} webhook(s)")
+
+        enriched = [enrich(webhook_data, context) for _, webhook_data in webhooks]
+
         # Convert to JSON string with newline (required by Firehose)
-        firehose_record = json.dumps(enriched_data) + '\n'
-        
+        records = [(json.dumps(data) + '\n').encode('utf-8') for data in enriched]
+
         # Check if FIREHOSE_STREAM_NAME environment variable is set
         firehose_stream_name = os.environ.get('FIREHOSE_STREAM_NAME')
-        #firehose_stream_name = 'meraki-webhooks-to-s3-iceberg'
 
         if firehose_stream_name:
-            # Send data to Firehose - original
             try:
-                response = firehose.put_record(
-                    # Commenting out and hard coding for testing - error thrown on DeliveryStreamName not conforming to naming convention
-                    #DeliveryStreamName = firehose_stream_name,
-                    DeliveryStreamName = 'meraki-webhooks-to-s3-iceberg',
-                    Record={
-                        'Data': firehose_record
-                    }
-                )
-                
-                logger.info(f"Successfully sent data to Firehose. Record ID: {response['RecordId']}")
-                
-                # Return success response
+                record_ids, failed = put_record_batch(DELIVERY_STREAM_NAME, records)
+            except Exception as firehose_error:
+                logger.error(f"Error sending to Firehose: {str(firehose_error)}")
+                record_ids, failed = [None] * len(records), set(range(len(records)))
+
+            if is_sqs:
+                # Let SQS redeliver only the messages that didn't make it
+                failed_ids = sorted({webhooks[i][0] for i in failed})
+                logger.info(f"Sent {len(records) - len(failed)}/{len(records)} records to Firehose")
+                return {'batchItemFailures': [{'itemIdentifier': mid} for mid in failed_ids]}
+
+            if failed:
+                # 5xx so API Gateway / the sender retries; records that did
+                # get through are sent again with the retry
+                logger.error(f"{len(failed)}/{len(records)} records not sent to Firehose")
                 return {
-                    'statusCode': 200,
+                    'statusCode': 503,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
                     'body': json.dumps({
-                        'message': 'Webhook processed and sent to Firehose successfully',
+                        'error': 'Webhook not delivered to Firehose, retry later',
                         'environment': 'non-prod',
-                        'firehose_record_id': response['RecordId'],
+                        'failed_records': len(failed),
                         'firehose_stream': firehose_stream_name
                     })
                 }
 
-            except Exception as firehose_error:
-                logger.error(f"Error sending to Firehose: {str(firehose_error)}")
-                # Continue to logging mode if Firehose fails
-        
-        # Log mode - when no Firehose stream is configured or Firehose fails
-        #logger.info(f"WEBHOOK DATA (no Firehose configured): {firehose_record}")
-        
+            logger.info(f"Successfully sent {len(records)} records to Firehose")
+
+            # Return success response
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': json.dumps({
+                    'message': 'Webhook processed and sent to Firehose successfully',
+                    'environment': 'non-prod',
+                    'firehose_record_id': record_ids[0] if len(records) == 1 else None,
+                    'firehose_record_ids': record_ids,
+                    'failed_records': 0,
+                    'firehose_stream': firehose_stream_name
+                })
+            }
+
+        if is_sqs:
+            # No Firehose configured - nothing to retry
+            return {'batchItemFailures': []}
+
+        # Log mode - only when no Firehose stream is configured
+        #logger.info(f"WEBHOOK DATA (no Firehose configured): {records}")
+
         # Return success response
         return {
             'statusCode': 200,
@@ -92,10 +218,10 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'message': 'Webhook received and logged successfully (no Firehose configured)',
                 'environment': 'non-prod',
-                'logged_data': enriched_data
+                'logged_data': enriched[0] if len(enriched) == 1 else enriched
             })
         }
-        
+
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}")
         return {
@@ -103,9 +229,12 @@ def lambda_handler(event, context):
             'headers': {'Content-Type': 'application/json'},
             'body': json.dumps({'error': 'Invalid JSON payload', 'environment': 'non-prod'})
         }
-        
+
     except Exception as e:
         logger.error(f"Error processing webhook: {str(e)}")
+        if is_sqs:
+            # Fail the whole batch so SQS redelivers it
+            raise
         return {
             'statusCode': 500,
             'headers': {'Content-Type': 'application/json'},
@@ -1,168 +1,167 @@
 import base64
-#import yaml
+import io
+import json
 import logging
+from datetime import datetime
+
 import polars as pl
 
+from meraki_flatten import ENVELOPE_COLUMNS, FIREHOSE_NAMES, flatten_frame
+
 print('Loading function')
 
 # Set up logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+RECORD_ID_COL = '_record_id'
+# Envelope columns added by the ingest Lambda, carried through the flatten
+KEEP_COLUMNS = ENVELOPE_COLUMNS + (RECORD_ID_COL,)
+
+
+def decode_records(records):
+    """
+    Decode every Firehose record into NDJSON lines
+
+    Returns (lines, record_ids, dropped, failed) where record_ids[i] is the
+    recordId that produced lines[i]; records with an empty payload are
+    returned in `dropped` and records that are not valid base64 in `failed`,
+    and neither produces lines.
+    """
+    lines, record_ids, dropped, failed = [], [], [], []
+    for record in records:
+        record_id = record.get('recordId')
+        try:
+            payload = base64.b64decode(record.get('data', ''))
+        except (TypeError, ValueError) as e:
+            print(f"Error processing record {record_id}: {str(e)}")
+            failed.append(record_id)
+            continue
+        # It's common for multiple JSON objects to be sent in a single payload,
+        # separated by newlines.
+        record_lines = [line for line in payload.split(b'\n') if line.strip()]
+        if not record_lines:
+            dropped.append(record_id)
+            continue
+        lines.extend(record_lines)
+        record_ids.extend([record_id] * len(record_lines))
+    return lines, record_ids, dropped, failed
+
+
+def parse_datetime(col):
+    """ISO-8601 strings with or without a trailing Z -> Datetime"""
+    return (
+        pl.col(col).cast(pl.Utf8).str.strip_chars_end('Z')
+        .str.to_datetime('%Y-%m-%dT%H:%M:%S%.f', strict=False)
+    )
+
+
+def transform(df):
+    """Vectorized transform of a whole batch of webhook rows"""
+    # One row per trigger, so every sensor reading is kept
+    keep = [c for c in KEEP_COLUMNS if c in df.columns]
+    df = flatten_frame(df, names=FIREHOSE_NAMES, keep=keep)
+    df = df.rename({c: FIREHOSE_NAMES[c] for c in keep if c in FIREHOSE_NAMES})
+
+    columns = [pl.lit(datetime.utcnow().isoformat()).alias('processing_ts')]
+    for col in convert_str_datetime:
+        if col in df.columns:
+            columns.append(parse_datetime(col))
+    if 'event_timestamp' in df.columns:
+        # Trigger ts is epoch seconds (float)
+        columns.append(
+            pl.from_epoch((pl.col('event_timestamp') * 1000).cast(pl.Int64), time_unit='ms')
+            .alias('event_timestamp')
+        )
+    if 'sensor_value' in df.columns:
+        columns.append(pl.col('sensor_value').cast(pl.Float64, strict=False))
+    return df.with_columns(columns)
+
+
+def transform_lines(lines, record_ids):
+    """
+    Transform NDJSON lines in one DataFrame and split the output per recordId
+
+    Returns {recordId: ndjson_bytes}. Rows stay in input order through the
+    explode, so each recordId's output rows are contiguous.
+    """
+    df = pl.read_ndjson(io.BytesIO(b'\n'.join(lines)), infer_schema_length=None)
+    df = df.with_columns(pl.Series(RECORD_ID_COL, record_ids))
+    df = transform(df)
+
+    ids = df.get_column(RECORD_ID_COL).to_list()
+    out_lines = df.drop(RECORD_ID_COL).write_ndjson().encode('utf-8').split(b'\n')
+
+    output = {}
+    for record_id, line in zip(ids, out_lines):
+        output.setdefault(record_id, []).append(line)
+    return {record_id: b'\n'.join(rows) + b'\n' for record_id, rows in output.items()}
+
+
+def transform_per_record(lines, record_ids):
+    """
+    Fallback when the batch can't be parsed as a whole: transform each
+    record on its own so one malformed record doesn't fail the batch
+    """
+    grouped = {}
+    for record_id, line in zip(record_ids, lines):
+        grouped.setdefault(record_id, []).append(line)
+
+    output, failed = {}, []
+    for record_id, record_lines in grouped.items():
+        try:
+            output.update(transform_lines(record_lines, [record_id] * len(record_lines)))
+        except Exception as e:
+            print(f"Error processing record {record_id}: {str(e)}")
+            failed.append(record_id)
+    return output, failed
+
 
 def lambda_handler(event, context):
-    output = []
-    global rename_cols
-    global convert_str_datetime
+    records = event.get('records', [])
+    print(f"Received {len(records)} records to process.")
 
+    lines, record_ids, dropped, failed = decode_records(records)
+    for record_id in dropped:
+        print(f"Record {record_id} has empty payload, marking as Dropped.")
 
-    output_records = []
-    print(f"Received {len(event.get('records', []))} records to process.")
+    if lines:
+        try:
+            transformed = transform_lines(lines, record_ids)
+        except Exception as e:
+            logger.warning(f"Batch transform failed ({e}), falling back to per-record")
+            transformed, record_failed = transform_per_record(lines, record_ids)
+            failed += record_failed
+    else:
+        transformed = {}
 
-    for record in event.get('records', []):
+    dropped, failed = set(dropped), set(failed)
+    output_records = []
+    for record in records:
         record_id = record.get('recordId')
-        
-        try:
-            # 1. Decode the incoming data from base64
-            # The data from Firehose is base64 encoded.
-            payload_decoded = base64.b64decode(record.get('data', '')).decode('utf-8')
-
-            # It's common for multiple JSON objects to be sent in a single payload,
-            # separated by newlines.
-            if not payload_decoded.strip():
-                print(f"Record {record_id} has empty payload, marking as Dropped.")
-                output_records.append({'recordId': record_id, 'result': 'Dropped', 'data': record.get('data','')})
-                continue
-                
-            json_data = [json.loads(line) for line in payload_decoded.strip().split('\n')]
-
-            # 2. Load data into a Polars DataFrame for efficient transformation
-            df = pl.read_ndjson(json_data)
-
-            # 3. --- YOUR TRANSFORMATION LOGIC GOES HERE ---
-            logger.info(f'Created DataFrame')
-            df = df.unnest('payload').unnest('alertData').explode('triggerData').unnest('triggerData').unnest('trigger')
-            logger.info(f'Unnested DataFrame')
-            df = df.rename(rename_cols)
-            logger.info(f'Renamed DataFrame')
-            print(df)
-            
-            
-            df_transformed = df.with_columns([
-                pl.col("event_timestamp").str.to_datetime("%Y-%m-%dT%H:%M:%S%.f", strict=False),
-                pl.col("price").cast(pl.Float64),
-                pl.lit(datetime.utcnow().isoformat()).alias("processing_ts")
-            ])
-            
-            
-            records_as_dicts = df.to_dicts()
-            transformed_payload_str = "\n".join(json.dumps(d, default=str) for d in records_as_dicts) + "\n"
-
-            # 5. Encode the transformed data back to base64
-            payload_encoded = base64.b64encode(transformed_payload_str.encode('utf-8')).decode('utf-8')
-            
-            # 6. Append the processed record to the output list
+        if record_id in transformed:
             output_records.append({
                 'recordId': record_id,
                 'result': 'Ok',
-                'data': payload_encoded
+                'data': base64.b64encode(transformed[record_id]).decode('utf-8')
             })
-
-        except Exception as e:
+        elif record_id in dropped:
+            output_records.append({'recordId': record_id, 'result': 'Dropped', 'data': record.get('data', '')})
+        else:
             # If any step in the transformation fails, mark the record as
             # 'ProcessingFailed' and return the original data. Firehose can be
             # configured to route these failed records to a separate S3 bucket
             # for later inspection and reprocessing.
-            print(f"Error processing record {record_id}: {str(e)}")
             output_records.append({
                 'recordId': record_id,
                 'result': 'ProcessingFailed',
                 'data': record.get('data', '') # Return original data
             })
 
-    print(f"Successfully processed {len(output_records)} records.")
+    print(f"Successfully processed {len(output_records) - len(failed)} of {len(records)} records.")
     return {'records': output_records}
 
 
-
-
-'''
-    logger.info(f'Event: {event}')
-
-    #for record in event['records']:
-    for record in event:
-        logger.info(f'Entered for loop: {record}')
-        #print(record['recordId'])
-        payload = base64.b64decode(record['data']).decode('utf-8')
-
-        logger.info(f'Entering DataFrame Build - Payload: {payload}')
-
-        # Do custom processing on the payload here
-        df = pl.read_ndjson(payload)
-        logger.info(f'Created DataFrame')
-        df = df.unnest('payload').unnest('alertData').explode('triggerData').unnest('triggerData').unnest('trigger')
-        logger.info(f'Unnested DataFrame')
-        df = df.rename(rename_cols)
-        logger.info(f'Renamed DataFrame')
-        #print(df)
-
-        
-        # Error caused by timestamp string containing '.' that cannot be converted by rust's chrono crate
-        # To fix later
-        #for col in convert_str_datetime:
-        #    df = convert_str_to_dateteime(df, col)
-
-        payload = df.write_ndjson()
-
-
-    output_record = {
-        'recordId': record['recordId'],
-        'result': 'Ok',
-        'data': base64.b64encode(payload.encode('utf-8')).decode('utf-8')
-    }
-    output.append(output_record)
-
-    print('Successfully processed {} records.'.format(len(event['records'])))
-
-    return {'records': output}
-
-def convert_str_to_dateteime(df: pl.DataFrame, col: str) -> pl.DataFrame:
-    df = df.with_columns(pl.col(col).str.strptime(pl.Datetime, '%Y-%m-%dT%H:%M:%S.%fZ'))
-    return df
-'''
-rename_cols = {
-    'timestamp': 'alert_timestamp'
-    , 'source': 'alert_source'
-    , 'version': 'webhook_version'
-    , 'sharedSecret': 'shared_secret'
-    , 'sentAt': 'alert_sent_at'
-    , 'organizationId': 'organization_id'
-    , 'organizationName': 'organization_name'
-    , 'organizationUrl': 'organization_url'
-    , 'networkId': 'network_id'
-    , 'networkName': 'network_name'
-    , 'networkUrl': 'network_url'
-    , 'deviceSerial': 'device_serial'
-    , 'deviceMac': 'device_mac'
-    , 'deviceName': 'device_name'
-    , 'deviceUrl': 'device_url'
-    , 'deviceTags': 'device_tags'
-    , 'deviceModel': 'device_model'
-    , 'alertId': 'alert_id'
-    , 'alertType': 'alert_type'
-    , 'alertTypeId': 'alert_type_id'
-    , 'alertLevel': 'alert_level'
-    , 'occurredAt': 'alert_occurrred_at'
-    , 'alertConfigId': 'alert_config_id'
-    , 'alertConfigName': 'alert_config_name'
-    , 'conditionId': 'condition_id'
-    , 'ts': 'event_timestamp'
-    , 'type': 'sensor_type'
-    , 'nodeId': 'node_id'
-    , 'sensorValue': 'sensor_value'
-    , 'startedAlerting': 'started_alerting'
-}
-
 convert_str_datetime = [
     'alert_timestamp'
     , 'alert_sent_at'
@@ -0,0 +1,174 @@
+"""
+Unknown-schema alert deduplication for the Meraki webhook Lambda
+
+Each unknown payload is reduced to a fingerprint: a hash of its sorted key
+paths (values ignored). The first webhook with a new fingerprint gets the
+full log + SNS alert; repeats only log a one-line sample every
+SCHEMA_ALERT_SAMPLE_EVERY occurrences. New-fingerprint alerts are also capped
+at SCHEMA_ALERT_MAX_PER_MINUTE per container, so payloads with dynamic keys
+cannot turn into an SNS storm.
+
+Seen fingerprints live in memory for the life of the container. To share
+them across containers and deploys, set one of:
+  SCHEMA_FINGERPRINT_TABLE   DynamoDB table with a string hash key
+                             'fingerprint' (DynamoDB Local works through
+                             AWS_ENDPOINT_URL_DYNAMODB)
+  SCHEMA_FINGERPRINT_BUCKET  S3 bucket; one marker object per fingerprint
+                             under SCHEMA_FINGERPRINT_PREFIX, created with a
+                             conditional write
+Both are claimed atomically, so exactly one container alerts per fingerprint.
+"""
+import hashlib
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+SAMPLE_EVERY = int(os.environ.get('SCHEMA_ALERT_SAMPLE_EVERY', '100'))
+MAX_ALERTS_PER_MINUTE = int(os.environ.get('SCHEMA_ALERT_MAX_PER_MINUTE', '5'))
+
+
+def key_paths(payload, max_depth=4):
+    """Sorted key paths of a payload ('a.b', 'a.items[].c'); values are ignored"""
+    paths = set()
+    stack = [(payload, '', 0)]
+    while stack:
+        node, prefix, depth = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                path = f"{prefix}.{key}" if prefix else str(key)
+                paths.add(path)
+                if depth < max_depth:
+                    stack.append((value, path, depth + 1))
+        elif isinstance(node, list) and depth < max_depth:
+            for item in node:
+                stack.append((item, f"{prefix}[]", depth))
+    return sorted(paths)
+
+
+def fingerprint(paths):
+    """Short stable hash of a key path list"""
+    return hashlib.sha1('\n'.join(paths).encode('utf-8')).hexdigest()[:16]
+
+
+def _error_code(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+class DynamoDBFingerprintStore:
+    """Fingerprints shared through a DynamoDB table (conditional PutItem)"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+
+    def claim(self, fp, paths):
+        try:
+            self.client.put_item(
+                TableName=self.table,
+                Item={
+                    'fingerprint': {'S': fp},
+                    'key_paths': {'S': '\n'.join(paths)},
+                    'first_seen': {'S': datetime.utcnow().isoformat() + 'Z'},
+                },
+                ConditionExpression='attribute_not_exists(fingerprint)'
+            )
+            return True
+        except Exception as e:
+            if _error_code(e) == 'ConditionalCheckFailedException':
+                return False
+            raise
+
+
+class S3FingerprintStore:
+    """Fingerprints shared as S3 marker objects (PutObject If-None-Match)"""
+
+    def __init__(self, client, bucket, prefix='schema-fingerprints/'):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def claim(self, fp, paths):
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=f"{self.prefix}{fp}.txt",
+                Body='\n'.join(paths).encode('utf-8'),
+                ContentType='text/plain',
+                IfNoneMatch='*'
+            )
+            return True
+        except Exception as e:
+            if _error_code(e) in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                return False
+            raise
+
+
+class SchemaAlertGate:
+    """
+    Decides what to do with each unknown-schema payload
+
+    check(payload) returns (action, fingerprint, key_paths, count):
+      'alert'      - first time this fingerprint is seen anywhere: full alert
+      'sample'     - repeat, and count hits the sampling interval: log a line
+      'skip'       - repeat: nothing to do
+      'suppressed' - new fingerprint, but the per-minute alert budget is spent
+                     (not recorded, so a later webhook can still alert)
+    """
+
+    def __init__(self, store=None, sample_every=SAMPLE_EVERY,
+                 max_alerts_per_minute=MAX_ALERTS_PER_MINUTE, clock=time.monotonic):
+        self.store = store
+        self.sample_every = max(1, sample_every)
+        self.max_alerts_per_minute = max_alerts_per_minute
+        self.clock = clock
+        self.counts = {}
+        self._alert_times = deque()
+
+    def _alert_budget_left(self):
+        now = self.clock()
+        while self._alert_times and now - self._alert_times[0] >= 60:
+            self._alert_times.popleft()
+        return len(self._alert_times) < self.max_alerts_per_minute
+
+    def check(self, payload):
+        paths = key_paths(payload)
+        fp = fingerprint(paths)
+
+        count = self.counts.get(fp)
+        if count is not None:
+            count += 1
+            self.counts[fp] = count
+            return ('sample' if count % self.sample_every == 0 else 'skip'), fp, paths, count
+
+        if not self._alert_budget_left():
+            return 'suppressed', fp, paths, 1
+
+        claimed = True
+        if self.store is not None:
+            try:
+                claimed = self.store.claim(fp, paths)
+            except Exception as e:
+                # Shared store unavailable - fall back to alerting from this container
+                print(f"⚠️ Schema fingerprint store error: {e}")
+
+        self.counts[fp] = 1
+        if not claimed:
+            return 'skip', fp, paths, 1
+        self._alert_times.append(self.clock())
+        return 'alert', fp, paths, 1
+
+
+def gate_from_environment(get_client):
+    """Build a SchemaAlertGate with the shared store configured in the environment"""
+    table = os.environ.get('SCHEMA_FINGERPRINT_TABLE')
+    bucket = os.environ.get('SCHEMA_FINGERPRINT_BUCKET')
+    if table:
+        store = DynamoDBFingerprintStore(get_client('dynamodb'), table)
+    elif bucket:
+        store = S3FingerprintStore(
+            get_client('s3'), bucket, os.environ.get('SCHEMA_FINGERPRINT_PREFIX', 'schema-fingerprints/')
+        )
+    else:
+        store = None
+    return SchemaAlertGate(store)
@@ -16,6 +16,22 @@ BLANKSASNULL
 EMPTYASNULL
 AUTO ON;
 
+-- 2b. Batched ingest (INGEST_MODE=queue + copy_batcher.py) writes gzip NDJSON
+--     files under copy-job-gz/ instead of one object per webhook
+DROP COPY JOB IF EXISTS meraki_webhook_batch_loader;
+
+CREATE COPY JOB meraki_webhook_batch_loader
+FROM 's3://edna-stream-meraki/copy-job-gz/'
+IAM_ROLE 'arn:aws:iam::309820967897:role/MerakiFirehoseRole'
+INTO edna_stream_meraki.meraki_webhooks
+FORMAT JSON 'auto'
+GZIP
+TIMEFORMAT 'auto'
+TRUNCATECOLUMNS
+BLANKSASNULL
+EMPTYASNULL
+AUTO ON;
+
 -- 3. Check COPY JOB status
 SELECT 
     job_id,
@@ -26,7 +42,7 @@ SELECT
     last_run_time,
     next_run_time
 FROM sys_copy_job
-WHERE job_name = 'meraki_webhook_loader';
+WHERE job_name IN ('meraki_webhook_loader', 'meraki_webhook_batch_loader');
 
 -- 4. Check recent COPY JOB runs
 SELECT 
@@ -40,7 +56,7 @@ SELECT
     rows_loaded,
     error_message
 FROM sys_load_history
-WHERE job_name = 'meraki_webhook_loader'
+WHERE job_name IN ('meraki_webhook_loader', 'meraki_webhook_batch_loader')
 ORDER BY start_time DESC
 LIMIT 10;
 
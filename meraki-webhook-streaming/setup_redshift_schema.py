@@ -8,6 +8,7 @@ import psycopg2
 import os
 import yaml
 from sshtunnel import SSHTunnelForwarder
+from meraki_flatten import redshift_table_ddl
 
 def create_schema():
     """Create Redshift schema and table for Meraki webhooks"""
@@ -70,62 +71,8 @@ def create_schema():
             # Create main webhook table with flexible schema
             # Supports 24+ alert types: Sensor, Power, Motion, Geofencing, APs, Clients, etc.
             print("\nCreating meraki_webhooks table...")
-            create_table_sql = f"""
-            CREATE TABLE IF NOT EXISTS {schema_name}.meraki_webhooks (
-                -- Metadata
-                id BIGINT IDENTITY(1,1) PRIMARY KEY,
-                ingestion_timestamp TIMESTAMP DEFAULT GETDATE(),
-                timestamp VARCHAR(50),
-                source VARCHAR(50),
-                lambda_request_id VARCHAR(100),
-                environment VARCHAR(50),
-                s3_raw_location VARCHAR(500),
-                
-                -- Base webhook fields
-                version VARCHAR(10),
-                shared_secret VARCHAR(100),
-                sent_at TIMESTAMP,
-                organization_id VARCHAR(50),
-                organization_name VARCHAR(200),
-                organization_url VARCHAR(500),
-                network_id VARCHAR(100),
-                network_name VARCHAR(200),
-                network_url VARCHAR(500),
-                network_tags VARCHAR(1000),
-                
-                -- Device information
-                device_serial VARCHAR(50),
-                device_mac VARCHAR(50),
-                device_name VARCHAR(200),
-                device_url VARCHAR(500),
-                device_tags VARCHAR(1000),
-                device_model VARCHAR(50),
-                
-                -- Alert information
-                alert_id VARCHAR(100),
-                alert_type VARCHAR(200),
-                alert_type_id VARCHAR(100),
-                alert_level VARCHAR(50),
-                occurred_at TIMESTAMP,
-                
-                -- Alert data
-                alert_config_id BIGINT,
-                alert_config_name VARCHAR(200),
-                started_alerting BOOLEAN,
-                
-                -- Trigger data
-                condition_id BIGINT,
-                trigger_ts DOUBLE PRECISION,
-                trigger_type VARCHAR(50),
-                trigger_node_id BIGINT,
-                trigger_sensor_value DOUBLE PRECISION,
-                
-                -- Raw payload for reference
-                payload_json VARCHAR(MAX)
-            )
-            DISTSTYLE AUTO
-            SORTKEY (ingestion_timestamp, occurred_at);
-            """
+            # Columns and types come from the shared spec in meraki_flatten.py
+            create_table_sql = redshift_table_ddl(f"{schema_name}.meraki_webhooks")
             
             cursor.execute(create_table_sql)
             print(f"✅ Table created: {schema_name}.meraki_webhooks")
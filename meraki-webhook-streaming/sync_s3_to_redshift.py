@@ -9,6 +9,7 @@ import json
 import yaml
 from datetime import datetime
 from sshtunnel import SSHTunnelForwarder
+from meraki_flatten import column_list
 
 def sync_to_redshift():
     with open('config.json') as f:
@@ -45,17 +46,7 @@ def sync_to_redshift():
             
             # Run COPY command
             copy_sql = f"""
-            COPY {schema}.meraki_webhooks (
-                timestamp, source, lambda_request_id, environment, s3_raw_location,
-                version, shared_secret, sent_at,
-                organization_id, organization_name, organization_url,
-                network_id, network_name, network_url, network_tags,
-                device_serial, device_mac, device_name, device_url, device_tags, device_model,
-                alert_id, alert_type, alert_type_id, alert_level, occurred_at,
-                alert_config_id, alert_config_name, started_alerting,
-                condition_id, trigger_ts, trigger_type, trigger_node_id, trigger_sensor_value,
-                payload_json
-            )
+            COPY {schema}.meraki_webhooks ({column_list()})
             FROM 's3://{config['s3']['backup_bucket']}/raw/'
             ACCESS_KEY_ID '{aws_creds['aws_access_key_id']}'
             SECRET_ACCESS_KEY '{aws_creds['aws_secret_access_key']}'
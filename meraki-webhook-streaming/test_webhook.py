@@ -1,12 +1,31 @@
 #!/usr/bin/env python3
 """
 Test Meraki webhook endpoint
+
+Sends --count sample webhooks one at a time. With --concurrency, --rps,
+--duration or --local it runs a load test instead: the real payloads in
+sample_payloads/ and meraki_sample.json are replayed against the URL, or
+with --local against lambda_function.lambda_handler in-process (AWS calls
+stubbed), and p50/p95/p99 latency, error rate and throughput are reported.
+
+Usage:
+    python test_webhook.py --count 3
+    python test_webhook.py --local --concurrency 8 --count 5000
+    python test_webhook.py --rps 20 --duration 120
 """
 import json
+import os
+import sys
 import requests
 import argparse
 from datetime import datetime
 
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'sa-utils', 'webhook-utils'))
+from load_generator import add_load_arguments, load_payloads, run_load_test
+
+DEFAULT_PAYLOADS = [os.path.join(HERE, 'sample_payloads'), os.path.join(HERE, 'meraki_sample.json')]
+
 def load_sample_payload():
     """Load sample Meraki webhook payload"""
     return {
@@ -96,10 +115,21 @@ def test_webhook(url, count=1):
 def main():
     parser = argparse.ArgumentParser(description='Test Meraki webhook endpoint')
     parser.add_argument('--url', help='Webhook URL', default=None)
-    parser.add_argument('--count', type=int, help='Number of test webhooks to send', default=1)
+    parser.add_argument('--count', type=int, help='Number of test webhooks to send', default=None)
+    parser.add_argument('--local', action='store_true', help='Load test lambda_function.py in-process')
+    parser.add_argument('--payloads', nargs='+', default=DEFAULT_PAYLOADS,
+                        help='Payload files or directories to replay (default: sample_payloads/, meraki_sample.json)')
+    add_load_arguments(parser)
     
     args = parser.parse_args()
     
+    if args.local:
+        summary = run_load_test(load_payloads(args.payloads), handler=os.path.join(HERE, 'lambda_function.py'),
+                                concurrency=args.concurrency or 10, rps=args.rps, count=args.count,
+                                duration=args.duration, report_interval=args.interval,
+                                stub_latency_ms=args.stub_latency_ms, csv_path=args.csv)
+        return summary['errors'] == 0
+    
     # Load deployment info if URL not provided
     if not args.url:
         try:
@@ -110,7 +140,13 @@ def main():
             print("❌ No deployment_info.json found. Please provide --url or deploy first.")
             return False
     
-    return test_webhook(args.url, args.count)
+    if args.concurrency or args.rps or args.duration:
+        summary = run_load_test(load_payloads(args.payloads), url=args.url,
+                                concurrency=args.concurrency or 10, rps=args.rps, count=args.count,
+                                duration=args.duration, report_interval=args.interval, csv_path=args.csv)
+        return summary['errors'] == 0
+    
+    return test_webhook(args.url, args.count or 1)
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 """Update Lambda function with latest code"""
 import json
+import os
+import sys
 import boto3
 import zipfile
 import io
 import yaml
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'webhook-utils'))
+from lambda_package import add_shared_modules
+
 with open('config.json') as f:
     config = json.load(f)
 
@@ -27,6 +32,11 @@ lambda_client = session.client('lambda')
 zip_buffer = io.BytesIO()
 with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
     zip_file.write('lambda_function.py', 'lambda_function.py')
+    # Same package serves the SQS batcher function (handler: copy_batcher.lambda_handler)
+    zip_file.write('copy_batcher.py', 'copy_batcher.py')
+    zip_file.write('meraki_flatten.py', 'meraki_flatten.py')
+    zip_file.write('schema_alerts.py', 'schema_alerts.py')
+    add_shared_modules(zip_file)
 
 zip_buffer.seek(0)
 
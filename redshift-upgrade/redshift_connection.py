@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Pooled Redshift connections for the redshift-upgrade scripts
+
+One ThreadedConnectionPool per run: worker threads borrow a connection per
+query instead of opening (and authenticating) a new one each time.
+
+Usage:
+    conn_pool = connection_pool(config)
+    with pooled_cursor(conn_pool) as cursor:
+        cursor.execute("SELECT 1")
+    conn_pool.closeall()
+"""
+import os
+from contextlib import contextmanager
+
+from psycopg2 import pool
+
+FETCH_SIZE = 10000
+
+
+def connect_params(config, password=None):
+    """psycopg2 connection keywords for config['redshift'] (password from REDSHIFT_PASSWORD or a prompt)"""
+    redshift = config['redshift']
+    return {
+        'host': redshift['cluster_endpoint'],
+        'port': redshift.get('cluster_port', 5439),
+        'dbname': redshift['database'],
+        'user': redshift['admin_user'],
+        'password': password or os.environ.get('REDSHIFT_PASSWORD') or input("Enter Redshift password: "),
+        'connect_timeout': 30,
+        'application_name': 'redshift-upgrade',
+    }
+
+
+def connection_pool(config, password=None, maxconn=4):
+    """ThreadedConnectionPool for config['redshift']"""
+    return pool.ThreadedConnectionPool(1, maxconn, **connect_params(config, password))
+
+
+@contextmanager
+def pooled_cursor(conn_pool, autocommit=False):
+    """Cursor on a borrowed connection; commits on success, rolls back on error"""
+    conn = conn_pool.getconn()
+    conn.autocommit = autocommit
+    cursor = conn.cursor()
+    try:
+        yield cursor
+        if not autocommit:
+            conn.commit()
+    except Exception:
+        if not autocommit:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn_pool.putconn(conn, close=bool(conn.closed))
+
+
+def iter_rows(cursor, sql, params=None, size=FETCH_SIZE):
+    """Execute sql and yield its rows, fetchmany() at a time"""
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
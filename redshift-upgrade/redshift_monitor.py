@@ -1,11 +1,47 @@
 #!/usr/bin/env python3
 """Redshift Cluster Activity Monitor"""
+import argparse
 import boto3
 import yaml
 import json
+import os
+import sys
 from datetime import datetime, timedelta
 from collections import defaultdict
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'aws-utils'))
+from metrics_client import MetricsClient, metric_query
+
+METRICS = {'DatabaseConnections': 'connections', 'CPUUtilization': 'cpu', 'NetworkReceiveThroughput': 'network'}
+
+def hourly_activity(cloudwatch, cluster_id, days=7, by_weekday=False):
+    """
+    Average connections, CPU % and network bytes/s per UTC hour
+
+    Keys are the hour (0-23), or (weekday, hour) with by_weekday (Monday = 0).
+    """
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(days=days)
+    
+    # All three metrics in one GetMetricData request; closed days are cached
+    # on disk, so reruns only fetch today
+    queries = [
+        metric_query(name, 'AWS/Redshift', metric_name, {'ClusterIdentifier': cluster_id}, 'Average', 3600)
+        for metric_name, name in METRICS.items()
+    ]
+    series = MetricsClient(cloudwatch).fetch(queries, start_time, end_time)
+    
+    samples = defaultdict(lambda: {'connections': [], 'cpu': [], 'network': []})
+    for name, points in series.items():
+        for timestamp, value in points:
+            slot = (timestamp.weekday(), timestamp.hour) if by_weekday else timestamp.hour
+            samples[slot][name].append(value)
+    
+    return {
+        slot: {name: sum(values) / len(values) if values else 0.0 for name, values in stats.items()}
+        for slot, stats in samples.items()
+    }
+
 def analyze_query_patterns(cloudwatch, cluster_id, days=7):
     """Analyze query patterns over the past N days"""
     end_time = datetime.utcnow()
@@ -13,28 +49,7 @@ def analyze_query_patterns(cloudwatch, cluster_id, days=7):
     
     print(f"📊 Analyzing query patterns from {start_time.date()} to {end_time.date()}...")
     
-    metrics = ['DatabaseConnections', 'CPUUtilization', 'NetworkReceiveThroughput']
-    hourly_stats = defaultdict(lambda: {'connections': [], 'cpu': [], 'network': []})
-    
-    for metric_name in metrics:
-        response = cloudwatch.get_metric_statistics(
-            Namespace='AWS/Redshift',
-            MetricName=metric_name,
-            Dimensions=[{'Name': 'ClusterIdentifier', 'Value': cluster_id}],
-            StartTime=start_time,
-            EndTime=end_time,
-            Period=3600,
-            Statistics=['Average']
-        )
-        
-        for datapoint in response['Datapoints']:
-            hour = datapoint['Timestamp'].hour
-            if metric_name == 'DatabaseConnections':
-                hourly_stats[hour]['connections'].append(datapoint['Average'])
-            elif metric_name == 'CPUUtilization':
-                hourly_stats[hour]['cpu'].append(datapoint['Average'])
-            elif metric_name == 'NetworkReceiveThroughput':
-                hourly_stats[hour]['network'].append(datapoint['Average'])
+    hourly_stats = hourly_activity(cloudwatch, cluster_id, days)
     
     print("\n⏰ Average Activity by Hour (UTC):")
     print(f"{'Hour':<6} {'Connections':<15} {'CPU %':<10} {'Network MB/s':<15} {'Recommendation'}")
@@ -43,9 +58,9 @@ def analyze_query_patterns(cloudwatch, cluster_id, days=7):
     low_activity_hours = []
     for hour in range(24):
         if hour in hourly_stats:
-            avg_conn = sum(hourly_stats[hour]['connections']) / len(hourly_stats[hour]['connections'])
-            avg_cpu = sum(hourly_stats[hour]['cpu']) / len(hourly_stats[hour]['cpu'])
-            avg_network = sum(hourly_stats[hour]['network']) / len(hourly_stats[hour]['network']) / 1024 / 1024
+            avg_conn = hourly_stats[hour]['connections']
+            avg_cpu = hourly_stats[hour]['cpu']
+            avg_network = hourly_stats[hour]['network'] / 1024 / 1024
             
             is_low = avg_conn < 5 and avg_cpu < 20
             recommendation = "✅ Good window" if is_low else ""
@@ -61,8 +76,14 @@ def analyze_query_patterns(cloudwatch, cluster_id, days=7):
             print(f"   {hour:02d}:00 - {(hour+1)%24:02d}:00")
     else:
         print("   No clear low-activity periods found. Consider weekends.")
+    
+    return low_activity_hours
 
 def main():
+    parser = argparse.ArgumentParser(description='Recommend Redshift maintenance windows from CloudWatch activity')
+    parser.add_argument('--days', type=int, default=7, help='Days of history to analyze (default: 7)')
+    args = parser.parse_args()
+    
     with open('config.json') as f:
         config = json.load(f)
     
@@ -90,7 +111,7 @@ def main():
     print(f"   Status: {cluster['ClusterStatus']}")
     print(f"   Current maintenance window: {cluster.get('PreferredMaintenanceWindow', 'Not set')}\n")
     
-    analyze_query_patterns(cloudwatch, cluster_id, days=7)
+    analyze_query_patterns(cloudwatch, cluster_id, days=args.days)
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,21 @@
 #!/usr/bin/env python3
-"""Redshift Cluster Major Version Upgrade Script"""
+"""
+Redshift Cluster Major Version Upgrade Script
+
+Runs a pre-flight plan first (see upgrade_planner.py): refuses to start
+outside a low-activity window unless --force, and pauses the ingest
+loaders for the snapshot and upgrade, resuming them afterwards.
+"""
+import argparse
 import boto3
 import yaml
 import json
 from datetime import datetime
 
+from redshift_connection import connect_params
+from upgrade_planner import (ACTIVITY_DAYS, UPGRADE_MINUTES, LoaderControl,
+                             load_loaders, plan_upgrade, print_plan)
+
 def create_snapshot(client, cluster_id):
     """Create manual snapshot before upgrade"""
     snapshot_id = f"{cluster_id}-upgrade-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
@@ -44,6 +55,15 @@ def upgrade_cluster(client, cluster_id, target_version):
     print(f"✅ Upgrade complete to version {target_version}")
 
 def main():
+    parser = argparse.ArgumentParser(description='Upgrade the Redshift cluster one major version')
+    parser.add_argument('--force', action='store_true', help='Upgrade outside the recommended window, or with COPY still running')
+    parser.add_argument('--days', type=int, default=ACTIVITY_DAYS, help='Days of CloudWatch activity to plan from')
+    parser.add_argument('--upgrade-minutes', type=int, default=UPGRADE_MINUTES, help='Expected upgrade duration')
+    parser.add_argument('--no-pause', action='store_true', help='Leave the ingest loaders running')
+    parser.add_argument('--resume-loaders', action='store_true',
+                        help='Only resume loaders left paused by an interrupted run')
+    args = parser.parse_args()
+    
     with open('config.json') as f:
         config = json.load(f)
     
@@ -62,6 +82,16 @@ def main():
     )
     
     client = session.client('redshift')
+    config['loaders'] = load_loaders(config.get('loaders', {}))
+    loaders_config = config['loaders']
+    
+    if args.resume_loaders:
+        loaders = LoaderControl(connect_params(config), session.client('s3'), loaders_config)
+        if not loaders.paused:
+            print("✅ No loaders are paused")
+        elif loaders.resume():
+            print("✅ All loaders resumed")
+        return
     
     response = client.describe_clusters(ClusterIdentifier=cluster_id)
     cluster = response['Clusters'][0]
@@ -79,13 +109,41 @@ def main():
     next_version = get_next_major_version(current_version)
     print(f"\n🎯 Target version: {next_version}")
     
+    plan = plan_upgrade(client, session.client('cloudwatch'), cluster_id, config,
+                        days=args.days, upgrade_minutes=args.upgrade_minutes)
+    print_plan(plan, config)
+    if not plan.in_window:
+        if not args.force:
+            print("\n❌ Not a recommended window - rerun then, or pass --force")
+            return
+        print("\n⚠️ --force: upgrading outside the recommended window")
+    
+    loaders = None
+    if not args.no_pause and (loaders_config.get('copy_jobs') or loaders_config.get('sync_pause_marker')):
+        loaders = LoaderControl(connect_params(config), session.client('s3'), loaders_config)
+        if loaders.paused:
+            print(f"⚠️ Loaders still paused by an earlier run ({loaders.state_file}) - they are resumed after this upgrade")
+    
     confirm = input(f"\nProceed with upgrade {current_version} → {next_version}? (yes/no): ")
     if confirm.lower() != 'yes':
         print("❌ Cancelled")
         return
     
-    snapshot_id = create_snapshot(client, cluster_id)
-    upgrade_cluster(client, cluster_id, next_version)
+    # Snapshot after the loaders have drained, so it is a consistent rollback point.
+    # Pausing is inside the try: a failed pause or drain still resumes what was paused
+    try:
+        if loaders:
+            loaders.pause()
+            if not loaders.drain():
+                if not args.force:
+                    print("\n❌ COPY still running - the snapshot would not be consistent. Rerun, or pass --force")
+                    return
+                print("\n⚠️ --force: snapshotting with COPY still running")
+        snapshot_id = create_snapshot(client, cluster_id)
+        upgrade_cluster(client, cluster_id, next_version)
+    finally:
+        if loaders and not loaders.resume():
+            print("⚠️ Some loaders are still paused - run: python3 redshift_upgrade.py --resume-loaders")
     
     response = client.describe_clusters(ClusterIdentifier=cluster_id)
     final_version = response['Clusters'][0]['ClusterVersion']
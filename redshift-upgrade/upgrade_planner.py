@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Pre-flight planner for redshift_upgrade.py
+
+Estimates how long the upgrade takes (draining the ingest loaders, the
+pre-upgrade snapshot timed from recent snapshots, and the upgrade itself),
+ranks every weekly (day, hour) start by the busiest CloudWatch hour the
+window would cover, and decides whether now is a good enough window.
+
+Around the upgrade, LoaderControl pauses the ingest loaders listed under
+config['loaders'] and resumes them afterwards:
+
+  copy_jobs          COPY JOB ALTER <job> AUTO OFF / AUTO ON; new files wait
+                     in S3 and are loaded when the job is switched back on
+  sync_config        the sync's config.json; the S3 object named by its
+                     sync.pause_marker makes the 5-minute
+                     ec2_sync_redshift.py cron skip its run
+
+Pause state is kept in LOADER_STATE_FILE until every loader is resumed,
+so `python redshift_upgrade.py --resume-loaders` can finish after an
+interrupted run.
+"""
+import json
+import math
+import os
+import re
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from redshift_monitor import hourly_activity
+
+ACTIVITY_DAYS = 28             # four samples of every weekly hour
+UPGRADE_MINUTES = 60           # major version upgrades take 30-60 minutes
+DEFAULT_SNAPSHOT_MINUTES = 15  # when there is no snapshot history
+SNAPSHOT_SAMPLES = 10
+MARGIN_MINUTES = 15
+WINDOW_TOLERANCE = 0.05        # accept windows scoring within this of the best
+DRAIN_POLL_SECONDS = 15
+LOADER_STATE_FILE = 'upgrade_loader_state.json'
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+Window = namedtuple('Window', ['weekday', 'hour', 'hours', 'score', 'connections', 'cpu'])
+Plan = namedtuple('Plan', ['snapshot_minutes', 'snapshot_samples', 'drain_minutes', 'upgrade_minutes',
+                           'pause_minutes', 'window_minutes', 'windows', 'current', 'in_window'])
+
+
+def estimate_snapshot_minutes(redshift, cluster_id):
+    """(median minutes of recent completed snapshots, samples used)"""
+    snapshots = []
+    paginator = redshift.get_paginator('describe_cluster_snapshots')
+    for page in paginator.paginate(ClusterIdentifier=cluster_id):
+        snapshots.extend(s for s in page['Snapshots']
+                         if s.get('Status') == 'available' and s.get('ElapsedTimeInSeconds'))
+    if not snapshots:
+        return DEFAULT_SNAPSHOT_MINUTES, 0
+    snapshots.sort(key=lambda s: s['SnapshotCreateTime'], reverse=True)
+    recent = snapshots[:SNAPSHOT_SAMPLES]
+    return math.ceil(statistics.median(s['ElapsedTimeInSeconds'] for s in recent) / 60), len(recent)
+
+
+def _load_scores(activity):
+    """{(weekday, hour): 0..1} - connections and CPU, each relative to its busiest hour"""
+    peak_connections = max(a['connections'] for a in activity.values()) or 1
+    peak_cpu = max(a['cpu'] for a in activity.values()) or 1
+    return {slot: (a['connections'] / peak_connections + a['cpu'] / peak_cpu) / 2
+            for slot, a in activity.items()}
+
+
+def _window(activity, scores, weekday, hour, hours):
+    """Window starting at (weekday, hour) covering `hours` hours, or None without data"""
+    slots = []
+    for offset in range(hours):
+        index = (weekday * 24 + hour + offset) % (7 * 24)
+        slots.append((index // 24, index % 24))
+    if any(slot not in scores for slot in slots):
+        return None
+    return Window(weekday, hour, hours,
+                  max(scores[slot] for slot in slots),
+                  sum(activity[slot]['connections'] for slot in slots) / hours,
+                  sum(activity[slot]['cpu'] for slot in slots) / hours)
+
+
+def rank_windows(activity, window_minutes):
+    """Every weekly start hour with data, lowest impact (busiest covered hour) first"""
+    scores = _load_scores(activity)
+    hours = math.ceil(window_minutes / 60)
+    windows = [_window(activity, scores, weekday, hour, hours) for weekday in range(7) for hour in range(24)]
+    return sorted((w for w in windows if w), key=lambda w: w.score)
+
+
+def window_at(activity, when, window_minutes):
+    """The window an upgrade started at `when` would occupy"""
+    hours = math.ceil((when.minute + window_minutes) / 60)
+    return _window(activity, _load_scores(activity), when.weekday(), when.hour, hours)
+
+
+def next_start(window, now):
+    """Next datetime at which `window` starts"""
+    start = now.replace(minute=0, second=0, microsecond=0)
+    days_ahead = (window.weekday - start.weekday()) % 7
+    start += timedelta(days=days_ahead, hours=window.hour - start.hour)
+    return start if start > now else start + timedelta(days=7)
+
+
+def format_window(window):
+    end_hour = (window.hour + window.hours) % 24
+    return f"{WEEKDAYS[window.weekday]} {window.hour:02d}:00-{end_hour:02d}:00"
+
+
+def plan_upgrade(redshift, cloudwatch, cluster_id, config, days=ACTIVITY_DAYS,
+                 upgrade_minutes=UPGRADE_MINUTES, now=None):
+    """Estimate the upgrade window and rank the candidates by CloudWatch activity"""
+    now = now or datetime.utcnow()
+    snapshot_minutes, snapshot_samples = estimate_snapshot_minutes(redshift, cluster_id)
+    # An in-flight 5-minute sync can take up to one interval to finish
+    drain_minutes = math.ceil(config.get('loaders', {}).get('sync_interval_seconds', 300) / 60)
+    pause_minutes = drain_minutes + snapshot_minutes + upgrade_minutes
+    window_minutes = pause_minutes + MARGIN_MINUTES
+
+    activity = hourly_activity(cloudwatch, cluster_id, days, by_weekday=True)
+    windows = rank_windows(activity, window_minutes) if activity else []
+    current = window_at(activity, now, window_minutes) if activity else None
+    in_window = bool(windows and current and current.score <= windows[0].score + WINDOW_TOLERANCE)
+    return Plan(snapshot_minutes, snapshot_samples, drain_minutes, upgrade_minutes,
+                pause_minutes, window_minutes, windows, current, in_window)
+
+
+def print_plan(plan, config, now=None, top=5):
+    now = now or datetime.utcnow()
+    loaders = config.get('loaders', {})
+    sync_interval = loaders.get('sync_interval_seconds', 300)
+    source = f"median of {plan.snapshot_samples} recent snapshots" if plan.snapshot_samples else "no history - default"
+
+    print(f"\n🗓️ Upgrade plan:")
+    print(f"   Drain loaders:  {plan.drain_minutes} min")
+    print(f"   Snapshot:       {plan.snapshot_minutes} min ({source})")
+    print(f"   Upgrade:        {plan.upgrade_minutes} min")
+    print(f"   Window needed:  {plan.window_minutes} min (incl. {MARGIN_MINUTES} min margin)")
+    if loaders.get('copy_jobs') or loaders.get('sync_pause_marker'):
+        skipped = plan.pause_minutes * 60 // sync_interval
+        print(f"   Loaders paused: ~{plan.pause_minutes} min - {', '.join(loaders.get('copy_jobs', []))} "
+              f"resume from S3 afterwards; the sync skips ~{skipped} runs")
+
+    if not plan.windows:
+        print("\n⚠️ No CloudWatch activity data - cannot rank windows")
+        return
+    print(f"\n🏆 Lowest-impact windows (UTC, scored by the busiest hour covered):")
+    for rank, window in enumerate(plan.windows[:top], 1):
+        print(f"   {rank}. {format_window(window):<18} score {window.score:.2f}  "
+              f"(avg {window.connections:.1f} connections, {window.cpu:.1f}% CPU)")
+    if plan.current:
+        status = "✅ good window" if plan.in_window else "❌ busier than the best window"
+        print(f"\n📍 Now ({WEEKDAYS[now.weekday()]} {now:%H:%M} UTC): score {plan.current.score:.2f} - {status}")
+    if not plan.in_window:
+        best = plan.windows[0]
+        wait = next_start(best, now) - now
+        print(f"   Next best window: {format_window(best)} (in {wait.days}d {wait.seconds // 3600}h)")
+
+
+def load_loaders(loaders):
+    """
+    config['loaders'] with sync_pause_marker read from loaders['sync_config']
+
+    ec2_sync_redshift.py checks the marker named in its own config.json, so
+    the upgrade takes it from there instead of keeping a copy.
+    """
+    loaders = dict(loaders)
+    sync_config = loaders.pop('sync_config', None)
+    if sync_config:
+        with open(sync_config) as f:
+            loaders['sync_pause_marker'] = json.load(f)['sync']['pause_marker']
+    return loaders
+
+
+class LoaderControl:
+    """Pauses and resumes the ingest loaders in config['loaders'] around an upgrade"""
+
+    def __init__(self, connect_params, s3, loaders, state_file=LOADER_STATE_FILE):
+        self.connect_params = connect_params
+        self.s3 = s3
+        self.copy_jobs = loaders.get('copy_jobs', [])
+        self.sync_marker = loaders.get('sync_pause_marker')
+        self.sync_interval = loaders.get('sync_interval_seconds', 300)
+        self.state_file = state_file
+        self.state = {'copy_jobs': [], 'sync_marker': None}
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    @property
+    def paused(self):
+        return bool(self.state['copy_jobs'] or self.state['sync_marker'])
+
+    def _save(self):
+        if not self.paused:
+            if os.path.exists(self.state_file):
+                os.remove(self.state_file)
+            return
+        tmp_path = self.state_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_file)
+
+    def _execute(self, sql):
+        # A fresh connection per call: the upgrade restarts the cluster
+        conn = psycopg2.connect(**self.connect_params)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchall() if cursor.description else None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _marker(uri):
+        bucket, _, key = uri[len('s3://'):].partition('/')
+        return bucket, key
+
+    def pause(self):
+        """Switch off the COPY JOBs and raise the sync's pause marker"""
+        print("\n⏸️ Pausing ingest loaders...")
+        for job in self.copy_jobs:
+            if job in self.state['copy_jobs']:
+                continue
+            if not re.fullmatch(r'\w+', job):
+                raise ValueError(f"Invalid COPY JOB name: {job}")
+            try:
+                self._execute(f"COPY JOB ALTER {job} AUTO OFF")
+            except psycopg2.Error as e:
+                print(f"   ⚠️ COPY JOB {job} not paused: {str(e).strip()}")
+                continue
+            self.state['copy_jobs'].append(job)
+            self._save()
+            print(f"   ✅ COPY JOB {job}: AUTO OFF")
+        if self.sync_marker and not self.state['sync_marker']:
+            bucket, key = self._marker(self.sync_marker)
+            self.s3.put_object(Bucket=bucket, Key=key,
+                               Body=f"Paused by redshift_upgrade.py at {datetime.utcnow().isoformat()}Z\n".encode())
+            self.state['sync_marker'] = self.sync_marker
+            self._save()
+            print(f"   ✅ Sync pause marker: {self.sync_marker}")
+
+    def drain(self, timeout=None):
+        """Wait for COPYs already running to finish; True when none are left"""
+        timeout = self.sync_interval + 60 if timeout is None else timeout
+        deadline = time.time() + timeout
+        while True:
+            running = self._execute(
+                "SELECT COUNT(*) FROM sys_query_history "
+                "WHERE query_type = 'COPY' AND status IN ('planning', 'queued', 'running', 'returning')"
+            )[0][0]
+            if not running:
+                print("   ✅ No COPY in flight")
+                return True
+            if time.time() >= deadline:
+                print(f"   ⚠️ {running} COPY still running after {timeout}s")
+                return False
+            print(f"   ⏳ Waiting for {running} running COPY...")
+            time.sleep(DRAIN_POLL_SECONDS)
+
+    def resume(self):
+        """Switch the paused COPY JOBs back on and remove the marker; True when all resumed"""
+        if not self.paused:
+            return True
+        print("\n▶️ Resuming ingest loaders...")
+        for job in list(self.state['copy_jobs']):
+            try:
+                self._execute(f"COPY JOB ALTER {job} AUTO ON")
+            except psycopg2.Error as e:
+                print(f"   ❌ COPY JOB {job} still paused: {str(e).strip()}")
+                continue
+            self.state['copy_jobs'].remove(job)
+            self._save()
+            print(f"   ✅ COPY JOB {job}: AUTO ON")
+        if self.state['sync_marker']:
+            bucket, key = self._marker(self.state['sync_marker'])
+            try:
+                self.s3.delete_object(Bucket=bucket, Key=key)
+                print(f"   ✅ Sync pause marker removed")
+                self.state['sync_marker'] = None
+                self._save()
+            except Exception as e:
+                print(f"   ❌ Sync pause marker not removed: {e}")
+        return not self.paused
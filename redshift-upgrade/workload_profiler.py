@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Redshift Workload Profiler
+
+Attributes queue time, execution time and bytes scanned to the pipelines
+that generate them (COPY JOBs, loaders, backfills) at minute resolution,
+and ranks the most expensive load patterns. Sources:
+
+  SYS_QUERY_HISTORY   every query (queue / execution time, text, label),
+                      with scan bytes summed from SYS_QUERY_DETAIL
+  STL_WLM_QUERY       WLM queue time per service class (provisioned only)
+  SYS_LOAD_HISTORY    every COPY (source, rows, bytes, files), with the
+                      COPY JOB name from SYS_COPY_JOB
+
+The window is split into CHUNK_HOURS pieces fetched concurrently over a
+pooled connection. Rows are classified and reduced in the worker threads,
+so query text is never held for the whole window.
+
+Usage:
+    python workload_profiler.py                   # last 24 hours
+    python workload_profiler.py --hours 168 --top 15
+    python workload_profiler.py --start 2026-10-18T00:00 --end 2026-10-19T00:00 --csv minutes.csv
+"""
+import argparse
+import csv
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from redshift_connection import connection_pool, pooled_cursor, iter_rows
+
+CHUNK_HOURS = 6
+MAX_WORKERS = 4
+RETENTION_DAYS = 7              # SYS_* / STL_* views keep about a week
+SMALL_FILE_BYTES = 1024 * 1024  # COPY files below this are mostly per-file overhead
+
+# First match wins; matched (lower-cased) against the query label and text,
+# and for loads against the COPY JOB name, S3 source and table
+PIPELINES = [
+    ('meraki_copy_job', r"meraki_webhook_loader\b|edna-stream-meraki/copy-job/"),
+    ('meraki_batch_copy_job', r"meraki_webhook_batch_loader|edna-stream-meraki/copy-job-gz/"),
+    ('greenhouse_copy_job', r"greenhouse[\w-]*/copy-job/"),
+    ('greenhouse_parquet', r"greenhouse[\w-]*/parquet/|edna_stream_greenhouse\.\w+_flat"),
+    ('meraki_firehose', r"firehose-staging/|meraki-redshift-stream"),
+    ('meraki_sync_loader', r"edna-stream-meraki/(raw|firehose-backup)/"),
+    ('esd_attendance_loader', r"api_period_attendance"),
+    ('greenhouse_backfill', r"raw_greenhouse"),
+    ('meraki_backfill', r"(insert\s+into|update)\s+edna_stream_meraki\.meraki_webhooks"),
+]
+PIPELINES = [(name, re.compile(pattern)) for name, pattern in PIPELINES]
+
+QUERY_HISTORY_SQL = """
+SELECT q.query_id, q.transaction_id, TRIM(q.query_type), q.start_time,
+       q.queue_time, q.execution_time, COALESCE(d.scanned_bytes, 0),
+       TRIM(q.query_label), LEFT(q.query_text, 1000)
+FROM sys_query_history q
+LEFT JOIN (
+    SELECT query_id, SUM(input_bytes) AS scanned_bytes
+    FROM sys_query_detail
+    WHERE step_name = 'scan' AND start_time >= %s AND start_time < %s
+    GROUP BY query_id
+) d ON d.query_id = q.query_id
+WHERE q.start_time >= %s AND q.start_time < %s
+"""
+
+LOAD_HISTORY_SQL = """
+SELECT l.query_id, l.transaction_id, l.start_time, TRIM(l.table_name), TRIM(l.data_source),
+       TRIM(j.job_name), l.duration, l.loaded_rows, l.loaded_bytes,
+       l.source_file_count, l.source_file_bytes, TRIM(l.status)
+FROM sys_load_history l
+LEFT JOIN sys_copy_job j ON j.job_id = l.copy_job_id
+WHERE l.start_time >= %s AND l.start_time < %s
+"""
+
+# Service classes 1-4 are system queues
+WLM_SQL = """
+SELECT xid, queue_start_time, TRIM(service_class_name), total_queue_time, total_exec_time
+FROM stl_wlm_query
+WHERE queue_start_time >= %s AND queue_start_time < %s AND service_class > 4
+"""
+
+
+@lru_cache(maxsize=8192)
+def classify(text):
+    """Pipeline for a query text / COPY source; 'other' when nothing matches"""
+    lowered = text.lower()
+    for name, pattern in PIPELINES:
+        if pattern.search(lowered):
+            return name
+    return 'other'
+
+
+_DIGITS = re.compile(r'\d+')
+
+
+def load_pattern(data_source):
+    """S3 prefix of a COPY source with the object name dropped and numbers wildcarded"""
+    if not data_source:
+        return '(unknown)'
+    if data_source.startswith('s3://'):
+        bucket, _, key = data_source[5:].partition('/')
+        prefix = key.rsplit('/', 1)[0] + '/' if '/' in key else ''
+        return f"s3://{bucket}/{_DIGITS.sub('*', prefix)}"
+    return _DIGITS.sub('*', data_source)
+
+
+def _minute(timestamp):
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def time_chunks(start, end, hours=CHUNK_HOURS):
+    """[start, end) split into pieces of at most `hours`"""
+    step = timedelta(hours=hours)
+    while start < end:
+        yield start, min(start + step, end)
+        start += step
+
+
+# Fetching (worker threads) -------------------------------------------------
+
+def fetch_queries(conn_pool, start, end):
+    """[(minute, pipeline, transaction_id, query_id, query_type, queue_us, exec_us, scanned_bytes)]"""
+    rows = []
+    with pooled_cursor(conn_pool) as cursor:
+        for (query_id, transaction_id, query_type, start_time, queue_us, exec_us,
+             scanned, label, text) in iter_rows(cursor, QUERY_HISTORY_SQL, (start, end, start, end)):
+            pipeline = classify(f"{label or ''} {text or ''}")
+            rows.append((_minute(start_time), pipeline, transaction_id, query_id, query_type,
+                         queue_us or 0, exec_us or 0, scanned or 0))
+    return rows
+
+
+def fetch_loads(conn_pool, start, end):
+    """[(minute, pipeline, query_id, transaction_id, table, pattern, duration_us, rows, bytes, files, file_bytes, failed)]"""
+    rows = []
+    with pooled_cursor(conn_pool) as cursor:
+        for (query_id, transaction_id, start_time, table, data_source, job_name, duration_us,
+             loaded_rows, loaded_bytes, files, file_bytes, status) in iter_rows(cursor, LOAD_HISTORY_SQL, (start, end)):
+            pipeline = classify(f"{job_name or ''} {data_source or ''} {table or ''}")
+            rows.append((_minute(start_time), pipeline, query_id, transaction_id, table,
+                         load_pattern(data_source), duration_us or 0, loaded_rows or 0,
+                         loaded_bytes or 0, files or 0, file_bytes or 0,
+                         (status or '').lower() not in ('', 'completed', 'success')))
+    return rows
+
+
+def fetch_wlm(conn_pool, start, end):
+    """[(minute, transaction_id, service_class, queue_us, exec_us)]"""
+    with pooled_cursor(conn_pool) as cursor:
+        return [(_minute(queued_at), xid, service_class, queue_us or 0, exec_us or 0)
+                for xid, queued_at, service_class, queue_us, exec_us
+                in iter_rows(cursor, WLM_SQL, (start, end))]
+
+
+# Aggregation ---------------------------------------------------------------
+
+class WorkloadProfile:
+    def __init__(self):
+        self.pipelines = defaultdict(Counter)        # pipeline -> totals
+        self.minutes = defaultdict(Counter)          # (minute, pipeline) -> totals
+        self.load_patterns = defaultdict(Counter)    # (pipeline, table, pattern) -> totals
+        self.service_classes = defaultdict(Counter)  # WLM queue -> totals
+        self.transactions = {}                       # transaction_id -> pipeline
+        self.copy_times = {}                         # COPY query_id -> (queue_us, exec_us)
+
+    def add_queries(self, rows):
+        for minute, pipeline, xid, query_id, query_type, queue_us, exec_us, scanned in rows:
+            for totals in (self.pipelines[pipeline], self.minutes[(minute, pipeline)]):
+                totals['queries'] += 1
+                totals['queue_us'] += queue_us
+                totals['exec_us'] += exec_us
+                totals['scanned_bytes'] += scanned
+            # A transaction belongs to the pipeline of any of its recognised statements
+            if pipeline != 'other' or xid not in self.transactions:
+                self.transactions[xid] = pipeline
+            if query_type == 'COPY':
+                self.copy_times[query_id] = (queue_us, exec_us)
+
+    def add_loads(self, rows):
+        """Loads after queries: COPY queue / exec times and transactions come from them"""
+        for (minute, pipeline, query_id, xid, table, pattern, duration_us, loaded_rows,
+             loaded_bytes, files, file_bytes, failed) in rows:
+            if pipeline == 'other':
+                pipeline = self.transactions.get(xid, 'other')
+            queue_us, exec_us = self.copy_times.get(query_id, (0, duration_us))
+            pattern_totals = self.load_patterns[(pipeline, table, pattern)]
+            pattern_totals['runs'] += 1
+            pattern_totals['failed'] += failed
+            pattern_totals['queue_us'] += queue_us
+            pattern_totals['exec_us'] += exec_us
+            pattern_totals['rows'] += loaded_rows
+            pattern_totals['bytes'] += loaded_bytes
+            pattern_totals['files'] += files
+            pattern_totals['file_bytes'] += file_bytes
+            for totals in (self.pipelines[pipeline], self.minutes[(minute, pipeline)]):
+                totals['loads'] += 1
+                totals['loaded_rows'] += loaded_rows
+
+    def add_wlm(self, rows):
+        for minute, xid, service_class, queue_us, exec_us in rows:
+            pipeline = self.transactions.get(xid, 'other')
+            self.pipelines[pipeline]['wlm_queue_us'] += queue_us
+            self.minutes[(minute, pipeline)]['wlm_queue_us'] += queue_us
+            totals = self.service_classes[service_class]
+            totals['queries'] += 1
+            totals['queue_us'] += queue_us
+            totals['exec_us'] += exec_us
+
+    def busy_minutes(self):
+        """{minute: (busy_us, {pipeline: busy_us})} where busy = queue + exec"""
+        minutes = defaultdict(lambda: [0, Counter()])
+        for (minute, pipeline), totals in self.minutes.items():
+            busy = totals['queue_us'] + totals['exec_us']
+            minutes[minute][0] += busy
+            minutes[minute][1][pipeline] += busy
+        return minutes
+
+
+def profile_workload(conn_pool, start, end, chunk_hours=CHUNK_HOURS, workers=MAX_WORKERS):
+    """WorkloadProfile for [start, end), every chunk of every source fetched concurrently"""
+    profile = WorkloadProfile()
+    chunks = list(time_chunks(start, end, chunk_hours))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        query_futures = [executor.submit(fetch_queries, conn_pool, a, b) for a, b in chunks]
+        load_futures = [executor.submit(fetch_loads, conn_pool, a, b) for a, b in chunks]
+        wlm_futures = [executor.submit(fetch_wlm, conn_pool, a, b) for a, b in chunks]
+
+        for future in query_futures:
+            profile.add_queries(future.result())
+        for future in load_futures:
+            profile.add_loads(future.result())
+        wlm_errors = []
+        for future in wlm_futures:
+            try:
+                profile.add_wlm(future.result())
+            except Exception as e:
+                wlm_errors.append(e)
+        if wlm_errors:
+            print(f"⚠️ STL_WLM_QUERY unavailable ({wlm_errors[0]}) - WLM queue time not attributed")
+    return profile
+
+
+# Reports -------------------------------------------------------------------
+
+def _seconds(us):
+    return us / 1e6
+
+
+def print_pipelines(profile):
+    busy_total = sum(t['queue_us'] + t['exec_us'] for t in profile.pipelines.values()) or 1
+    print(f"\n🏭 Workload by pipeline:")
+    print(f"{'Pipeline':<24} {'Queries':>9} {'Queue s':>10} {'Exec s':>10} {'WLM q s':>10} "
+          f"{'Scanned GB':>11} {'Loads':>7} {'Rows loaded':>13} {'Share':>6}")
+    print("-" * 108)
+    ranked = sorted(profile.pipelines.items(),
+                    key=lambda item: item[1]['queue_us'] + item[1]['exec_us'], reverse=True)
+    for pipeline, t in ranked:
+        share = (t['queue_us'] + t['exec_us']) / busy_total * 100
+        print(f"{pipeline:<24} {t['queries']:>9,} {_seconds(t['queue_us']):>10,.1f} "
+              f"{_seconds(t['exec_us']):>10,.1f} {_seconds(t['wlm_queue_us']):>10,.1f} "
+              f"{t['scanned_bytes'] / 1024 ** 3:>11,.2f} {t['loads']:>7,} {t['loaded_rows']:>13,} {share:>5.1f}%")
+
+
+def print_load_patterns(profile, top=10):
+    """Load patterns ranked by total queue + execution time"""
+    ranked = sorted(profile.load_patterns.items(),
+                    key=lambda item: item[1]['queue_us'] + item[1]['exec_us'], reverse=True)
+    print(f"\n🔥 Most expensive load patterns (top {top}):")
+    if not ranked:
+        print("   No loads in this window")
+        return
+    for rank, ((pipeline, table, pattern), t) in enumerate(ranked[:top], 1):
+        busy = _seconds(t['queue_us'] + t['exec_us'])
+        print(f"{rank:>3}. {pipeline} → {table}")
+        print(f"     {pattern}")
+        line = (f"     {t['runs']:,} runs, {busy:,.1f}s total ({busy / t['runs']:.2f}s avg, "
+                f"{_seconds(t['queue_us']):,.1f}s queued), {t['rows']:,} rows, "
+                f"{t['bytes'] / 1024 ** 2:,.1f} MB")
+        if t['files']:
+            avg_file = t['file_bytes'] / t['files']
+            line += f", {t['files']:,} files (avg {avg_file / 1024:,.0f} KB)"
+            if avg_file < SMALL_FILE_BYTES:
+                line += " ⚠️ small files"
+        if t['failed']:
+            line += f", ❌ {t['failed']} failed"
+        print(line)
+
+
+def print_service_classes(profile):
+    if not profile.service_classes:
+        return
+    print(f"\n🚦 WLM queues:")
+    for service_class, t in sorted(profile.service_classes.items(),
+                                   key=lambda item: item[1]['queue_us'], reverse=True):
+        avg_queue = _seconds(t['queue_us']) / t['queries']
+        print(f"   {service_class:<30} {t['queries']:>8,} queries  {_seconds(t['queue_us']):>10,.1f}s queued "
+              f"(avg {avg_queue:.2f}s)  {_seconds(t['exec_us']):>10,.1f}s exec")
+
+
+def print_busiest_minutes(profile, top=10):
+    ranked = sorted(profile.busy_minutes().items(), key=lambda item: item[1][0], reverse=True)
+    print(f"\n⏱️ Busiest minutes (queue + exec seconds):")
+    for minute, (busy, by_pipeline) in ranked[:top]:
+        leaders = ", ".join(f"{p} {us / busy * 100:.0f}%" for p, us in by_pipeline.most_common(3))
+        print(f"   {minute:%Y-%m-%d %H:%M}  {_seconds(busy):>9,.1f}s  {leaders}")
+
+
+def print_hourly(profile):
+    """Average busy seconds per minute for each UTC hour of day"""
+    by_hour = defaultdict(list)
+    for minute, (busy, _) in profile.busy_minutes().items():
+        by_hour[minute.hour].append(busy)
+    if not by_hour:
+        return
+    print(f"\n⏰ Average busy seconds per active minute by hour (UTC):")
+    for hour in range(24):
+        values = by_hour.get(hour)
+        if values:
+            print(f"   {hour:02d}:00  {_seconds(sum(values) / len(values)):>8,.1f}s  ({len(values):,} active minutes)")
+
+
+def write_csv(profile, path):
+    fields = ['queries', 'queue_us', 'exec_us', 'wlm_queue_us', 'scanned_bytes', 'loads', 'loaded_rows']
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['minute', 'pipeline'] + fields)
+        for (minute, pipeline), totals in sorted(profile.minutes.items()):
+            writer.writerow([minute.isoformat(), pipeline] + [totals[name] for name in fields])
+    print(f"\n📄 Minute timeline written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribute Redshift workload to pipelines at minute resolution')
+    parser.add_argument('--hours', type=float, default=24, help='Profile the last N hours (default: 24)')
+    parser.add_argument('--start', help='UTC start (ISO), overrides --hours')
+    parser.add_argument('--end', help='UTC end (ISO)')
+    parser.add_argument('--top', type=int, default=10, help='Load patterns / minutes to show')
+    parser.add_argument('--csv', help='Write the per-minute, per-pipeline timeline to this file')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='Concurrent queries (pool size)')
+    parser.add_argument('--chunk-hours', type=float, default=CHUNK_HOURS)
+    args = parser.parse_args()
+
+    with open('config.json') as f:
+        config = json.load(f)
+
+    if args.start:
+        start = datetime.fromisoformat(args.start)
+        end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow()
+    else:
+        end = datetime.utcnow()
+        start = end - timedelta(hours=args.hours)
+    if end - start > timedelta(days=RETENTION_DAYS):
+        print(f"⚠️ System tables keep about {RETENTION_DAYS} days; older minutes will be empty")
+
+    print("=" * 60)
+    print(f"Redshift Workload Profile: {config['redshift']['cluster_identifier']}")
+    print(f"{start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} UTC")
+    print("=" * 60)
+
+    conn_pool = connection_pool(config, maxconn=args.workers)
+    try:
+        started = time.time()
+        profile = profile_workload(conn_pool, start, end, args.chunk_hours, args.workers)
+    finally:
+        conn_pool.closeall()
+
+    queries = sum(t['queries'] for t in profile.pipelines.values())
+    loads = sum(t['runs'] for t in profile.load_patterns.values())
+    print(f"✅ {queries:,} queries and {loads:,} loads profiled in {time.time() - started:.1f}s")
+
+    print_pipelines(profile)
+    print_load_patterns(profile, args.top)
+    print_service_classes(profile)
+    print_busiest_minutes(profile, args.top)
+    print_hourly(profile)
+    if args.csv:
+        write_csv(profile, args.csv)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,38 +2,49 @@
 """
 CloudWatch utility functions for metrics and monitoring
 """
-import boto3
 from datetime import datetime, timedelta
 
+from metrics_client import MetricsClient, metric_query, total
 
-def get_lambda_metrics(function_name, hours=1):
-    """Get Lambda invocation and error metrics"""
-    cloudwatch = boto3.client('cloudwatch')
+LAMBDA_METRICS = {
+    'Invocations': 'Sum',
+    'Errors': 'Sum',
+    'Duration': 'Average',
+    'Throttles': 'Sum',
+}
+
+
+def get_lambda_metrics_many(function_names, hours=1, client=None):
+    """
+    Invocation / error / duration / throttle metrics for many functions
+
+    All functions and metrics come back from one GetMetricData request.
+    Returns {function_name: {metric: total}} (Duration sums the 5-minute
+    averages, as get_lambda_metrics always has).
+    """
+    client = client or MetricsClient()
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(hours=hours)
-    
-    metrics = ['Invocations', 'Errors', 'Duration', 'Throttles']
-    results = {}
-    
-    for metric in metrics:
-        try:
-            response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/Lambda',
-                MetricName=metric,
-                Dimensions=[{'Name': 'FunctionName', 'Value': function_name}],
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=300,
-                Statistics=['Sum'] if metric in ['Invocations', 'Errors', 'Throttles'] else ['Average']
-            )
-            
-            if response['Datapoints']:
-                stat = 'Sum' if metric in ['Invocations', 'Errors', 'Throttles'] else 'Average'
-                total = sum(point[stat] for point in response['Datapoints'])
-                results[metric] = total
-            else:
-                results[metric] = 0
-        except:
-            results[metric] = 0
-    
-    return results
+
+    queries = [
+        metric_query((function_name, metric), 'AWS/Lambda', metric,
+                     {'FunctionName': function_name}, stat, 300)
+        for function_name in function_names
+        for metric, stat in LAMBDA_METRICS.items()
+    ]
+    try:
+        series = client.fetch(queries, start_time, end_time)
+    except Exception as e:
+        print(f"⚠️ Could not fetch Lambda metrics: {e}")
+        series = {}
+
+    return {
+        function_name: {metric: total(series.get((function_name, metric), []))
+                        for metric in LAMBDA_METRICS}
+        for function_name in function_names
+    }
+
+
+def get_lambda_metrics(function_name, hours=1):
+    """Get Lambda invocation and error metrics"""
+    return get_lambda_metrics_many([function_name], hours)[function_name]
@@ -1,83 +1,266 @@
 #!/usr/bin/env python3
-"""AWS Credential Manager - validates and refreshes credentials"""
+"""
+AWS Credential Manager - validates, caches and refreshes credentials
+
+Sessions are validated once with STS and cached per environment until
+their credentials are close to expiry (or, when the expiry is unknown,
+for VALIDATE_TTL seconds). A stale or invalidated session is refreshed
+without prompting from the first source that yields valid credentials:
+
+  file     the environment's section of credentials.yaml, re-read when the
+           file changes (an optional 'expiration' ISO timestamp is honoured)
+  env      AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY / AWS_SESSION_TOKEN
+           (and AWS_CREDENTIAL_EXPIRATION)
+  profile  an AWS config profile (AWS_PROFILE or profile=...): SSO,
+           credential_process and assume-role profiles; botocore refreshes
+           these itself, so the session is kept for its whole lifetime
+
+Only when every source fails, and the manager is interactive (a TTY and
+SA_AWS_NON_INTERACTIVE unset), does it fall back to prompting.
+"""
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
 import boto3
 import yaml
-from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sa_utils.aws_utilities import client_config
+
+SOURCES = ('file', 'env', 'profile')
+VALIDATE_TTL = 300       # re-check credentials of unknown lifetime every 5 minutes
+EXPIRY_MARGIN = 300      # refresh this long before a known expiry
+EXPIRED_ERROR_CODES = {
+    'ExpiredToken', 'ExpiredTokenException', 'RequestExpired',
+    'InvalidClientTokenId', 'UnrecognizedClientException', 'InvalidAccessKeyId',
+}
+
+
+class CredentialsUnavailableError(Exception):
+    """No credential source produced valid credentials"""
+
+
+def _parse_expiry(value):
+    """Epoch seconds from an ISO timestamp / datetime, or None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        dt = value
+    else:
+        dt = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class _CachedSession:
+    __slots__ = ('session', 'source', 'identity', 'expires_at', 'validated_at', 'clients')
+
+    def __init__(self, session, source, identity, expires_at):
+        self.session = session
+        self.source = source
+        self.identity = identity
+        self.expires_at = expires_at
+        self.validated_at = time.time()
+        self.clients = {}
 
 
 class CredentialManager:
-    def __init__(self, credentials_file='credentials.yaml'):
+    def __init__(self, credentials_file='credentials.yaml', region='us-east-1', sources=None,
+                 profile=None, interactive=None, validate_ttl=VALIDATE_TTL):
         self.credentials_file = credentials_file
         self.creds = None
-        
+        self.region = region
+        env_sources = os.environ.get('SA_AWS_CREDENTIAL_SOURCES')
+        self.sources = tuple(sources or (env_sources.split(',') if env_sources else SOURCES))
+        self.profile = profile or os.environ.get('AWS_PROFILE')
+        if interactive is None:
+            interactive = sys.stdin.isatty() and not os.environ.get('SA_AWS_NON_INTERACTIVE')
+        self.interactive = interactive
+        self.validate_ttl = validate_ttl
+        self._file_mtime = None
+        self._cache = {}
+
     def load_credentials(self):
         if not Path(self.credentials_file).exists():
             raise FileNotFoundError(f"{self.credentials_file} not found")
         with open(self.credentials_file) as f:
-            self.creds = yaml.safe_load(f)
+            self.creds = yaml.safe_load(f) or {}
+        self._file_mtime = os.path.getmtime(self.credentials_file)
         return self.creds
-    
-    def validate_credentials(self, environment='production'):
-        if not self.creds:
-            self.load_credentials()
-        env_creds = self.creds.get(environment, {})
+
+    def _reload_if_changed(self):
+        """Pick up credentials.yaml edits made while a long loop is running"""
         try:
+            mtime = os.path.getmtime(self.credentials_file)
+        except OSError:
+            return
+        if self.creds is None or mtime != self._file_mtime:
+            self.load_credentials()
+
+    def _candidate(self, source, environment):
+        """(session, expires_at) for one source, or None if it has nothing to offer"""
+        if source == 'file':
+            self._reload_if_changed()
+            env_creds = (self.creds or {}).get(environment) or {}
+            if not env_creds.get('aws_access_key_id') or not env_creds.get('aws_secret_access_key'):
+                return None
             session = boto3.Session(
                 aws_access_key_id=env_creds['aws_access_key_id'],
                 aws_secret_access_key=env_creds['aws_secret_access_key'],
                 aws_session_token=env_creds.get('aws_session_token'),
-                region_name='us-east-1'
+                region_name=self.region
+            )
+            return session, _parse_expiry(env_creds.get('expiration'))
+        if source == 'env':
+            if not os.environ.get('AWS_ACCESS_KEY_ID') or not os.environ.get('AWS_SECRET_ACCESS_KEY'):
+                return None
+            session = boto3.Session(
+                aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+                aws_session_token=os.environ.get('AWS_SESSION_TOKEN'),
+                region_name=self.region
             )
-            sts = session.client('sts')
-            identity = sts.get_caller_identity()
+            return session, _parse_expiry(os.environ.get('AWS_CREDENTIAL_EXPIRATION'))
+        if source == 'profile':
+            if not self.profile:
+                return None
+            session = boto3.Session(profile_name=self.profile, region_name=self.region)
+            credentials = session.get_credentials()
+            if credentials is None:
+                return None
+            # Refreshable (SSO / credential_process / assume-role) credentials
+            # renew themselves; track their current expiry for reporting only
+            expiry = getattr(credentials, '_expiry_time', None)
+            return session, (_parse_expiry(expiry) if expiry else None)
+        raise ValueError(f"Unknown credential source: {source}")
+
+    def _validate_session(self, session):
+        try:
+            identity = session.client('sts', config=client_config()).get_caller_identity()
             return True, identity
         except Exception as e:
             return False, str(e)
-    
+
+    def validate_credentials(self, environment='production'):
+        """Validate the credentials.yaml section for environment (no caching)"""
+        if not self.creds:
+            self.load_credentials()
+        candidate = self._candidate('file', environment)
+        if candidate is None:
+            return False, f"No credentials for {environment} in {self.credentials_file}"
+        return self._validate_session(candidate[0])
+
+    def _is_fresh(self, entry):
+        now = time.time()
+        if entry.source == 'profile':
+            return True
+        if entry.expires_at is not None:
+            return now < entry.expires_at - EXPIRY_MARGIN
+        return now < entry.validated_at + self.validate_ttl
+
+    def refresh(self, environment='production', prompt=None):
+        """
+        Validate and cache a session from the first working source
+
+        Keeps the current session when its credentials still validate, so
+        clients created from it stay cached. Prompts only as a last resort
+        and only when interactive.
+        """
+        entry = self._cache.get(environment)
+        if entry is not None and entry.source != 'profile':
+            valid, identity = self._validate_session(entry.session)
+            if valid and (entry.expires_at is None or time.time() < entry.expires_at - EXPIRY_MARGIN):
+                entry.validated_at = time.time()
+                return entry
+
+        errors = []
+        for source in self.sources:
+            try:
+                candidate = self._candidate(source, environment)
+            except Exception as e:
+                errors.append(f"{source}: {e}")
+                continue
+            if candidate is None:
+                continue
+            session, expires_at = candidate
+            valid, identity = self._validate_session(session)
+            if valid:
+                entry = _CachedSession(session, source, identity, expires_at)
+                self._cache[environment] = entry
+                return entry
+            errors.append(f"{source}: {identity}")
+
+        if prompt is None:
+            prompt = self.interactive
+        if prompt:
+            print(f"❌ No valid credentials from {', '.join(self.sources)}")
+            self.prompt_for_credentials(environment)
+            return self.refresh(environment, prompt=False)
+        raise CredentialsUnavailableError(
+            f"No valid AWS credentials for {environment}: " + ('; '.join(errors) or 'no source configured')
+        )
+
+    def invalidate(self, environment='production'):
+        """Force a refresh on the next get_session (e.g. after an ExpiredToken error)"""
+        self._cache.pop(environment, None)
+
+    @staticmethod
+    def is_expired_error(error):
+        """True for botocore errors caused by expired or revoked credentials"""
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return code in EXPIRED_ERROR_CODES
+
     def prompt_for_credentials(self, environment='production'):
         print(f"\n⚠️  AWS credentials for {environment} are invalid or expired")
         print("Please enter new credentials:")
         access_key = input("AWS_ACCESS_KEY_ID: ").strip()
         secret_key = input("AWS_SECRET_ACCESS_KEY: ").strip()
         session_token = input("AWS_SESSION_TOKEN: ").strip()
-        
+
         if not access_key or not secret_key:
             raise ValueError("Access key and secret key are required")
-        
+
         if not self.creds:
             self.creds = {}
         if environment not in self.creds:
             self.creds[environment] = {}
-        
+
         self.creds[environment]['aws_access_key_id'] = access_key
         self.creds[environment]['aws_secret_access_key'] = secret_key
         if session_token:
             self.creds[environment]['aws_session_token'] = session_token
-        
+        self.creds[environment].pop('expiration', None)
+
         with open(self.credentials_file, 'w') as f:
             yaml.dump(self.creds, f, default_flow_style=False)
+        self._file_mtime = os.path.getmtime(self.credentials_file)
         print("✅ Credentials updated\n")
-    
+
     def ensure_valid_credentials(self, environment='production'):
-        valid, result = self.validate_credentials(environment)
-        if valid:
-            print(f"✅ AWS credentials valid - Account: {result['Account']}")
-            return True
-        print(f"❌ Credentials invalid: {result}")
-        self.prompt_for_credentials(environment)
-        valid, result = self.validate_credentials(environment)
-        if not valid:
-            raise Exception(f"Credentials still invalid: {result}")
-        print(f"✅ New credentials validated - Account: {result['Account']}")
+        entry = self.refresh(environment)
+        print(f"✅ AWS credentials valid ({entry.source}) - Account: {entry.identity['Account']}")
+        if entry.expires_at is not None:
+            minutes = (entry.expires_at - time.time()) / 60
+            print(f"   Expires in {minutes:.0f} min")
         return True
-    
+
     def get_session(self, environment='production'):
-        if not self.creds:
-            self.load_credentials()
-        env_creds = self.creds[environment]
-        return boto3.Session(
-            aws_access_key_id=env_creds['aws_access_key_id'],
-            aws_secret_access_key=env_creds['aws_secret_access_key'],
-            aws_session_token=env_creds.get('aws_session_token'),
-            region_name='us-east-1'
-        )
+        """Cached, validated boto3 Session; refreshed only when stale"""
+        entry = self._cache.get(environment)
+        if entry is None or not self._is_fresh(entry):
+            entry = self.refresh(environment)
+        return entry.session
+
+    def get_client(self, service_name, environment='production'):
+        """Client from the cached session; rebuilt only when the session changes"""
+        self.get_session(environment)
+        entry = self._cache[environment]
+        client = entry.clients.get(service_name)
+        if client is None:
+            client = entry.session.client(service_name, config=client_config())
+            entry.clients[service_name] = client
+        return client
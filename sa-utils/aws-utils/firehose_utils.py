@@ -6,38 +6,47 @@ import boto3
 import json
 from datetime import datetime, timedelta
 
+from metrics_client import MetricsClient, metric_query, total
 
-def check_firehose_metrics(stream_name, hours=1):
-    """Check Firehose delivery metrics"""
-    cloudwatch = boto3.client('cloudwatch')
+
+FIREHOSE_METRICS = {
+    'IncomingRecords': 'Records received',
+    'DeliveryToS3.Records': 'Delivered to S3',
+    'DeliveryToS3Tables.Records': 'Delivered to S3 Tables',
+    'DeliveryToIceberg.Records': 'Delivered to Iceberg'
+}
+
+
+def check_firehose_metrics_many(stream_names, hours=1, client=None):
+    """Delivery metrics for many streams in one GetMetricData request"""
+    client = client or MetricsClient()
     end_time = datetime.utcnow()
     start_time = end_time - timedelta(hours=hours)
-    
-    metrics = {
-        'IncomingRecords': 'Records received',
-        'DeliveryToS3.Records': 'Delivered to S3',
-        'DeliveryToS3Tables.Records': 'Delivered to S3 Tables',
-        'DeliveryToIceberg.Records': 'Delivered to Iceberg'
+
+    queries = [
+        metric_query((stream_name, metric), 'AWS/Kinesis/Firehose', metric,
+                     {'DeliveryStreamName': stream_name}, 'Sum', 300)
+        for stream_name in stream_names
+        for metric in FIREHOSE_METRICS
+    ]
+    try:
+        series = client.fetch(queries, start_time, end_time)
+    except Exception as e:
+        print(f"⚠️ Could not fetch Firehose metrics: {e}")
+        series = {}
+
+    return {
+        stream_name: {
+            metric: {'value': total(series.get((stream_name, metric), [])), 'description': description}
+            for metric, description in FIREHOSE_METRICS.items()
+        }
+        for stream_name in stream_names
     }
-    
-    results = {}
-    for metric, description in metrics.items():
-        try:
-            response = cloudwatch.get_metric_statistics(
-                Namespace='AWS/Kinesis/Firehose',
-                MetricName=metric,
-                Dimensions=[{'Name': 'DeliveryStreamName', 'Value': stream_name}],
-                StartTime=start_time,
-                EndTime=end_time,
-                Period=300,
-                Statistics=['Sum']
-            )
-            total = sum(point['Sum'] for point in response['Datapoints'])
-            results[metric] = {'value': total, 'description': description}
-        except:
-            results[metric] = {'value': 0, 'description': description}
-    
-    return results
+
+
+def check_firehose_metrics(stream_name, hours=1):
+    """Check Firehose delivery metrics"""
+    return check_firehose_metrics_many([stream_name], hours)[stream_name]
 
 
 def add_firehose_permissions_to_lambda(role_name, firehose_arn):
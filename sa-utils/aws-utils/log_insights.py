@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Parallel CloudWatch Logs Insights queries for diagnostics
+
+LogInsights.run() starts every query at once (up to MAX_CONCURRENT
+running, the rest queued), polls them together with GetQueryResults and
+returns structured rows (one dict per result row, '@ptr' dropped) instead
+of paging through log streams one at a time.
+
+Finished queries whose window has closed (ended more than SETTLE_SECONDS
+ago) are cached on disk, so rerunning a diagnosis for a past incident
+window returns immediately.
+
+Usage:
+    insights = LogInsights(session.client('logs'))
+    results = insights.search(['/aws/lambda/meraki-webhook-processor',
+                               '/aws/lambda/greenhouse-webhook-processor'],
+                              ERRORS_QUERY, start_time, end_time)
+    for group, result in results.items():
+        print_result(group, result)
+
+CLI:
+    python log_insights.py --functions meraki-webhook-processor greenhouse-sqs-worker --query errors
+    python log_insights.py --groups /aws/kinesisfirehose/meraki-redshift-stream --start 2026-10-18T14:00 --end 2026-10-18T16:00
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sa_utils.aws_utilities import get_client
+
+MAX_CONCURRENT = 20          # Logs Insights allows 30 concurrent queries per account
+MAX_GROUPS_PER_QUERY = 50
+SETTLE_SECONDS = 5 * 60      # log ingestion delay before a window is considered closed
+DEFAULT_CACHE_DIR = os.environ.get('SA_LOGS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'sa-logs'))
+DONE_STATUSES = ('Complete', 'Failed', 'Cancelled', 'Timeout', 'Unknown')
+
+RECENT_QUERY = "fields @timestamp, @logStream, @message | sort @timestamp desc"
+ERRORS_QUERY = (
+    "fields @timestamp, @logStream, @message"
+    " | filter @message like /(?i)(error|exception|traceback|task timed out|❌)/"
+    " | sort @timestamp desc"
+)
+LAMBDA_SUMMARY_QUERY = (
+    'filter @type = "REPORT"'
+    " | stats count(*) as invocations, avg(@duration) as avg_ms, pct(@duration, 95) as p95_ms,"
+    " max(@duration) as max_ms, max(@maxMemoryUsed) / 1000000 as max_memory_mb"
+)
+NAMED_QUERIES = {
+    'recent': RECENT_QUERY,
+    'errors': ERRORS_QUERY,
+    'summary': LAMBDA_SUMMARY_QUERY,
+}
+
+QueryResult = namedtuple('QueryResult', ['status', 'rows', 'statistics', 'error'])
+
+
+def _epoch(value):
+    """Epoch seconds from a datetime (naive = UTC) or a number"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def _rows(results):
+    """GetQueryResults rows ([{field, value}, ...]) as dicts"""
+    return [{cell['field']: cell.get('value') for cell in row if cell['field'] != '@ptr'}
+            for row in results]
+
+
+def _error_code(error):
+    return getattr(error, 'response', {}).get('Error', {}).get('Code')
+
+
+class LogInsights:
+    def __init__(self, logs=None, cache_dir=DEFAULT_CACHE_DIR, max_concurrent=MAX_CONCURRENT,
+                 poll_interval=1.0, timeout=300):
+        self.logs = logs or get_client('logs')
+        self.cache_dir = cache_dir
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.cache_hits = 0
+
+    # Cache ---------------------------------------------------------------
+
+    def _cache_path(self, groups, query_string, start, end, limit):
+        text = json.dumps([sorted(groups), query_string, start, end, limit])
+        return os.path.join(self.cache_dir, hashlib.sha1(text.encode('utf-8')).hexdigest()[:24] + '.json')
+
+    def _load(self, *key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(*key)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return QueryResult('Complete', cached['rows'], cached['statistics'], None)
+
+    def _save(self, result, *key):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(*key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows': result.rows, 'statistics': result.statistics}, f)
+        os.replace(tmp_path, path)
+
+    # Queries -------------------------------------------------------------
+
+    def run(self, queries, start_time, end_time, limit=1000):
+        """
+        Run {name: (log_groups, query_string)} concurrently
+
+        Returns {name: QueryResult}. A log group that does not exist gives
+        status 'Missing' instead of failing the other queries.
+        """
+        start, end = _epoch(start_time), _epoch(end_time)
+        closed = end <= time.time() - SETTLE_SECONDS
+        results = {}
+        pending = []
+        for name, (groups, query_string) in queries.items():
+            groups = [groups] if isinstance(groups, str) else list(groups)
+            key = (groups, query_string, start, end, limit)
+            cached = self._load(*key) if closed else None
+            if cached is not None:
+                self.cache_hits += 1
+                results[name] = cached
+            else:
+                pending.append((name, key))
+
+        running = {}  # query_id -> (name, key, started_at)
+        while pending or running:
+            # Start as many as the concurrency budget allows
+            while pending and len(running) < self.max_concurrent:
+                name, key = pending[0]
+                groups, query_string = key[0], key[1]
+                try:
+                    response = self.logs.start_query(
+                        logGroupNames=groups[:MAX_GROUPS_PER_QUERY],
+                        startTime=start,
+                        endTime=end,
+                        queryString=query_string,
+                        limit=limit
+                    )
+                except Exception as e:
+                    code = _error_code(e)
+                    if code == 'LimitExceededException' and running:
+                        break  # account-wide limit; retry once something finishes
+                    pending.pop(0)
+                    status = 'Missing' if code == 'ResourceNotFoundException' else 'Failed'
+                    results[name] = QueryResult(status, [], {}, str(e))
+                    continue
+                pending.pop(0)
+                running[response['queryId']] = (name, key, time.time())
+
+            if not running:
+                continue
+            time.sleep(self.poll_interval)
+
+            for query_id, (name, key, started_at) in list(running.items()):
+                response = self.logs.get_query_results(queryId=query_id)
+                status = response.get('status')
+                if status in DONE_STATUSES:
+                    result = QueryResult(status, _rows(response.get('results', [])),
+                                         response.get('statistics', {}), None)
+                    results[name] = result
+                    del running[query_id]
+                    if status == 'Complete' and closed:
+                        self._save(result, *key)
+                elif time.time() - started_at > self.timeout:
+                    try:
+                        self.logs.stop_query(queryId=query_id)
+                    except Exception:
+                        pass
+                    results[name] = QueryResult('Timeout', _rows(response.get('results', [])),
+                                                response.get('statistics', {}), 'client timeout')
+                    del running[query_id]
+        return results
+
+    def search(self, log_groups, query_string, start_time, end_time, limit=1000):
+        """The same query on each log group separately: {log_group: QueryResult}"""
+        return self.run({group: (group, query_string) for group in log_groups},
+                        start_time, end_time, limit)
+
+
+def print_result(title, result, max_rows=None, fields=None):
+    """Print one QueryResult as aligned text"""
+    print(f"\n📄 {title} [{result.status}]")
+    if result.error:
+        print(f"   ❌ {result.error}")
+        return
+    rows = result.rows if max_rows is None else result.rows[:max_rows]
+    if not rows:
+        print("   (no matching events)")
+        return
+    for row in rows:
+        if fields is None and '@message' in row:
+            stamp = row.get('@timestamp', '')
+            stream = row.get('@logStream', '')
+            print(f"   [{stamp}] {stream[-12:]} {row['@message'].rstrip()}")
+        else:
+            print("   " + ", ".join(f"{k}={row.get(k)}" for k in (fields or row)))
+    if max_rows is not None and len(result.rows) > max_rows:
+        print(f"   ... {len(result.rows) - max_rows} more")
+    scanned = result.statistics.get('recordsScanned')
+    if scanned is not None:
+        print(f"   ({int(scanned):,} records scanned)")
+
+
+def parse_window(hours=None, start=None, end=None):
+    """(start, end) datetimes from --start/--end or the last N hours"""
+    if start:
+        start_time = datetime.fromisoformat(start)
+        end_time = datetime.fromisoformat(end) if end else datetime.utcnow()
+    else:
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=hours or 1)
+    return start_time, end_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a Logs Insights query across log groups in parallel')
+    parser.add_argument('--functions', nargs='*', default=[], help='Lambda function names')
+    parser.add_argument('--groups', nargs='*', default=[], help='Log group names')
+    parser.add_argument('--query', default='errors',
+                        help=f"One of {', '.join(NAMED_QUERIES)} or a Logs Insights query string")
+    parser.add_argument('--hours', type=float, default=1)
+    parser.add_argument('--start', help='UTC start (ISO), overrides --hours')
+    parser.add_argument('--end', help='UTC end (ISO)')
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    log_groups = [f"/aws/lambda/{fn}" for fn in args.functions] + args.groups
+    if not log_groups:
+        parser.error('pass --functions and/or --groups')
+    query_string = NAMED_QUERIES.get(args.query, args.query)
+    start_time, end_time = parse_window(args.hours, args.start, args.end)
+
+    print("=" * 60)
+    print(f"Logs Insights: {len(log_groups)} log groups, {start_time:%Y-%m-%d %H:%M} to {end_time:%Y-%m-%d %H:%M} UTC")
+    print("=" * 60)
+    started = time.time()
+    insights = LogInsights()
+    results = insights.search(log_groups, query_string, start_time, end_time, args.limit)
+    for group in log_groups:
+        print_result(group, results[group])
+    print(f"\n✅ {len(results)} queries in {time.time() - started:.1f}s ({insights.cache_hits} from cache)")
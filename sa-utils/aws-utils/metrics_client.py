@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Batched CloudWatch metrics with an on-disk cache
+
+MetricsClient.fetch() retrieves any number of metrics (any namespaces,
+dimensions, statistics and periods) with GetMetricData: up to 500 queries
+per call, following NextToken until every series is complete, instead of
+one GetMetricStatistics call per metric.
+
+Each series is cached on disk in UTC-day chunks. A chunk is cached once
+it is closed (ended more than SETTLE_SECONDS ago, so late datapoints have
+arrived); repeated dashboards and diagnostics then only fetch the open
+part of their window.
+
+Usage:
+    client = MetricsClient()
+    queries = [metric_query(f"{fn}.errors", 'AWS/Lambda', 'Errors', {'FunctionName': fn})
+               for fn in functions]
+    series = client.fetch(queries, start_time, end_time)
+    series['my-fn.errors']  # [(datetime, value), ...] oldest first
+"""
+import hashlib
+import json
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sa_utils.aws_utilities import get_client
+
+MAX_QUERIES_PER_CALL = 500
+CHUNK_SECONDS = 86400
+SETTLE_SECONDS = 15 * 60
+DEFAULT_CACHE_DIR = os.environ.get('SA_METRICS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'sa-metrics'))
+
+MetricQuery = namedtuple('MetricQuery', ['key', 'namespace', 'metric_name', 'dimensions', 'stat', 'period'])
+
+
+def metric_query(key, namespace, metric_name, dimensions, stat='Sum', period=300):
+    """One series to fetch; key names it in the fetch() result"""
+    if CHUNK_SECONDS % period:
+        raise ValueError(f"period must divide a day (got {period})")
+    return MetricQuery(key, namespace, metric_name, tuple(sorted(dimensions.items())), stat, period)
+
+
+def _epoch(value):
+    """Epoch seconds from a datetime (naive = UTC) or a number"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def _datetime(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def _signature(query):
+    """Cache identity of a series (the key is only a caller-side label)"""
+    text = json.dumps([query.namespace, query.metric_name, query.dimensions, query.stat, query.period])
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:20]
+
+
+def total(points):
+    """Sum of a series' values (0 when empty)"""
+    return sum(value for _, value in points)
+
+
+class MetricsClient:
+    def __init__(self, cloudwatch=None, cache_dir=DEFAULT_CACHE_DIR, region_name=None):
+        self.cloudwatch = cloudwatch or get_client('cloudwatch', region_name)
+        self.cache_dir = cache_dir
+        self.api_calls = 0
+        self.cache_hits = 0
+
+    # Cache ---------------------------------------------------------------
+
+    def _cache_path(self, query, chunk_start):
+        day = _datetime(chunk_start).strftime('%Y%m%d')
+        return os.path.join(self.cache_dir, f"{_signature(query)}-{day}.json")
+
+    def _load_chunk(self, query, chunk_start):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(query, chunk_start)) as f:
+                return [tuple(point) for point in json.load(f)]
+        except (OSError, ValueError):
+            return None
+
+    def _save_chunk(self, query, chunk_start, points):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(query, chunk_start)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(points, f)
+        os.replace(tmp_path, path)
+
+    # Fetching ------------------------------------------------------------
+
+    def _get_metric_data(self, queries, start, end):
+        """
+        One GetMetricData window for many queries
+
+        Returns ({index: {epoch: value}}, incomplete): incomplete holds the
+        indexes whose last StatusCode was not Complete, or that hit an
+        InternalError on any page.
+        """
+        results = {i: {} for i in range(len(queries))}
+        statuses, errored = {}, set()
+        indexed = list(enumerate(queries))
+        # Pages past the per-call datapoint limit come back with a NextToken
+        for offset in range(0, len(indexed), MAX_QUERIES_PER_CALL):
+            batch = indexed[offset:offset + MAX_QUERIES_PER_CALL]
+            request = {
+                'MetricDataQueries': [{
+                    'Id': f"m{i}",
+                    'MetricStat': {
+                        'Metric': {
+                            'Namespace': q.namespace,
+                            'MetricName': q.metric_name,
+                            'Dimensions': [{'Name': n, 'Value': v} for n, v in q.dimensions],
+                        },
+                        'Period': q.period,
+                        'Stat': q.stat,
+                    },
+                    'ReturnData': True,
+                } for i, q in batch],
+                'StartTime': _datetime(start),
+                'EndTime': _datetime(end),
+                'ScanBy': 'TimestampAscending',
+            }
+            while True:
+                response = self.cloudwatch.get_metric_data(**request)
+                self.api_calls += 1
+                for result in response.get('MetricDataResults', []):
+                    values = results[int(result['Id'][1:])]
+                    for stamp, value in zip(result.get('Timestamps', []), result.get('Values', [])):
+                        values[_epoch(stamp)] = value
+                    statuses[int(result['Id'][1:])] = result.get('StatusCode')
+                    if result.get('StatusCode') == 'InternalError':
+                        errored.add(int(result['Id'][1:]))
+                        print(f"⚠️ GetMetricData internal error for {result.get('Label')}")
+                next_token = response.get('NextToken')
+                if not next_token:
+                    break
+                request['NextToken'] = next_token
+        incomplete = errored | {i for i in results if statuses.get(i) != 'Complete'}
+        return results, incomplete
+
+    def fetch(self, queries, start_time, end_time, now=None):
+        """
+        {query.key: [(datetime, value), ...]} for [start_time, end_time)
+
+        Closed day-chunks come from the cache; everything else is fetched in
+        one GetMetricData window (500 series per call, NextToken pages) and
+        the closed chunks are written back, for series whose results came
+        back Complete.
+        """
+        start, end = _epoch(start_time), _epoch(end_time)
+        now = _epoch(now) if now is not None else _epoch(datetime.utcnow())
+        settled = now - SETTLE_SECONDS
+
+        points = {q.key: {} for q in queries}
+        missing_from = {}  # query index -> first chunk start that must be fetched
+        for i, q in enumerate(queries):
+            chunk = start - start % CHUNK_SECONDS
+            while chunk < end:
+                cached = self._load_chunk(q, chunk) if chunk + CHUNK_SECONDS <= settled else None
+                if cached is None:
+                    # Whole chunks only when they can be cached afterwards
+                    missing_from[i] = chunk if chunk + CHUNK_SECONDS <= settled else max(chunk, start)
+                    break
+                self.cache_hits += 1
+                points[q.key].update(cached)
+                chunk += CHUNK_SECONDS
+
+        if missing_from:
+            # One window for every series with missing data (one round trip
+            # for up to 500 series); the earliest gap sets the start
+            fetch_start = min(missing_from.values())
+            # Round the end up to a chunk boundary when that chunk is already closed
+            boundary = end + (-end) % CHUNK_SECONDS
+            fetch_end = boundary if boundary <= settled else end
+            indexes = list(missing_from)
+            batch = [queries[i] for i in indexes]
+            fetched, incomplete = self._get_metric_data(batch, fetch_start, fetch_end)
+            for n, q in enumerate(batch):
+                values = fetched[n]
+                points[q.key].update(values)
+                if n in incomplete:
+                    # Returned as is, but not cached: the next fetch retries it
+                    print(f"⚠️ Not caching {q.key}: GetMetricData did not complete")
+                    continue
+                c = missing_from[indexes[n]]
+                while c % CHUNK_SECONDS == 0 and c + CHUNK_SECONDS <= min(fetch_end, settled):
+                    self._save_chunk(q, c, sorted((t, v) for t, v in values.items()
+                                                  if c <= t < c + CHUNK_SECONDS))
+                    c += CHUNK_SECONDS
+
+        return {
+            key: [(_datetime(t), v) for t, v in sorted(values.items()) if start <= t < end]
+            for key, values in points.items()
+        }
@@ -3,24 +3,181 @@
 Column transformation utilities for data processing
 """
 import re
+from functools import lru_cache
 
+_WORD_BOUNDARY = re.compile('(.)([A-Z][a-z]+)')
+_LOWER_UPPER = re.compile('([a-z0-9])([A-Z])')
 
+
+@lru_cache(maxsize=4096)
 def camel_to_snake(name: str) -> str:
-    """Convert camelCase to snake_case"""
-    s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', name)
-    return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
-
-
-def flatten_dict(d, parent_key='', sep='_', convert_to_snake=False):
-    """Flatten nested dictionary, optionally converting keys to snake_case"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if convert_to_snake:
-            new_key = camel_to_snake(new_key)
-            
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep, convert_to_snake=convert_to_snake).items())
-        else:
-            items.append((new_key, str(v) if v is not None else None))
-    return dict(items)
+    """
+    Convert camelCase to snake_case
+
+    Cached per name: a batch only has a few dozen distinct column names, so
+    every record after the first is a dictionary lookup.
+    """
+    s1 = _WORD_BOUNDARY.sub(r'\1_\2', name)
+    return _LOWER_UPPER.sub(r'\1_\2', s1).lower()
+
+
+def snake_case_mapping(columns) -> dict:
+    """
+    {original: snake_case} for the columns that change
+
+    Raises ValueError when two columns would get the same name
+    (e.g. 'studentId' and 'student_id').
+    """
+    mapping = {}
+    targets = {}
+    for column in columns:
+        target = camel_to_snake(column)
+        if target in targets and targets[target] != column:
+            raise ValueError(f"Columns {targets[target]!r} and {column!r} both convert to {target!r}")
+        targets[target] = column
+        if target != column:
+            mapping[column] = target
+    return mapping
+
+
+def rename_columns(df):
+    """
+    Convert a DataFrame's column names to snake_case in one schema-level rename
+
+    Works on Polars DataFrame / LazyFrame and pandas DataFrame. Only the
+    header is converted, so the cost does not depend on the number of rows.
+    """
+    if hasattr(df, 'collect_schema'):
+        # Polars (LazyFrame.columns would resolve the whole plan)
+        mapping = snake_case_mapping(df.collect_schema().names())
+        return df.rename(mapping) if mapping else df
+    mapping = snake_case_mapping(list(df.columns))
+    return df.rename(columns=mapping) if mapping else df
+
+
+def _leaf(value, keep_types):
+    if keep_types or value is None:
+        return value
+    return str(value)
+
+
+class _Layout:
+    """Key-path layout of one record shape, compiled for the fast path"""
+
+    __slots__ = ('root_keys', 'nodes', 'segments', 'keys')
+
+    def __init__(self, root_keys, nodes, segments, keys):
+        self.root_keys = root_keys
+        self.nodes = nodes        # (parent node, position in parent, expected key tuple) per nested dict
+        self.segments = segments  # (node, start, stop): runs of leaf positions, in output order
+        self.keys = keys          # output column names, aligned with the leaves
+
+
+class DictFlattener:
+    """
+    Flatten many records of the same shape
+
+    The first record of a shape is flattened on the slow (iterative) path,
+    which also records its key-path layout. Later records with the same
+    keys at every level are flattened along the cached paths: no recursion,
+    no key-string building, no camel_to_snake calls. A record whose shape
+    differs (a new key, a missing key, a dict where a value used to be)
+    falls back to the slow path and its layout is cached too, up to
+    max_layouts shapes.
+
+    keep_types=False matches flatten_dict (leaf values become strings);
+    keep_types=True keeps ints, floats, bools and lists as they are.
+    """
+
+    def __init__(self, sep='_', convert_to_snake=False, keep_types=False, max_layouts=64):
+        self.sep = sep
+        self.convert_to_snake = convert_to_snake
+        self.keep_types = keep_types
+        self.max_layouts = max_layouts
+        self._layouts = {}  # (parent_key, top-level keys) -> [layout, ...]
+        self._layout_count = 0
+        self.fast_hits = 0
+        self.slow_hits = 0
+
+    def _key(self, parent_key, key):
+        new_key = f"{parent_key}{self.sep}{key}" if parent_key else key
+        return camel_to_snake(new_key) if self.convert_to_snake else new_key
+
+    def _learn(self, record, parent_key=''):
+        """Slow path: flatten iteratively and return (flat dict, layout)"""
+        nodes, segments, keys, items = [], [], [], []
+        stack = [(iter(enumerate(record.items())), 0, parent_key)]
+        while stack:
+            entry = next(stack[-1][0], None)
+            if entry is None:
+                stack.pop()
+                continue
+            pos, (k, v) = entry
+            _, node, prefix = stack[-1]
+            new_key = self._key(prefix, k)
+            if isinstance(v, dict):
+                nodes.append((node, pos, tuple(v)))
+                stack.append((iter(enumerate(v.items())), len(nodes), new_key))
+            else:
+                if segments and segments[-1][0] == node and segments[-1][2] == pos:
+                    segments[-1] = (node, segments[-1][1], pos + 1)
+                else:
+                    segments.append((node, pos, pos + 1))
+                keys.append(new_key)
+                items.append((new_key, _leaf(v, self.keep_types)))
+        return dict(items), _Layout(tuple(record), nodes, segments, keys)
+
+    def _fast(self, record, layout):
+        """Flatten along a cached layout; None if the record has another shape"""
+        node_values = [tuple(record.values())]
+        for parent, pos, expected in layout.nodes:
+            node = node_values[parent][pos]
+            if not isinstance(node, dict) or tuple(node) != expected:
+                return None
+            node_values.append(tuple(node.values()))
+        values = []
+        for node, start, stop in layout.segments:
+            values += node_values[node][start:stop]
+        if any(isinstance(v, dict) for v in values):
+            return None
+        if not self.keep_types:
+            values = [None if v is None else str(v) for v in values]
+        return dict(zip(layout.keys, values))
+
+    def flatten(self, record, parent_key=''):
+        """Flatten one record"""
+        shape = (parent_key, tuple(record))
+        layouts = self._layouts.get(shape, ())
+        for layout in layouts:
+            flat = self._fast(record, layout)
+            if flat is not None:
+                self.fast_hits += 1
+                return flat
+        self.slow_hits += 1
+        flat, layout = self._learn(record, parent_key)
+        if self._layout_count < self.max_layouts:
+            self._layouts.setdefault(shape, []).append(layout)
+            self._layout_count += 1
+        return flat
+
+    def flatten_all(self, records):
+        """Flatten an iterable of records into a list"""
+        flatten = self.flatten
+        return [flatten(record) for record in records]
+
+
+def flatten_dict(d, parent_key='', sep='_', convert_to_snake=False, keep_types=False):
+    """
+    Flatten nested dictionary, optionally converting keys to snake_case
+
+    Single records only; use DictFlattener (or flatten_records) for batches
+    so the key layout is reused across records.
+    """
+    flattener = DictFlattener(sep=sep, convert_to_snake=convert_to_snake, keep_types=keep_types)
+    return flattener._learn(d, parent_key)[0]
+
+
+def flatten_records(records, sep='_', convert_to_snake=False, keep_types=False):
+    """Flatten a batch of records, caching the key layout of each shape"""
+    flattener = DictFlattener(sep=sep, convert_to_snake=convert_to_snake, keep_types=keep_types)
+    return flattener.flatten_all(records)
@@ -0,0 +1,162 @@
+"""
+Pluggable JSON codec for webhook Lambdas
+
+Uses orjson when it is installed (bundled in the deployment package or a
+Lambda layer) and falls back to the stdlib json module otherwise, so the
+same handler code runs everywhere. Set JSON_CODEC=json to force stdlib.
+
+    import json_codec
+    body = json_codec.loads(event['body'])         # str or bytes
+    line = json_codec.dumps_line(record)           # compact bytes + b'\\n'
+    text = json_codec.dumps(obj, pretty=True)      # str, 2-space indent
+
+Output differs only in whitespace between backends: compact output has no
+spaces after separators, and non-ASCII text is written as UTF-8 rather than
+\\u escapes (both are valid JSON and load back to the same values).
+"""
+import base64
+import json
+import os
+
+JSONDecodeError = json.JSONDecodeError
+
+BACKENDS = ('orjson', 'json')
+
+BACKEND = None
+loads = None
+dumps = None
+dumps_bytes = None
+
+
+def _stdlib_codec():
+    _loads = json.loads
+
+    def _dumps_bytes(obj, pretty=False, default=None):
+        return _dumps(obj, pretty, default).encode('utf-8')
+
+    def _dumps(obj, pretty=False, default=None):
+        if pretty:
+            return json.dumps(obj, indent=2, default=default, ensure_ascii=False)
+        return json.dumps(obj, separators=(',', ':'), default=default, ensure_ascii=False)
+
+    return _loads, _dumps, _dumps_bytes
+
+
+def _orjson_codec():
+    import orjson
+
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+    # keep catching json_codec.JSONDecodeError / ValueError
+    _loads = orjson.loads
+
+    def _dumps_bytes(obj, pretty=False, default=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option)
+
+    def _dumps(obj, pretty=False, default=None):
+        return _dumps_bytes(obj, pretty, default).decode('utf-8')
+
+    return _loads, _dumps, _dumps_bytes
+
+
+def set_backend(name=None):
+    """
+    Select the codec backend ('orjson' or 'json'); returns the active name
+
+    With no name, uses JSON_CODEC from the environment, else orjson when it
+    can be imported, else stdlib json.
+    """
+    global BACKEND, loads, dumps, dumps_bytes
+    name = name or os.environ.get('JSON_CODEC')
+    if name not in (None, *BACKENDS):
+        raise ValueError(f"Unknown JSON codec {name!r} (expected one of {BACKENDS})")
+
+    if name in (None, 'orjson'):
+        try:
+            loads, dumps, dumps_bytes = _orjson_codec()
+            BACKEND = 'orjson'
+            return BACKEND
+        except ImportError:
+            if name == 'orjson':
+                raise
+    loads, dumps, dumps_bytes = _stdlib_codec()
+    BACKEND = 'json'
+    return BACKEND
+
+
+def dumps_line(obj, default=None):
+    """Compact JSON bytes terminated by a newline (Firehose / NDJSON record)"""
+    return dumps_bytes(obj, default=default) + b'\n'
+
+
+def frame_line(data):
+    """
+    NDJSON framing of one decoded record that is already known to be valid JSON
+
+    Returns `data` unchanged when it is a single-line object already ending
+    in a newline, `data + b'\\n'` when only the newline is missing, and None
+    when it needs re-serializing (whitespace around the object, newlines
+    inside it, or not an object at all).
+    """
+    body = data[:-1] if data.endswith(b'\n') else data
+    if body[:1] != b'{' or body[-1:] != b'}' or b'\n' in body:
+        return None
+    return data if len(body) < len(data) else data + b'\n'
+
+
+def transform_record(data, passthrough=True, transform=None):
+    """
+    Firehose transformation of one base64 record into a base64 NDJSON line
+
+    Every record is parsed, so invalid JSON (including several concatenated
+    objects) always raises. In passthrough mode (no transform) a record that
+    is exactly one single-line object is returned as the original string,
+    with a missing newline appended, and skips re-serializing and
+    re-encoding. Everything else is re-serialized (after transform).
+    """
+    payload = base64.b64decode(data)
+    record = loads(payload)
+    if passthrough and transform is None and isinstance(record, dict):
+        line = frame_line(payload)
+        if line is not None:
+            return data if len(line) == len(payload) else base64.b64encode(line).decode('ascii')
+    if transform is not None:
+        record = transform(record)
+    return base64.b64encode(dumps_line(record)).decode('ascii')
+
+
+def self_check():
+    """Passthrough and parse mode agree on valid records and both reject invalid ones"""
+    cases = {
+        b'{"a":1}\n': b'{"a":1}\n',
+        b'{"a":1}': b'{"a":1}\n',
+        b'{}\n': b'{}\n',
+        b'{"a": [\n1,\n2]}\n': b'{"a":[1,2]}\n',
+        b' {"a":1}\n': b'{"a":1}\n',
+        b'{"a":1}\n\n': b'{"a":1}\n',
+    }
+    invalid = [b'{"a":1}{"b":2}\n', b'{"a" 1}\n', b'{broken}\n', b'{"a":1}\n{"b":2}\n', b'{"a":1,}\n', b'']
+
+    for raw, expected in cases.items():
+        data = base64.b64encode(raw).decode('ascii')
+        for passthrough in (True, False):
+            line = base64.b64decode(transform_record(data, passthrough))
+            assert loads(line) == loads(expected) and line.endswith(b'\n') and line.count(b'\n') == 1, (raw, line)
+    for raw in invalid:
+        data = base64.b64encode(raw).decode('ascii')
+        for passthrough in (True, False):
+            try:
+                transform_record(data, passthrough)
+            except ValueError:
+                continue
+            raise AssertionError(f"{raw!r} passed with passthrough={passthrough}")
+    print(f"✅ json_codec self-check passed ({BACKEND})")
+
+
+set_backend()
+
+
+if __name__ == '__main__':
+    self_check()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Incremental schema-profile cache for S3 payload analyzers
+
+Keeps a local JSON store of per-file field statistics keyed by S3 key and
+ETag, plus the merged totals. A re-run lists the prefix, profiles only new
+or changed objects, and folds them into the cached totals; objects that were
+deleted or rewritten have their old counts subtracted first.
+"""
+import json
+import os
+from datetime import datetime
+
+from schema_profiler import SchemaProfile, profile_s3_objects
+
+CACHE_VERSION = 1
+
+
+def list_s3_objects(s3, bucket, prefix, max_files=None):
+    """List non-empty objects under a prefix as {key: etag}"""
+    objects = {}
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Size'] > 0:
+                objects[obj['Key']] = obj['ETag'].strip('"')
+                if max_files and len(objects) >= max_files:
+                    return objects
+    return objects
+
+
+class ProfileCache:
+    """Persistent per-file profile store for one bucket/prefix"""
+
+    def __init__(self, path, template):
+        self.path = path
+        self.template = template
+        self.files = {}
+        self.totals = template.new_empty()
+        self.updated_at = None
+
+    def _settings(self):
+        t = self.template
+        return {
+            'category_paths': t.category_paths,
+            'sample_path': t.sample_path,
+            'max_categories': t.max_categories,
+            'max_samples': t.max_samples,
+            'hll_precision': t.hll_precision,
+        }
+
+    def load(self):
+        """Load the store; a missing file or changed settings start empty"""
+        if not os.path.exists(self.path):
+            return self
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️  Ignoring unreadable profile cache {self.path}: {e}")
+            return self
+        if data.get('version') != CACHE_VERSION or data.get('settings') != self._settings():
+            print(f"⚠️  Profile cache settings changed, rebuilding {self.path}")
+            return self
+        self.files = data.get('files', {})
+        self.totals = SchemaProfile.from_dict(data['totals'])
+        self.updated_at = data.get('updated_at')
+        return self
+
+    def save(self):
+        self.updated_at = datetime.utcnow().isoformat() + 'Z'
+        data = {
+            'version': CACHE_VERSION,
+            'settings': self._settings(),
+            'updated_at': self.updated_at,
+            'files': self.files,
+            'totals': self.totals.to_dict(),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+    def plan(self, objects, prune=True):
+        """
+        Split listed {key: etag} objects into (to_profile, removed) keys
+
+        Pass prune=False when `objects` is a partial listing, so cached
+        files that simply weren't listed are kept.
+        """
+        to_profile = [key for key, etag in objects.items()
+                      if self.files.get(key, {}).get('etag') != etag]
+        removed = [key for key in self.files if key not in objects] if prune else []
+        return to_profile, removed
+
+    def refresh(self, s3, bucket, objects, workers=16, batch_size=25,
+                unwrap_key='payload', whole_object=False, progress=None, prune=True):
+        """
+        Bring the cache up to date with the listed objects
+
+        Returns (totals, stats) where stats counts cached/profiled/removed
+        files and lists (key, error) pairs for objects that failed to read.
+        """
+        to_profile, removed = self.plan(objects, prune=prune)
+
+        # Drop stats for deleted objects and objects whose ETag changed
+        for key in removed + [k for k in to_profile if k in self.files]:
+            self.totals.subtract(self.files.pop(key)['counts'])
+
+        def on_object(key, counts):
+            self.files[key] = {'etag': objects[key], 'counts': counts}
+
+        profiled, errors = profile_s3_objects(
+            s3, bucket, to_profile, self.template,
+            workers=workers, batch_size=batch_size, unwrap_key=unwrap_key,
+            whole_object=whole_object, progress=progress, on_object=on_object
+        )
+        self.totals.merge(profiled)
+        self.save()
+
+        stats = {
+            'cached': len(objects) - len(to_profile),
+            'profiled': len(to_profile) - len(errors),
+            'removed': len(removed),
+            'errors': errors,
+        }
+        return self.totals, stats
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Streaming schema profiler for newline-delimited JSON webhook data
+
+Walks every record once, tracking nested field paths with their value types,
+presence counts and approximate distinct counts (HyperLogLog). Profiles are
+plain aggregates that can be merged, so files can be profiled in parallel
+batches and combined at the end. Memory grows with the number of distinct
+field paths, not with the number of records read.
+"""
+import hashlib
+import itertools
+import json
+import math
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class HyperLogLog:
+    """Approximate distinct counter (~1.6% error at the default precision)"""
+
+    def __init__(self, precision=12, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest()
+        x = int.from_bytes(digest, 'big')
+        index = x >> (64 - self.precision)
+        rest = (x << self.precision) & ((1 << 64) - 1)
+        rank = (64 - self.precision + 1) if rest == 0 else (65 - rest.bit_length())
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog counters with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(self.m * math.log(self.m / zeros)))
+        return int(round(estimate))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': self.registers.hex()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['precision'], bytes.fromhex(data['registers']))
+
+
+class SchemaProfile:
+    """
+    Mergeable profile of a stream of JSON records
+
+    Field paths use dots for nested objects and [] for list elements, e.g.
+    alertData.triggerData[].trigger.type. Values seen at the paths listed in
+    `category_paths` are counted exactly (alert types, trigger types, ...),
+    up to `max_categories` distinct values per path. One sample record is
+    kept per value of `sample_path` (or per top-level key set if unset).
+    """
+
+    def __init__(self, category_paths=None, sample_path=None, max_categories=1000,
+                 max_samples=100, hll_precision=12):
+        self.category_paths = dict(category_paths or {})
+        self.sample_path = sample_path
+        self.max_categories = max_categories
+        self.max_samples = max_samples
+        self.hll_precision = hll_precision
+        self.total_records = 0
+        self.invalid_lines = 0
+        self.fields = {}
+        self.categories = {name: {} for name in self.category_paths}
+        self.samples = {}
+        self._path_to_category = {path: name for name, path in self.category_paths.items()}
+
+    def _field(self, path):
+        field = self.fields.get(path)
+        if field is None:
+            field = {'records': 0, 'occurrences': 0, 'types': {},
+                     'distinct': HyperLogLog(self.hll_precision)}
+            self.fields[path] = field
+        return field
+
+    def _count_category(self, name, value, count=1):
+        counts = self.categories[name]
+        key = str(value)
+        if key != '__other__' and key not in counts and len(counts) >= self.max_categories:
+            key = '__other__'
+        counts[key] = counts.get(key, 0) + count
+
+    def add_record(self, record):
+        """Profile a single decoded record"""
+        self.total_records += 1
+        seen = set()
+        sample_value = None
+        stack = [('', record)]
+
+        while stack:
+            path, value = stack.pop()
+            if isinstance(value, dict):
+                for key, child in value.items():
+                    stack.append((f"{path}.{key}" if path else key, child))
+                if path:
+                    self._observe(path, 'object', None, seen)
+            elif isinstance(value, list):
+                for child in value:
+                    stack.append((f"{path}[]", child))
+                self._observe(path, 'array', None, seen)
+            else:
+                self._observe(path, type(value).__name__, value, seen)
+                category = self._path_to_category.get(path)
+                if category is not None:
+                    self._count_category(category, value)
+                if path == self.sample_path:
+                    sample_value = value
+
+        if self.sample_path:
+            sample_key = str(sample_value) if sample_value is not None else 'unknown'
+        elif isinstance(record, dict):
+            # No sample path: keep one sample per distinct top-level shape
+            sample_key = ','.join(sorted(record))
+        else:
+            sample_key = type(record).__name__
+        if sample_key not in self.samples and len(self.samples) < self.max_samples:
+            self.samples[sample_key] = record
+
+    def _observe(self, path, type_name, value, seen):
+        field = self._field(path)
+        field['occurrences'] += 1
+        field['types'][type_name] = field['types'].get(type_name, 0) + 1
+        if value is not None:
+            field['distinct'].add(value)
+        if path not in seen:
+            seen.add(path)
+            field['records'] += 1
+
+    def add_lines(self, lines, unwrap_key=None):
+        """Profile an iterable of NDJSON lines (str or bytes)"""
+        for line in lines:
+            if not line or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.invalid_lines += 1
+                continue
+            if unwrap_key and isinstance(record, dict) and isinstance(record.get(unwrap_key), dict):
+                record = record[unwrap_key]
+            self.add_record(record)
+        return self
+
+    def add_document(self, content, unwrap_key=None):
+        """Profile a whole JSON document (a single record or a list of records)"""
+        try:
+            data = json.loads(content)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.invalid_lines += 1
+            return self
+        for record in (data if isinstance(data, list) else [data]):
+            if unwrap_key and isinstance(record, dict) and isinstance(record.get(unwrap_key), dict):
+                record = record[unwrap_key]
+            self.add_record(record)
+        return self
+
+    def merge(self, other):
+        """Fold another profile's aggregates into this one"""
+        self.total_records += other.total_records
+        self.invalid_lines += other.invalid_lines
+        for path, theirs in other.fields.items():
+            ours = self._field(path)
+            ours['records'] += theirs['records']
+            ours['occurrences'] += theirs['occurrences']
+            for type_name, count in theirs['types'].items():
+                ours['types'][type_name] = ours['types'].get(type_name, 0) + count
+            ours['distinct'].merge(theirs['distinct'])
+        for name, counts in other.categories.items():
+            self.categories.setdefault(name, {})
+            for value, count in counts.items():
+                self._count_category(name, value, count)
+        for key, sample in other.samples.items():
+            if key not in self.samples and len(self.samples) < self.max_samples:
+                self.samples[key] = sample
+        return self
+
+    def counts(self):
+        """
+        Exact, subtractable part of the profile (everything except the
+        HyperLogLog registers and samples), small enough to keep per file
+        """
+        return {
+            'total_records': self.total_records,
+            'invalid_lines': self.invalid_lines,
+            'fields': {path: [f['records'], f['occurrences'], f['types']]
+                       for path, f in self.fields.items()},
+            'categories': self.categories,
+        }
+
+    def subtract(self, counts):
+        """
+        Remove a file's counts() from this profile
+
+        Distinct counts cannot be un-merged, so approx_distinct stays an
+        upper bound until the profile is rebuilt.
+        """
+        self.total_records -= counts['total_records']
+        self.invalid_lines -= counts['invalid_lines']
+        for path, (records, occurrences, types) in counts['fields'].items():
+            field = self.fields.get(path)
+            if field is None:
+                continue
+            field['records'] -= records
+            field['occurrences'] -= occurrences
+            for type_name, count in types.items():
+                remaining = field['types'].get(type_name, 0) - count
+                if remaining > 0:
+                    field['types'][type_name] = remaining
+                else:
+                    field['types'].pop(type_name, None)
+            if field['occurrences'] <= 0:
+                del self.fields[path]
+        for name, values in counts['categories'].items():
+            ours = self.categories.get(name, {})
+            for value, count in values.items():
+                remaining = ours.get(value, 0) - count
+                if remaining > 0:
+                    ours[value] = remaining
+                else:
+                    ours.pop(value, None)
+        return self
+
+    def new_empty(self):
+        """Create an empty profile with the same settings"""
+        return SchemaProfile(self.category_paths, self.sample_path, self.max_categories,
+                             self.max_samples, self.hll_precision)
+
+    def top_level_fields(self):
+        return {path: f['records'] for path, f in self.fields.items()
+                if '.' not in path and '[' not in path}
+
+    def summary(self):
+        """JSON-serializable summary of the profile"""
+        return {
+            'total_records': self.total_records,
+            'invalid_lines': self.invalid_lines,
+            'fields': {
+                path: {
+                    'records': f['records'],
+                    'occurrences': f['occurrences'],
+                    'presence_pct': round(100.0 * f['records'] / self.total_records, 2) if self.total_records else 0.0,
+                    'types': dict(f['types']),
+                    'approx_distinct': f['distinct'].count(),
+                }
+                for path, f in sorted(self.fields.items())
+            },
+            'categories': {name: dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+                           for name, counts in self.categories.items()},
+        }
+
+    def to_dict(self):
+        """Full serializable state, including HyperLogLog registers"""
+        return {
+            'category_paths': self.category_paths,
+            'sample_path': self.sample_path,
+            'max_categories': self.max_categories,
+            'max_samples': self.max_samples,
+            'hll_precision': self.hll_precision,
+            'total_records': self.total_records,
+            'invalid_lines': self.invalid_lines,
+            'fields': {
+                path: {'records': f['records'], 'occurrences': f['occurrences'],
+                       'types': f['types'], 'distinct': f['distinct'].to_dict()}
+                for path, f in self.fields.items()
+            },
+            'categories': self.categories,
+            'samples': self.samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        profile = cls(data.get('category_paths'), data.get('sample_path'),
+                      data.get('max_categories', 1000), data.get('max_samples', 100),
+                      data.get('hll_precision', 12))
+        profile.total_records = data.get('total_records', 0)
+        profile.invalid_lines = data.get('invalid_lines', 0)
+        for path, f in data.get('fields', {}).items():
+            profile.fields[path] = {
+                'records': f['records'],
+                'occurrences': f['occurrences'],
+                'types': dict(f['types']),
+                'distinct': HyperLogLog.from_dict(f['distinct']),
+            }
+        for name, counts in data.get('categories', {}).items():
+            profile.categories[name] = dict(counts)
+        profile.samples = dict(data.get('samples', {}))
+        return profile
+
+
+def iter_s3_lines(s3, bucket, key):
+    """Stream the lines of an S3 object without loading it all into memory"""
+    response = s3.get_object(Bucket=bucket, Key=key)
+    return response['Body'].iter_lines()
+
+
+def profile_s3_objects(s3, bucket, keys, template, workers=16, batch_size=25,
+                       unwrap_key='payload', whole_object=False, progress=None,
+                       on_object=None):
+    """
+    Profile every S3 object in `keys` using a thread pool
+
+    Each worker profiles a batch of files into its own partial SchemaProfile.
+    At most `workers` batches are submitted at a time; each partial is merged
+    into the result and released as soon as its batch completes, so memory
+    stays bounded by `workers` partial profiles however many files there are.
+
+    Objects are read as NDJSON by default; whole_object=True parses each
+    object as a single JSON document instead (pretty-printed raw/ payloads).
+    If `on_object(key, counts)` is given it is called on the main
+    thread with each file's exact counts, for per-file caching.
+
+    Returns (profile, errors) where errors is a list of (key, message).
+    """
+    result = template.new_empty()
+    errors = []
+    batches = (keys[i:i + batch_size] for i in range(0, len(keys), batch_size))
+
+    def profile_batch(batch):
+        partial = template.new_empty()
+        batch_errors = []
+        per_object = []
+        for key in batch:
+            target = template.new_empty() if on_object else partial
+            try:
+                if whole_object:
+                    body = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+                    target.add_document(body, unwrap_key=unwrap_key)
+                else:
+                    target.add_lines(iter_s3_lines(s3, bucket, key), unwrap_key=unwrap_key)
+            except Exception as e:
+                batch_errors.append((key, str(e)))
+                continue
+            if on_object:
+                per_object.append((key, target.counts()))
+                partial.merge(target)
+        return len(batch), partial, batch_errors, per_object
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(profile_batch, batch) for batch in itertools.islice(batches, workers)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                count, partial, batch_errors, per_object = future.result()
+                result.merge(partial)
+                errors.extend(batch_errors)
+                for key, counts in per_object:
+                    on_object(key, counts)
+                done += count
+                if progress:
+                    progress(done, len(keys), result.total_records)
+                # Refill the slot this batch held
+                for batch in itertools.islice(batches, 1):
+                    pending.add(executor.submit(profile_batch, batch))
+
+    return result, errors
+
+
+def self_check():
+    """Profile the same records through the NDJSON and whole-object S3 paths"""
+
+    class Body:
+        def __init__(self, data):
+            self.data = data
+
+        def read(self):
+            return self.data
+
+        def iter_lines(self):
+            return iter(self.data.splitlines())
+
+    class FakeS3:
+        def __init__(self, objects):
+            self.objects = objects
+
+        def get_object(self, Bucket, Key):
+            return {'Body': Body(self.objects[Key])}
+
+    records = [{'payload': {'alertType': 'sensor', 'deviceSerial': f"Q3CA-{i}", 'value': i}} for i in range(3)]
+    ndjson = {'copy-job/a.json': b'\n'.join(json.dumps(r).encode('utf-8') for r in records)}
+    whole = {
+        'raw/single.json': json.dumps(records[0], indent=2).encode('utf-8'),
+        'raw/list.json': json.dumps(records[1:], indent=2).encode('utf-8'),
+    }
+
+    for name, objects, whole_object in (('NDJSON', ndjson, False), ('whole-object', whole, True)):
+        profile, errors = profile_s3_objects(FakeS3(objects), 'bucket', sorted(objects), SchemaProfile(),
+                                             workers=2, batch_size=1, whole_object=whole_object)
+        assert not errors, f"{name}: {errors}"
+        assert profile.total_records == len(records), f"{name}: {profile.total_records} records"
+        fields = profile.top_level_fields()
+        assert fields == {'alertType': 3, 'deviceSerial': 3, 'value': 3}, f"{name}: {fields}"
+        print(f"✅ {name}: {profile.total_records} records from {len(objects)} objects")
+
+
+if __name__ == '__main__':
+    self_check()
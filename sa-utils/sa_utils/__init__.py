@@ -0,0 +1,6 @@
+"""
+Importable shared code for SA webhook projects
+
+Deploy scripts bundle this directory into Lambda packages as sa_utils/;
+local scripts add sa-utils/ to sys.path and import sa_utils.aws_utilities.
+"""
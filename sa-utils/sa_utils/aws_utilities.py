@@ -0,0 +1,235 @@
+"""
+AWS helpers shared by webhook Lambdas and local scripts
+
+Clients: get_client() returns one boto3 client per (service, region,
+credentials) for the whole process, built with a tuned botocore config
+(larger connection pool, TCP keepalive, standard retries). Creating a
+client costs milliseconds and its own connection pool, so scripts and warm
+Lambda containers should reuse them rather than call boto3.client() per
+request.
+
+Webhook helpers: parse_webhook_body, add_webhook_metadata,
+create_api_gateway_response and process_firehose_records implement the
+API Gateway / Firehose plumbing used by webhook-streaming-template.
+"""
+import base64
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+# json_codec.py sits at the root of the Lambda package; local runs pick up
+# the shared copy in sa-utils/data-utils
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data-utils'))
+import json_codec
+
+DEFAULT_REGION = os.environ.get('AWS_REGION') or os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+
+# botocore connection pool per client (default is 10, which serializes
+# thread-pool uploads and parallel log queries)
+MAX_POOL_CONNECTIONS = int(os.environ.get('SA_AWS_MAX_POOL_CONNECTIONS', '50'))
+
+_clients = {}
+_sessions = {}
+_lock = threading.RLock()
+
+
+def client_config(**overrides):
+    """botocore Config used for every cached client"""
+    from botocore.config import Config
+
+    settings = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'tcp_keepalive': True,
+        'connect_timeout': 5,
+        'read_timeout': 60,
+        'retries': {'mode': 'standard', 'max_attempts': 5},
+    }
+    settings.update(overrides)
+    return Config(**settings)
+
+
+def _credentials_key(credentials):
+    """Hashable identity of a credentials dict (credentials.yaml section) or None"""
+    if not credentials:
+        return None
+    return (
+        credentials.get('aws_access_key_id'),
+        credentials.get('aws_secret_access_key'),
+        credentials.get('aws_session_token'),
+    )
+
+
+def get_session(credentials=None, region_name=None):
+    """
+    Cached boto3 Session for a credentials dict
+
+    credentials uses the credentials.yaml keys (aws_access_key_id,
+    aws_secret_access_key, aws_session_token); None means the default
+    credential chain (Lambda role, environment, ~/.aws).
+    """
+    import boto3
+
+    region_name = region_name or DEFAULT_REGION
+    key = (region_name, _credentials_key(credentials))
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                creds = credentials or {}
+                session = boto3.Session(
+                    aws_access_key_id=creds.get('aws_access_key_id'),
+                    aws_secret_access_key=creds.get('aws_secret_access_key'),
+                    aws_session_token=creds.get('aws_session_token'),
+                    region_name=region_name
+                )
+                _sessions[key] = session
+    return session
+
+
+def get_client(service_name, region_name=None, credentials=None, **config_overrides):
+    """
+    Process-wide cached boto3 client keyed by (service, region, credentials)
+
+    New credentials (e.g. after a session token refresh) get a new client;
+    the old one is left to be garbage collected with its pool.
+    """
+    region_name = region_name or DEFAULT_REGION
+    key = (service_name, region_name, _credentials_key(credentials),
+           tuple(sorted(config_overrides.items())) if config_overrides else None)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                session = get_session(credentials, region_name)
+                client = session.client(service_name, config=client_config(**config_overrides))
+                _clients[key] = client
+    return client
+
+
+def clear_clients():
+    """Drop every cached client and session (e.g. after credentials were revoked)"""
+    with _lock:
+        _clients.clear()
+        _sessions.clear()
+
+
+def parse_webhook_body(event):
+    """Parsed JSON body of an API Gateway event ({} when empty)"""
+    body = event.get('body')
+    if body is None or body == '':
+        return {}
+    if isinstance(body, dict):
+        return body
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    return json_codec.loads(body)
+
+
+def add_webhook_metadata(body, context, source='webhook', environment='production'):
+    """Wrap a webhook body in the envelope the streaming tables expect"""
+    return {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'source': source,
+        'lambda_request_id': getattr(context, 'aws_request_id', None),
+        'environment': environment,
+        'payload': body
+    }
+
+
+def create_api_gateway_response(status_code, body):
+    """API Gateway proxy response with a JSON body"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json'
+        },
+        'body': json_codec.dumps(body)
+    }
+
+
+def process_firehose_records(records, transform=None, passthrough=True):
+    """
+    Firehose transformation: one compact JSON line per record
+
+    Every record is parsed (json_codec.transform_record). With passthrough
+    (and no transform), records that are one JSON object per line are
+    returned untouched instead of re-serialized. transform, if given, is
+    applied to every parsed record and disables passthrough.
+    Returns the {'records': [...]} response Firehose expects.
+    """
+    passthrough = passthrough and transform is None
+    output_records = []
+    for record in records:
+        try:
+            encoded_data = json_codec.transform_record(record['data'], passthrough, transform)
+
+            output_records.append({
+                'recordId': record['recordId'],
+                'result': 'Ok',
+                'data': encoded_data
+            })
+        except Exception as e:
+            print(f"Error transforming record {record['recordId']}: {e}")
+            output_records.append({
+                'recordId': record['recordId'],
+                'result': 'ProcessingFailed',
+                'data': record['data']
+            })
+    return {'records': output_records}
+
+
+def test_webhook(url, payload, count=1):
+    """POST payload to a webhook URL count times; returns (success, failed)"""
+    import requests
+
+    session = requests.Session()
+    success = failed = 0
+    for i in range(count):
+        try:
+            response = session.post(url, json=payload, timeout=30)
+            if response.status_code == 200:
+                success += 1
+                print(f"✅ Test {i + 1}/{count}: {response.status_code}")
+            else:
+                failed += 1
+                print(f"❌ Test {i + 1}/{count}: {response.status_code} {response.text[:200]}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ Test {i + 1}/{count}: {e}")
+    print(f"\nResults: {success} succeeded, {failed} failed")
+    return success, failed
+
+
+def get_lambda_logs(function_name, hours=1, limit=50, region_name=None):
+    """Print (and return) recent log events of a Lambda function"""
+    logs = get_client('logs', region_name)
+    log_group = f"/aws/lambda/{function_name}"
+    start_time = int((datetime.utcnow() - timedelta(hours=hours)).timestamp() * 1000)
+
+    print("=" * 60)
+    print(f"Logs for {function_name} (last {hours}h)")
+    print("=" * 60)
+
+    streams = logs.describe_log_streams(
+        logGroupName=log_group, orderBy='LastEventTime', descending=True, limit=5
+    ).get('logStreams', [])
+    events = []
+    for stream in streams:
+        if stream.get('lastEventTimestamp', 0) < start_time:
+            continue
+        response = logs.get_log_events(
+            logGroupName=log_group, logStreamName=stream['logStreamName'],
+            startTime=start_time, limit=limit
+        )
+        print(f"\n📄 {stream['logStreamName']}")
+        for event in response.get('events', []):
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(event['timestamp'] / 1000))
+            print(f"  {stamp} {event['message'].rstrip()}")
+            events.append(event)
+    if not events:
+        print("\n⚠️ No log events in this window")
+    return events
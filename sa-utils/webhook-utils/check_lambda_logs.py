@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
-"""Check Lambda CloudWatch logs - works with any webhook project"""
+"""Check Lambda CloudWatch logs - works with any webhook project
+
+Runs Logs Insights queries (invocation summary, errors, recent events) for
+the project's Lambda - and its worker, if config.json names one - all in
+parallel.
+"""
 import boto3
 import json
+import os
 import yaml
 import sys
 from datetime import datetime, timedelta
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'aws-utils'))
+from log_insights import LogInsights, ERRORS_QUERY, LAMBDA_SUMMARY_QUERY, RECENT_QUERY, print_result
+
 def check_lambda_logs(config_path='config.json', credentials_path='credentials.yaml', hours=1):
     with open(config_path) as f:
         config = json.load(f)
@@ -20,31 +29,37 @@ def check_lambda_logs(config_path='config.json', credentials_path='credentials.y
         aws_session_token=prod_creds['aws_session_token']
     )
 
-    logs = session.client('logs')
-    log_group = f"/aws/lambda/{config['lambda']['function_name']}"
+    functions = [config['lambda']['function_name']]
+    if config['lambda'].get('worker_function_name'):
+        functions.append(config['lambda']['worker_function_name'])
 
-    print(f"Checking logs for: {log_group}")
+    print(f"Checking logs for: {', '.join(functions)} (last {hours} hour(s))")
     print("=" * 60)
 
+    queries = {}
+    for function_name in functions:
+        log_group = f"/aws/lambda/{function_name}"
+        queries[(function_name, 'summary')] = (log_group, LAMBDA_SUMMARY_QUERY)
+        queries[(function_name, 'errors')] = (log_group, ERRORS_QUERY)
+        queries[(function_name, 'recent')] = (log_group, RECENT_QUERY)
+
     try:
-        start_time = int((datetime.now() - timedelta(hours=hours)).timestamp() * 1000)
-        
-        response = logs.filter_log_events(
-            logGroupName=log_group,
-            startTime=start_time,
-            limit=50
-        )
-        
-        if response['events']:
-            print(f"\nFound {len(response['events'])} log events in last {hours} hour(s):\n")
-            for event in response['events']:
-                timestamp = datetime.fromtimestamp(event['timestamp'] / 1000)
-                print(f"[{timestamp}] {event['message']}")
-        else:
-            print(f"\n❌ No log events found in last {hours} hour(s)")
-            
+        end_time = datetime.utcnow()
+        start_time = end_time - timedelta(hours=hours)
+        results = LogInsights(session.client('logs')).run(queries, start_time, end_time, limit=50)
     except Exception as e:
         print(f"❌ Error: {e}")
+        return
+
+    for function_name in functions:
+        print(f"\n{'-' * 60}\n{function_name}\n{'-' * 60}")
+        print_result('Invocations', results[(function_name, 'summary')])
+        print_result('Errors', results[(function_name, 'errors')], max_rows=20)
+        recent = results[(function_name, 'recent')]
+        if recent.status == 'Complete' and not recent.rows:
+            print(f"\n❌ No log events found in last {hours} hour(s)")
+        else:
+            print_result('Recent events', recent)
 
 if __name__ == "__main__":
     config = sys.argv[1] if len(sys.argv) > 1 else 'config.json'
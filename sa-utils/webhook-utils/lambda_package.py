@@ -0,0 +1,34 @@
+"""
+Shared modules for webhook Lambda deployment packages
+
+The webhook handlers import json_codec as a top-level module. Deploy
+scripts bundle it at the root of the zip with add_shared_modules(), next
+to lambda_function.py. Local runs import the same file from
+sa-utils/data-utils, which is why the handlers put that directory on
+sys.path; in Lambda the directory does not exist and the bundled copy is
+imported.
+
+orjson is not bundled. Add it to the package or a layer to enable the fast
+json_codec backend; without it the stdlib backend is used.
+
+    sys.path.insert(0, os.path.join('..', 'sa-utils', 'webhook-utils'))
+    from lambda_package import add_shared_modules
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.write('lambda_function.py', 'lambda_function.py')
+        add_shared_modules(zip_file)
+"""
+import os
+
+SA_UTILS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Archive name -> source file
+SHARED_MODULES = {
+    'json_codec.py': os.path.join(SA_UTILS_DIR, 'data-utils', 'json_codec.py'),
+}
+
+
+def add_shared_modules(zip_file):
+    """Write the shared modules the handlers import to the root of zip_file"""
+    for arcname, path in SHARED_MODULES.items():
+        zip_file.write(path, arcname)
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator and latency benchmark for webhook endpoints
+
+Replays real webhook payloads against a deployed URL, or in-process
+against a Lambda handler (the local harness), in one of two modes:
+
+  closed loop  --concurrency N workers, each sending its next request as
+               soon as the previous one returns
+  open loop    --rps R requests started on a fixed schedule (at most
+               --concurrency in flight). Latency is measured from the
+               scheduled start, so a backed-up endpoint shows up as
+               latency instead of silently lowering the request rate
+
+It reports p50/p95/p99 latency, error rate and throughput every
+--interval seconds and for the whole run.
+
+The local harness wraps each payload in an API Gateway proxy event and
+calls the handler from a thread pool. Every AWS call the handler makes is
+answered in-process by AwsStub (botocore's _make_api_call is replaced),
+so no AWS account or network is needed; --stub-latency-ms adds a
+simulated service round trip.
+
+URL mode uses aiohttp when installed and falls back to requests in a
+thread pool.
+
+Usage:
+    python load_generator.py --url https://.../prod/webhook --rps 50 --duration 60 \\
+        --payloads ../../meraki-webhook-streaming/sample_payloads
+    python load_generator.py --handler ../../meraki-webhook-streaming/lambda_function.py \\
+        --concurrency 8 --count 2000 --payloads ../../meraki-webhook-streaming/sample_payloads
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+REQUEST_TIMEOUT = 30
+REPORT_INTERVAL = 5
+HEADERS = {'Content-Type': 'application/json'}
+
+
+def percentile(values, pct):
+    """pct-th percentile of values (nearest rank)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_payloads(paths):
+    """
+    Webhook payloads from files or directories of them
+
+    A file may hold one JSON payload, a JSON array, or NDJSON; S3 backup
+    records ({"timestamp", "source", ..., "payload": {...}}) are unwrapped.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(('.json', '.jsonl', '.ndjson'))))
+        else:
+            files.append(path)
+
+    payloads = []
+    for path in files:
+        with open(path) as f:
+            text = f.read()
+        if not text.strip():
+            print(f"⚠️ Skipping empty payload file: {path}")
+            continue
+        try:
+            data = json.loads(text)
+            records = data if isinstance(data, list) else [data]
+        except ValueError:
+            try:
+                records = [json.loads(line) for line in text.splitlines() if line.strip()]
+            except ValueError as e:
+                print(f"⚠️ Skipping unreadable payload file {path}: {e}")
+                continue
+        for record in records:
+            if isinstance(record, dict) and isinstance(record.get('payload'), dict) and 'source' in record:
+                record = record['payload']
+            payloads.append(record)
+    return payloads
+
+
+# Local harness -------------------------------------------------------------
+
+class AwsStub:
+    """Answers every botocore API call in-process and counts them by operation"""
+
+    FAKE_ENVIRONMENT = {
+        'AWS_ACCESS_KEY_ID': 'stub',
+        'AWS_SECRET_ACCESS_KEY': 'stub',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+    }
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._original = None
+
+    @staticmethod
+    def response(operation_name, params):
+        if operation_name == 'PutObject':
+            return {'ETag': '"stub"'}
+        if operation_name == 'PutRecord':
+            return {'RecordId': uuid.uuid4().hex}
+        if operation_name == 'PutRecordBatch':
+            return {'FailedPutCount': 0,
+                    'RequestResponses': [{'RecordId': uuid.uuid4().hex} for _ in params.get('Records', [])]}
+        if operation_name == 'SendMessage':
+            return {'MessageId': str(uuid.uuid4()),
+                    'MD5OfMessageBody': hashlib.md5(params['MessageBody'].encode('utf-8')).hexdigest()}
+        if operation_name == 'SendMessageBatch':
+            return {'Failed': [], 'Successful': [
+                {'Id': entry['Id'], 'MessageId': str(uuid.uuid4()),
+                 'MD5OfMessageBody': hashlib.md5(entry['MessageBody'].encode('utf-8')).hexdigest()}
+                for entry in params.get('Entries', [])]}
+        if operation_name == 'Publish':
+            return {'MessageId': str(uuid.uuid4())}
+        return {}
+
+    def install(self):
+        from botocore.client import BaseClient
+
+        stub = self
+
+        def _make_api_call(client, operation_name, api_params):
+            with stub._lock:
+                stub.calls[operation_name] += 1
+            if stub.latency:
+                time.sleep(stub.latency)
+            return stub.response(operation_name, api_params)
+
+        for name, value in self.FAKE_ENVIRONMENT.items():
+            os.environ.setdefault(name, value)
+        self._original = BaseClient._make_api_call
+        BaseClient._make_api_call = _make_api_call
+
+    def uninstall(self):
+        if self._original is not None:
+            from botocore.client import BaseClient
+            BaseClient._make_api_call = self._original
+            self._original = None
+
+
+class MockContext:
+    def __init__(self, request_id):
+        self.aws_request_id = request_id
+        self.function_name = 'load-test'
+
+
+def api_gateway_event(body, request_id):
+    """API Gateway proxy event for a POSTed webhook body (bytes or str)"""
+    return {
+        'httpMethod': 'POST',
+        'path': '/webhook',
+        'headers': dict(HEADERS),
+        'body': body.decode('utf-8') if isinstance(body, bytes) else body,
+        'isBase64Encoded': False,
+        'requestContext': {'requestId': request_id},
+    }
+
+
+def load_handler(spec):
+    """Handler function from 'path/to/lambda_function.py[:lambda_handler]'"""
+    path, name = spec, 'lambda_handler'
+    if not spec.endswith('.py') and ':' in spec:
+        path, name = spec.rsplit(':', 1)
+    path = os.path.abspath(path)
+    # Handlers import their sibling modules (meraki_flatten, json_codec, ...)
+    sys.path.insert(0, os.path.dirname(path))
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    module_spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_name] = module
+    module_spec.loader.exec_module(module)
+    return getattr(module, name)
+
+
+class HandlerSender:
+    """Invokes a Lambda handler with API Gateway proxy events from a thread pool"""
+
+    def __init__(self, handler, concurrency):
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _invoke(self, body):
+        request_id = str(uuid.uuid4())
+        result = self.handler(api_gateway_event(body, request_id), MockContext(request_id))
+        status = result.get('statusCode', 200) if isinstance(result, dict) else 200
+        return status, 200 <= status < 300
+
+    async def __call__(self, body):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._invoke, body)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+
+
+# Deployed URL --------------------------------------------------------------
+
+class UrlSender:
+    """POSTs to a webhook URL with aiohttp, or requests in a thread pool without it"""
+
+    def __init__(self, url, concurrency):
+        self.url = url
+        if aiohttp is not None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=concurrency),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+        else:
+            import requests
+            print("⚠️ aiohttp not installed - sending with requests in a thread pool")
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def _post(self, body):
+        response = self.session.post(self.url, data=body, headers=HEADERS, timeout=REQUEST_TIMEOUT)
+        return response.status_code, response.ok
+
+    async def __call__(self, body):
+        if aiohttp is None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._post, body)
+        async with self.session.post(self.url, data=body, headers=HEADERS) as response:
+            await response.read()
+            return response.status, 200 <= response.status < 300
+
+    async def close(self):
+        if aiohttp is not None:
+            await self.session.close()
+        else:
+            self.executor.shutdown(wait=False)
+            self.session.close()
+
+
+# Load generation -----------------------------------------------------------
+
+class LoadGenerator:
+    def __init__(self, send, payloads, concurrency=10, rps=None, count=None, duration=None,
+                 report_interval=REPORT_INTERVAL, out=None):
+        self.send = send
+        self.bodies = itertools.cycle([json.dumps(p).encode('utf-8') for p in payloads])
+        self.concurrency = concurrency
+        self.rps = rps
+        self.count = count if count or duration else 100
+        self.duration = duration
+        self.report_interval = report_interval
+        self.out = out or sys.stdout
+        self.sent = 0
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.timeline = []
+        self._interval_latencies = []
+        self._interval_errors = 0
+
+    def _next_body(self):
+        """The next payload to send, or None when the run is over"""
+        if self.count and self.sent >= self.count:
+            return None
+        if self.duration and time.perf_counter() - self.started >= self.duration:
+            return None
+        self.sent += 1
+        return next(self.bodies)
+
+    async def _request(self, body, started_at):
+        try:
+            status, ok = await self.send(body)
+        except Exception as e:
+            status, ok = type(e).__name__, False
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        self.latencies.append(latency_ms)
+        self._interval_latencies.append(latency_ms)
+        self.statuses[status] += 1
+        if not ok:
+            self.errors += 1
+            self._interval_errors += 1
+
+    async def _closed_loop(self):
+        async def worker():
+            while True:
+                body = self._next_body()
+                if body is None:
+                    return
+                await self._request(body, time.perf_counter())
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _open_loop(self):
+        in_flight = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        async def limited(body, scheduled):
+            async with in_flight:
+                await self._request(body, scheduled)
+
+        for i in itertools.count():
+            scheduled = self.started + i / self.rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            body = self._next_body()
+            if body is None:
+                break
+            task = asyncio.create_task(limited(body, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    def _roll_interval(self):
+        elapsed = time.perf_counter() - self.started
+        since = elapsed - (self.timeline[-1]['elapsed_s'] if self.timeline else 0)
+        latencies, errors = self._interval_latencies, self._interval_errors
+        self._interval_latencies, self._interval_errors = [], 0
+        if not latencies:
+            return
+        row = {
+            'elapsed_s': round(elapsed, 1),
+            'requests': len(latencies),
+            'rps': len(latencies) / since if since else 0.0,
+            'error_pct': errors / len(latencies) * 100,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+        }
+        self.timeline.append(row)
+        print(f"{row['elapsed_s']:>8.1f}s {row['requests']:>9,} {row['rps']:>8.1f} {row['error_pct']:>7.1f}% "
+              f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}", file=self.out, flush=True)
+
+    async def _reporter(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self._roll_interval()
+
+    async def run(self):
+        print(f"{'elapsed':>9} {'requests':>9} {'req/s':>8} {'errors':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=self.out)
+        self.started = time.perf_counter()
+        reporter = asyncio.create_task(self._reporter())
+        try:
+            if self.rps:
+                await self._open_loop()
+            else:
+                await self._closed_loop()
+        finally:
+            reporter.cancel()
+        self.elapsed = time.perf_counter() - self.started
+        self._roll_interval()
+        return self.summary()
+
+    def summary(self):
+        total = len(self.latencies)
+        return {
+            'requests': total,
+            'errors': self.errors,
+            'error_pct': self.errors / total * 100 if total else 0.0,
+            'elapsed_s': self.elapsed,
+            'throughput_rps': total / self.elapsed if self.elapsed else 0.0,
+            'p50_ms': percentile(self.latencies, 50),
+            'p95_ms': percentile(self.latencies, 95),
+            'p99_ms': percentile(self.latencies, 99),
+            'max_ms': max(self.latencies, default=0.0),
+            'mean_ms': statistics.mean(self.latencies) if self.latencies else 0.0,
+            'statuses': dict(self.statuses),
+            'timeline': self.timeline,
+        }
+
+
+def print_summary(summary, stub=None):
+    print("\n" + "=" * 60)
+    print("Load Test Summary")
+    print("=" * 60)
+    print(f"Requests:   {summary['requests']:,} in {summary['elapsed_s']:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s)")
+    print(f"✅ Success: {summary['requests'] - summary['errors']:,}")
+    print(f"❌ Failed:  {summary['errors']:,} ({summary['error_pct']:.2f}%)")
+    print("Statuses:   " + ", ".join(f"{status}={n:,}" for status, n in sorted(summary['statuses'].items(), key=str)))
+    print(f"Latency ms: p50={summary['p50_ms']:.1f}  p95={summary['p95_ms']:.1f}  p99={summary['p99_ms']:.1f}  "
+          f"max={summary['max_ms']:.1f}  mean={summary['mean_ms']:.1f}")
+    if stub is not None and stub.calls:
+        print("AWS calls (stubbed): " + ", ".join(f"{op}={n:,}" for op, n in sorted(stub.calls.items())))
+
+
+def write_timeline(summary, path):
+    fields = ['elapsed_s', 'requests', 'rps', 'error_pct', 'p50_ms', 'p95_ms', 'p99_ms']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(summary['timeline'])
+    print(f"📄 Timeline written to {path}")
+
+
+def run_load_test(payloads, url=None, handler=None, concurrency=10, rps=None, count=None, duration=None,
+                  report_interval=REPORT_INTERVAL, stub_latency_ms=0, csv_path=None):
+    """
+    Replay payloads against url or a local handler ('path/to/lambda_function.py[:name]')
+
+    Returns the summary dict (requests, errors, error_pct, throughput_rps,
+    p50_ms / p95_ms / p99_ms, statuses, timeline).
+    """
+    if not payloads:
+        raise ValueError("No payloads to send")
+    if bool(url) == bool(handler):
+        raise ValueError("Pass exactly one of url or handler")
+
+    print("=" * 60)
+    print("Webhook Load Test")
+    print("=" * 60)
+    print(f"Target:      {url or handler}")
+    print(f"Payloads:    {len(payloads):,}")
+    load = f"{rps:g} req/s (max {concurrency} in flight)" if rps else f"{concurrency} concurrent"
+    limit = f"{duration:g}s" if duration else f"{count or 100:,} requests"
+    print(f"Load:        {load}, {limit}\n")
+
+    stub = None
+    out = sys.stdout
+
+    async def main(send):
+        try:
+            generator = LoadGenerator(send, payloads, concurrency, rps, count, duration, report_interval, out)
+            return await generator.run()
+        finally:
+            await send.close()
+
+    if handler:
+        stub = AwsStub(stub_latency_ms)
+        stub.install()
+        try:
+            handler_function = load_handler(handler)
+            # Handler prints go nowhere; the report is written to the real stdout
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                summary = asyncio.run(main(HandlerSender(handler_function, concurrency)))
+        finally:
+            stub.uninstall()
+    else:
+        async def url_main():
+            return await main(UrlSender(url, concurrency))
+        summary = asyncio.run(url_main())
+
+    print_summary(summary, stub)
+    if csv_path:
+        write_timeline(summary, csv_path)
+    return summary
+
+
+def add_load_arguments(parser):
+    """Load-test options shared by the test_webhook.py scripts"""
+    parser.add_argument('--concurrency', type=int, default=None, help='Concurrent requests (default: 10)')
+    parser.add_argument('--rps', type=float, help='Target requests per second (open loop)')
+    parser.add_argument('--duration', type=float, help='Run for N seconds instead of --count requests')
+    parser.add_argument('--interval', type=float, default=REPORT_INTERVAL, help='Report every N seconds')
+    parser.add_argument('--stub-latency-ms', type=float, default=0,
+                        help='Simulated AWS call latency for --handler runs')
+    parser.add_argument('--csv', help='Write the per-interval timeline to this file')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Replay webhook payloads at a target rate or concurrency')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='Deployed webhook URL')
+    target.add_argument('--handler', help='Local handler: path/to/lambda_function.py[:lambda_handler]')
+    parser.add_argument('--payloads', nargs='+', required=True, help='Payload files or directories')
+    parser.add_argument('--count', type=int, default=None, help='Requests to send (default: 100)')
+    add_load_arguments(parser)
+    args = parser.parse_args()
+
+    run_load_test(load_payloads(args.payloads), url=args.url, handler=args.handler,
+                  concurrency=args.concurrency or 10, rps=args.rps, count=args.count,
+                  duration=args.duration, report_interval=args.interval,
+                  stub_latency_ms=args.stub_latency_ms, csv_path=args.csv)
@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
-"""Test webhook endpoint - works with any webhook project"""
+"""
+Test webhook endpoint - works with any webhook project
+
+Sends --count requests one at a time and prints each response. With
+--concurrency, --rps, --duration or --handler it runs a load test instead
+(load_generator.py): real payloads replayed against the URL or a local
+handler, with p50/p95/p99 latency, error rate and throughput over time.
+"""
 import json
-import requests
 import argparse
 from datetime import datetime, timezone
 
+from load_generator import add_load_arguments, load_payloads, run_load_test
+
 def test_webhook(url, count=1, payload=None):
     print("=" * 60)
     print("Testing Webhook Endpoint")
@@ -19,6 +27,8 @@ def test_webhook(url, count=1, payload=None):
             "message": "Test webhook"
         }
     
+    import requests
+    
     success_count = 0
     failure_count = 0
     
@@ -60,15 +70,30 @@ def test_webhook(url, count=1, payload=None):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Test webhook endpoint')
-    parser.add_argument('--url', required=True, help='Webhook URL')
-    parser.add_argument('--count', type=int, default=1, help='Number of test webhooks')
+    parser.add_argument('--url', help='Webhook URL')
+    parser.add_argument('--handler', help='Load test a local handler: path/to/lambda_function.py[:lambda_handler]')
+    parser.add_argument('--count', type=int, default=None, help='Number of test webhooks')
     parser.add_argument('--payload', help='JSON payload file path')
+    parser.add_argument('--payloads', nargs='+', help='Payload files or directories to replay in a load test')
+    add_load_arguments(parser)
     
     args = parser.parse_args()
+    if not args.url and not args.handler:
+        parser.error('--url or --handler is required')
     
-    payload = None
-    if args.payload:
-        with open(args.payload) as f:
-            payload = json.load(f)
-    
-    test_webhook(args.url, args.count, payload)
+    load_test = args.handler or args.concurrency or args.rps or args.duration or args.payloads
+    if load_test:
+        paths = args.payloads or ([args.payload] if args.payload else None)
+        if not paths:
+            parser.error('a load test needs --payloads (or --payload)')
+        run_load_test(load_payloads(paths), url=None if args.handler else args.url, handler=args.handler,
+                      concurrency=args.concurrency or 10, rps=args.rps, count=args.count,
+                      duration=args.duration, report_interval=args.interval,
+                      stub_latency_ms=args.stub_latency_ms, csv_path=args.csv)
+    else:
+        payload = None
+        if args.payload:
+            with open(args.payload) as f:
+                payload = json.load(f)
+        
+        test_webhook(args.url, args.count or 1, payload)
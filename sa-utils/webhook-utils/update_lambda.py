@@ -7,6 +7,8 @@ import io
 import yaml
 import sys
 
+from lambda_package import add_shared_modules
+
 def update_lambda(config_path='config.json', credentials_path='credentials.yaml', lambda_file='lambda_function.py'):
     with open(config_path) as f:
         config = json.load(f)
@@ -27,6 +29,7 @@ def update_lambda(config_path='config.json', credentials_path='credentials.yaml'
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
         zip_file.write(lambda_file, 'lambda_function.py')
+        add_shared_modules(zip_file)
 
     zip_buffer.seek(0)
 
@@ -3,66 +3,68 @@
 Analyze webhook payloads from S3 to understand schema
 """
 import json
+import os
+import sys
 import boto3
-from collections import defaultdict, Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+from schema_profiler import SchemaProfile
+from profile_cache import ProfileCache, list_s3_objects
 
-def analyze_s3_payloads(bucket, prefix='raw/', max_files=100):
-    """Analyze webhook payloads from S3"""
+
+def analyze_s3_payloads(bucket, prefix='raw/', max_files=None, cache_path=None, rebuild=False):
+    """Analyze webhook payloads from S3, re-reading only new or changed objects"""
     s3 = boto3.client('s3')
     
     print(f"Analyzing payloads in s3://{bucket}/{prefix}")
     print("=" * 60)
     
     # List files
-    response = s3.list_objects_v2(Bucket=bucket, Prefix=prefix, MaxKeys=max_files)
+    objects = list_s3_objects(s3, bucket, prefix, max_files=max_files)
     
-    if 'Contents' not in response:
+    if not objects:
         print("No files found")
         return
     
-    files = response['Contents']
-    print(f"Found {len(files)} files\n")
-    
-    # Analyze
-    field_counts = defaultdict(int)
-    field_types = defaultdict(Counter)
-    sample_payloads = []
-    total = 0
-    
-    for obj in files[:max_files]:
-        try:
-            response = s3.get_object(Bucket=bucket, Key=obj['Key'])
-            data = json.loads(response['Body'].read())
-            
-            # Analyze fields
-            for key, value in data.items():
-                field_counts[key] += 1
-                field_types[key][type(value).__name__] += 1
-            
-            # Save sample
-            if len(sample_payloads) < 3:
-                sample_payloads.append(data)
-            
-            total += 1
-        except Exception as e:
-            print(f"Error reading {obj['Key']}: {e}")
+    print(f"Found {len(objects)} files\n")
+    
+    # Analyze (raw/ objects are single pretty-printed JSON documents)
+    cache_path = cache_path or f".profile_cache_{bucket}_{prefix.strip('/').replace('/', '_') or 'root'}.json"
+    cache = ProfileCache(cache_path, SchemaProfile(max_samples=3))
+    if not rebuild:
+        cache.load()
+    profile, stats = cache.refresh(
+        s3, bucket, objects, unwrap_key=None, whole_object=True,
+        prune=max_files is None
+    )
+    for key, error in stats['errors']:
+        print(f"Error reading {key}: {error}")
+    print(f"Profiled {stats['profiled']} new/changed files, "
+          f"{stats['cached']} from cache ({cache_path})\n")
+    
+    total = profile.total_records
+    if total == 0:
+        print("No payloads analyzed")
+        return
+    
+    summary = profile.summary()['fields']
+    top_level = {path: f for path, f in summary.items() if '.' not in path and '[' not in path}
     
     # Print results
     print(f"Analyzed {total} payloads\n")
     
     print("Field Analysis:")
     print("-" * 60)
-    for field in sorted(field_counts.keys()):
-        count = field_counts[field]
+    for field, f in top_level.items():
+        count = f['records']
         percentage = (count / total) * 100
-        types = ', '.join([f"{t}({c})" for t, c in field_types[field].items()])
+        types = ', '.join([f"{t}({c})" for t, c in f['types'].items()])
         print(f"{field:30} {count:4}/{total} ({percentage:5.1f}%) - {types}")
     
     print("\n" + "=" * 60)
     print("Sample Payloads:")
     print("=" * 60)
-    for i, payload in enumerate(sample_payloads, 1):
+    for i, payload in enumerate(profile.samples.values(), 1):
         print(f"\nSample {i}:")
         print(json.dumps(payload, indent=2)[:500])
     
@@ -72,14 +74,14 @@ def analyze_s3_payloads(bucket, prefix='raw/', max_files=100):
     print("=" * 60)
     
     # Find optional fields
-    optional = [f for f, c in field_counts.items() if c < total * 0.95]
+    optional = [field for field, f in top_level.items() if f['records'] < total * 0.95]
     if optional:
         print(f"\nOptional fields (< 95% presence):")
         for field in optional:
             print(f"  - {field}")
     
     # Find nested objects
-    nested = [f for f, types in field_types.items() if 'dict' in types]
+    nested = [field for field, f in top_level.items() if 'object' in f['types']]
     if nested:
         print(f"\nNested objects (may need flattening):")
         for field in nested:
@@ -92,11 +94,13 @@ def main():
     parser = argparse.ArgumentParser(description='Analyze webhook payloads')
     parser.add_argument('--bucket', required=True, help='S3 bucket name')
     parser.add_argument('--prefix', default='raw/', help='S3 prefix')
-    parser.add_argument('--max', type=int, default=100, help='Max files to analyze')
+    parser.add_argument('--max', type=int, default=None, help='Max files to analyze (default: all)')
+    parser.add_argument('--cache', default=None, help='Profile cache file')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cache and re-read every file')
     
     args = parser.parse_args()
     
-    analyze_s3_payloads(args.bucket, args.prefix, args.max)
+    analyze_s3_payloads(args.bucket, args.prefix, args.max, args.cache, args.rebuild)
 
 
 if __name__ == "__main__":
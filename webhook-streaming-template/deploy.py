@@ -9,10 +9,14 @@ import zipfile
 import io
 import os
 import shutil
+import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'webhook-utils'))
+from lambda_package import add_shared_modules
 
-def package_lambda_with_sa_utils(sa_utils_path='../../sa-utils'):
+
+def package_lambda_with_sa_utils(sa_utils_path=os.path.join('..', 'sa-utils', 'sa_utils')):
     """Package Lambda function with sa_utils included"""
     print("Creating Lambda deployment package...")
     
@@ -20,8 +24,9 @@ def package_lambda_with_sa_utils(sa_utils_path='../../sa-utils'):
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
         # Add lambda function
         zf.write('lambda_function.py', 'lambda_function.py')
+        add_shared_modules(zf)
         
-        # Add sa_utils
+        # Add the sa_utils package (archived as sa_utils/...)
         sa_utils_dir = Path(sa_utils_path).resolve()
         for root, dirs, files in os.walk(sa_utils_dir):
             # Skip __pycache__ and other unnecessary dirs
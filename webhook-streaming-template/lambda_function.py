@@ -2,11 +2,15 @@
 AWS Lambda function template for webhook streaming to Redshift
 Handles API Gateway webhooks and Firehose transformations
 """
-import json
-import boto3
 import os
+import sys
 from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils', 'data-utils'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils'))
+import json_codec
 from sa_utils.aws_utilities import (
+    get_client,
     parse_webhook_body,
     add_webhook_metadata,
     create_api_gateway_response,
@@ -64,14 +68,14 @@ def store_to_s3(payload, context):
         return
     
     try:
-        s3 = boto3.client('s3')
+        s3 = get_client('s3')
         timestamp = datetime.utcnow().strftime('%Y-%m-%d-%H-%M-%S')
         key = f"raw/{timestamp}-{context.aws_request_id}.json"
         
         s3.put_object(
             Bucket=bucket,
             Key=key,
-            Body=json.dumps(payload, indent=2),
+            Body=json_codec.dumps_bytes(payload, pretty=True),
             ContentType='application/json'
         )
     except Exception as e:
@@ -85,10 +89,10 @@ def send_to_firehose(data):
         return
     
     try:
-        firehose = boto3.client('firehose')
+        firehose = get_client('firehose')
         firehose.put_record(
             DeliveryStreamName=stream,
-            Record={'Data': json.dumps(data) + '\n'}
+            Record={'Data': json_codec.dumps_line(data)}
         )
     except Exception as e:
         print(f"Firehose error: {e}")
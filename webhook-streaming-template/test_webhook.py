@@ -2,6 +2,10 @@
 """Test webhook endpoint"""
 import json
 import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sa-utils'))
 from sa_utils.aws_utilities import test_webhook
 
 